@@ -74,7 +74,7 @@ def _plot_heatmap(markov_ts, ax):
 def _plot_clustered_by_feature(markov_ts, seed, feature, ax):
     sorted_seed = seed.sort_values(by=str(feature))
     last_entries_in_group = sorted_seed.reset_index()\
-        .groupby(str(feature)).last()[['SN1', 'SN2', 'SN3']]
+        .groupby(str(feature), observed=True).last()[['SN1', 'SN2', 'SN3']]
     cluster_boundaries = [
         sorted_seed.reset_index()[
             (sorted_seed.reset_index().SN1 == last_entries_in_group.iloc[i, 0]) &
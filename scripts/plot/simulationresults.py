@@ -15,7 +15,9 @@ import urbanoccupants as uo
 import geopandasplotting as gpdplt
 ROOT_FOLDER = Path(os.path.abspath(__file__)).parent.parent.parent
 CACHE_PATH = ROOT_FOLDER / 'build' / 'web-cache'
+CENSUS_STORE_PATH = ROOT_FOLDER / 'build' / 'census-store'
 requests_cache.install_cache((CACHE_PATH).as_posix())
+uo.census.use_census_store(CENSUS_STORE_PATH)
 
 ENERGY_TIME_SPAN = timedelta(days=7) # energy will be reported as kWh per timespan, e.g kWh per week
 
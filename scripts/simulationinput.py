@@ -1,38 +1,107 @@
-from datetime import datetime, timedelta
-from itertools import count, chain
-import math
-from multiprocessing import Pool, cpu_count
+from datetime import datetime
+import hashlib
+import heapq
+from itertools import chain
+import json
+from multiprocessing import Pool
+from operator import attrgetter
 import os
 from pathlib import Path
-import random
+import shutil
+import threading
 
 import click
+import numpy as np
 import pandas as pd
-import yaml
 from tqdm import tqdm
 import requests_cache
 import sqlalchemy
 
 import urbanoccupants as uo
 
-NUMBER_HOUSEHOLDS_HARINGEY = 101955
-NUMBER_USUAL_RESIDENTS_HARINGEY = 254926
-RANDOM_SEED = 'haringey-case-study'
+# peak memory of a household of 2.4 people as objects and table rows is about 1300 bytes, measured
+# using tracemalloc, see tests/test_memory_budget.py; regions are also pickled between processes
+ESTIMATED_BYTES_PER_HOUSEHOLD = 2000
+# number of processes does not change the result, all other config values might
+CONFIG_KEYS_NOT_AFFECTING_RESULT = ['number-processes']
+# all of these must be unchanged for an incremental update, only controls may change
+INCREMENTAL_MANIFEST_KEYS = ['features', 'spatial-resolution', 'household-sampling',
+                             'seed-digest', 'config-digest']
 ROOT_FOLDER = Path(os.path.abspath(__file__)).parent.parent
 CACHE_PATH = ROOT_FOLDER / 'build' / 'web-cache'
+CENSUS_STORE_PATH = ROOT_FOLDER / 'build' / 'census-store'
 MIDAS_DATABASE_PATH = ROOT_FOLDER / 'data' / 'Londhour.csv'
 requests_cache.install_cache((CACHE_PATH).as_posix())
+uo.census.use_census_store(CENSUS_STORE_PATH)
 
 
-@click.command()
+@click.group()
+def cli():
+    """Creates the input database of the simulation, possibly in several shards."""
+
+
+@cli.command(name='create')
 @click.argument('path_to_seed')
 @click.argument('path_to_markov_ts')
 @click.argument('path_to_config')
 @click.argument('path_to_result')
-def simulation_input(path_to_seed, path_to_markov_ts, path_to_config, path_to_result):
-    random.seed(RANDOM_SEED)
-    _check_paths(path_to_seed, path_to_markov_ts, path_to_config, path_to_result)
-    seed = pd.read_pickle(path_to_seed)
+@click.option('--incremental', is_flag=True,
+              help='Regenerate only the population of regions whose controls changed since the '
+                   'last run, and splice it into the existing result.')
+@click.option('--shard', callback=lambda ctx, param, value: _parse_shard(value),
+              help='Synthesise only the regions of shard i out of n, given as "i/n", and write '
+                   'a partial result to be merged using `merge`.')
+@click.option('--memory-budget', type=click.IntRange(min=1),
+              help='Stream regions through fitting, sampling, and writing, holding at most '
+                   'about this many megabytes of the synthetic population in memory.')
+@click.option('--replicates', type=click.IntRange(min=1), default=1,
+              help='Number of independent synthetic populations to draw from the same fit, '
+                   'each written to its own database.')
+@click.option('--offline', is_flag=True,
+              help='Read census data only from the local census store, see `prefetch`.')
+@click.option('--from-output-areas', is_flag=True,
+              help='Derive census data of coarser layers by aggregating output area data.')
+def simulation_input(path_to_seed, path_to_markov_ts, path_to_config, path_to_result,
+                     incremental, shard, memory_budget, replicates, offline, from_output_areas):
+    """Creates the input database of the simulation.
+
+    Next to the database a manifest of the synthetic population is written, containing a
+    digest of the controls of each region, a report on how well the population of each region
+    fits its controls, a columnar snapshot of the population, see `uo.Snapshot`, and the lookup
+    table from the integer ids of seed households and people to their ids in the TUS. Using
+    `--incremental`, the population of all regions with unchanged controls is kept, and only
+    changed regions are refitted, resampled, and spliced into the existing database; their
+    households get new ids while the ids of all other households stay stable, and markov
+    chains are reused from the last run. Tables other than dwellings and people are left
+    untouched in that case. Hence, the seed, the time use data, and the config must be
+    unchanged, otherwise `--incremental` fails.
+
+    Using `--shard i/n`, only every n-th region, starting with the i-th, is synthesised.
+    Household ids and thus random numbers and seeds are the same as in a run without shards.
+    The partial result is not a database, but a pickle to be combined with those of all other
+    shards using `merge`.
+
+    Using `--memory-budget`, the population is not held in memory entirely. Instead, regions
+    flow through fitting, sampling, and writing, and are written in batches. Peak memory is
+    then independent of the size of the population, e.g. for all of London.
+
+    Using `--replicates k`, k populations are drawn from the same fitted weights and markov
+    chains and written to k databases next to `path_to_result`, suffixed by the replicate
+    number. Household ids of the replicates do not overlap, so that random numbers and seeds
+    of all replicates are independent.
+
+    Census data is read from the local census store, and retrieved from nomis only if it is
+    missing there. Using `--offline`, missing census data is an error instead. Using
+    `--from-output-areas`, census data is retrieved for output areas only, and aggregated to
+    the spatial resolution.
+    """
+    if sum([incremental, shard is not None, memory_budget is not None, replicates > 1]) > 1:
+        raise click.UsageError('--incremental, --shard, --memory-budget, and --replicates '
+                               'cannot be combined.')
+    _check_paths(path_to_seed, path_to_markov_ts, path_to_config, path_to_result, incremental)
+    uo.census.use_census_store(CENSUS_STORE_PATH, offline=offline)
+    uo.census.aggregate_output_areas(from_output_areas)
+    seed = uo.encode_features(pd.read_pickle(path_to_seed))
     markov_ts = pd.read_pickle(path_to_markov_ts)
     config = uo.read_simulation_config(path_to_config)
     features = config['people-features'] + config['household-features']
@@ -41,37 +110,189 @@ def simulation_input(path_to_seed, path_to_markov_ts, path_to_config, path_to_re
         markov_ts,
         set(features + [uo.PeopleFeature.AGE])
     )
-    markov_chains = _create_markov_chains(
-        seed,
-        markov_ts,
-        features,
-        config
-    )
-    seed = _amend_seed_by_markov_model(seed, markov_chains, features, config['start-time'])
-    seed = _amend_seed_by_metabolic_rate(seed, config)
+    seed_index = uo.tus.integer_seed_lookup(seed.index)
+    seed = uo.tus.to_integer_keys(seed, seed_index)
+    markov_ts = uo.tus.to_integer_keys(markov_ts, seed_index)
     census_data_ppl = {feature: feature.read_census_data(config['spatial-resolution'])
                        for feature in config['people-features']}
-    for data in census_data_ppl.values():
-        assert data.sum().sum() == NUMBER_USUAL_RESIDENTS_HARINGEY
     census_data_hh = {feature: feature.read_census_data(config['spatial-resolution'])
                       for feature in config['household-features']}
-    for data in census_data_hh.values():
-        assert data.sum().sum() == NUMBER_HOUSEHOLDS_HARINGEY
-    seed = _prepare_seed_index(seed)
+    _check_census_data(census_data_ppl)
+    _check_census_data(census_data_hh)
+    manifest = _population_manifest(census_data_hh, census_data_ppl, config,
+                                    _seed_digest(seed, markov_ts))
+    markov_chains = None
+    if incremental:
+        _check_incremental_update(_read_manifest(path_to_result), manifest)
+        markov_chains = _read_markov_chains(manifest, path_to_result)
+    if markov_chains is None:
+        markov_chains = _create_markov_chains(
+            seed,
+            markov_ts,
+            features,
+            config
+        )
+        if shard is None and replicates == 1:
+            _write_markov_chains_cache(markov_chains, manifest, path_to_result)
+    else:
+        print("Reusing markov chains of the last run.")
+    seed = _amend_seed_by_markov_model(seed, markov_chains, features, config['start-time'])
+    seed = _amend_seed_by_metabolic_rate(seed, config)
+    if incremental:
+        _update_synthetic_population(seed, census_data_hh, census_data_ppl, config, manifest,
+                                     path_to_result)
+        _write_seed_index(seed_index, path_to_result)
+        return
+    if replicates > 1:
+        _create_replicates(seed, census_data_hh, census_data_ppl, config, manifest,
+                           markov_chains, seed_index, replicates, path_to_result)
+        return
+    household_ids = _household_ids(manifest, first_household_id=1)
+    if memory_budget is not None:
+        number_households, fit_quality = _stream_synthetic_population(
+            seed,
+            census_data_hh,
+            census_data_ppl,
+            config,
+            household_ids,
+            memory_budget * 1024 ** 2,
+            path_to_result
+        )
+        assert number_households == _number_households(manifest)
+        _write_fit_quality(fit_quality, path_to_result)
+        _write_manifest(manifest, household_ids, path_to_result)
+        _write_seed_index(seed_index, path_to_result)
+        _write_markov_chains(markov_chains, path_to_result)
+        _write_temperature_table(config, path_to_result)
+        _write_simulation_parameter_table(config, path_to_result)
+        return
+    if shard is not None:
+        household_ids = _shard_household_ids(household_ids, shard)
     households, citizens = _create_synthetic_population(
         seed,
         census_data_hh,
         census_data_ppl,
-        config
+        config,
+        household_ids
+    )
+    fit_quality = _fit_quality(seed, households, census_data_hh, census_data_ppl, config)
+    if shard is not None:
+        _write_shard(shard, households, citizens, fit_quality, manifest, markov_chains,
+                     seed_index, path_to_result)
+        return
+    _write_simulation_input(households, citizens, fit_quality, manifest, markov_chains,
+                            seed_index, config, path_to_result)
+
+
+@cli.command()
+@click.argument('path_to_config')
+@click.argument('path_to_result')
+@click.argument('paths_to_shards', nargs=-1, required=True)
+def merge(path_to_config, path_to_result, paths_to_shards):
+    """Merges the partial results of all shards into the input database of the simulation.
+
+    The config must be the one the shards have been created with. The database is identical
+    to the one of a run without shards.
+    """
+    shards = [pd.read_pickle(path_to_shard) for path_to_shard in paths_to_shards]
+    _check_shards(shards)
+    config = uo.read_simulation_config(path_to_config)
+    if not MIDAS_DATABASE_PATH.exists():
+        raise ValueError('MIDAS weather data file is missing: {}.'.format(MIDAS_DATABASE_PATH))
+    _remove_result(path_to_result)
+    households, citizens = _merged_population(shards)
+    fit_quality = pd.concat([shard['fit-quality'] for shard in shards]).sort_index()
+    _write_simulation_input(households, citizens, fit_quality, shards[0]['manifest'],
+                            shards[0]['markov-chains'], shards[0]['seed-index'], config,
+                            path_to_result)
+
+
+@cli.command()
+@click.option('--layer', 'layers', multiple=True,
+              type=click.Choice([layer.name for layer in uo.census.GeographicalLayer]),
+              help='Geographical layer to prefetch, can be given several times; default: all.')
+@click.option('--from-output-areas', is_flag=True,
+              help='Prefetch only output area data and the lookup to coarser layers.')
+def prefetch(layers, from_output_areas):
+    """Fills the local census store with all census data, so that `create` can run offline."""
+    uo.census.aggregate_output_areas(from_output_areas)
+    paths = uo.census.prefetch_census_data(
+        [uo.census.GeographicalLayer[layer] for layer in layers] if layers else None
+    )
+    print("Census store {} holds {} tables.".format(CENSUS_STORE_PATH, len(paths)))
+
+
+def _create_replicates(seed, census_data_hh, census_data_ppl, config, manifest, markov_chains,
+                       seed_index, number_replicates, path_to_result):
+    number_households = _number_households(manifest)
+    first_household_ids = [1 + replicate * number_households
+                           for replicate in range(number_replicates)]
+    populations = _create_synthetic_population_replicates(
+        seed,
+        census_data_hh,
+        census_data_ppl,
+        config,
+        [_household_ids(manifest, first_household_id)
+         for first_household_id in first_household_ids]
     )
+    for replicate, (households, citizens) in enumerate(populations):
+        path_to_replicate = _replicate_path(path_to_result, replicate)
+        _remove_result(path_to_replicate)
+        _write_simulation_input(
+            households,
+            citizens,
+            _fit_quality(seed, households, census_data_hh, census_data_ppl, config),
+            manifest,
+            markov_chains,
+            seed_index,
+            config,
+            path_to_replicate,
+            first_household_id=first_household_ids[replicate]
+        )
+
+
+def _replicate_path(path_to_result, replicate):
+    path_to_result = Path(path_to_result)
+    return path_to_result.with_name('{}-replicate-{}{}'.format(path_to_result.stem, replicate,
+                                                              path_to_result.suffix))
+
+
+def _write_simulation_input(households, citizens, fit_quality, manifest, markov_chains,
+                            seed_index, config, path_to_result, first_household_id=1):
+    assert len(households) == _number_households(manifest)
+    household_ids = _household_ids(manifest, first_household_id)
     _write_dwellings_table(households, config, path_to_result)
     _write_citizens_table(citizens, path_to_result)
+    uo.write_snapshot(_snapshot_path(path_to_result), households, citizens)
+    _write_fit_quality(fit_quality, path_to_result)
+    _write_manifest(manifest, household_ids, path_to_result)
+    _write_seed_index(seed_index, path_to_result)
     _write_markov_chains(markov_chains, path_to_result)
     _write_temperature_table(config, path_to_result)
     _write_simulation_parameter_table(config, path_to_result)
 
 
-def _check_paths(path_to_seed, path_to_markov_ts, path_to_config, path_to_result):
+def _parse_shard(shard):
+    if shard is None:
+        return None
+    try:
+        shard_number, number_shards = (int(number) for number in shard.split('/'))
+    except ValueError:
+        raise click.BadParameter('Shard must be given as "i/n", but was "{}".'.format(shard))
+    if not 1 <= shard_number <= number_shards:
+        raise click.BadParameter('Shard number must be within 1 and {}, but was {}.'
+                                 .format(number_shards, shard_number))
+    return shard_number, number_shards
+
+
+def _check_census_data(census_data):
+    totals = {str(feature): data.sum().sum() for feature, data in census_data.items()}
+    if len(set(totals.values())) > 1:
+        raise ValueError('Census data of features have different totals: {}.'.format(totals))
+
+
+def _check_paths(path_to_seed, path_to_markov_ts, path_to_config, path_to_result,
+                 incremental=False):
     if not Path(path_to_seed).exists():
         raise ValueError("Seed is missing: {}.".format(path_to_seed))
     if not Path(path_to_markov_ts).exists():
@@ -79,22 +300,42 @@ def _check_paths(path_to_seed, path_to_markov_ts, path_to_config, path_to_result
     if not Path(path_to_config).exists():
         raise ValueError("Config file is missing: {}.".format(path_to_config))
     path_to_result = Path(path_to_result)
-    if path_to_result.exists():
-        path_to_result.unlink()
+    if incremental:
+        if not all(path.exists() for path in [path_to_result, _manifest_path(path_to_result),
+                                              _fit_quality_path(path_to_result),
+                                              _snapshot_path(path_to_result)]):
+            raise ValueError("Incremental mode needs the result, manifest, fit quality, and "
+                             "snapshot of a previous run: {}.".format(path_to_result))
+    else:
+        _remove_result(path_to_result)
     if not MIDAS_DATABASE_PATH.exists():
         raise ValueError('MIDAS weather data file is missing: {}.'.format(MIDAS_DATABASE_PATH))
 
 
+def _remove_result(path_to_result):
+    path_to_result = Path(path_to_result)
+    if path_to_result.exists():
+        path_to_result.unlink()
+    if _snapshot_path(path_to_result).exists():
+        shutil.rmtree(_snapshot_path(path_to_result).as_posix())
+    if _seed_index_path(path_to_result).exists():
+        _seed_index_path(path_to_result).unlink()
+    if _markov_chains_path(path_to_result).exists():
+        _markov_chains_path(path_to_result).unlink()
+
+
 def _create_markov_chains(seed, markov_ts, features, config):
-    seed_groups = seed.groupby([str(feature) for feature in features])
+    seed_groups = seed.groupby([str(feature) for feature in features], observed=True)
     print("Dividing the seed into {} cluster.".format(len(seed_groups.groups.keys())))
     print("Cluster statistics:")
     print(seed_groups.size().describe())
 
-    with Pool(config['number-processes']) as pool:
+    with uo.shareddata.SharedFrame(markov_ts) as shared_markov_ts, \
+            Pool(config['number-processes'], initializer=uo.shareddata.attach,
+                 initargs=(shared_markov_ts.descriptor, )) as pool:
         feature_combinations = seed_groups.groups.keys()
         all_parameters = ( # imap_unordered allows only one parameter, hence the tuple
-            (markov_ts,
+            (shared_markov_ts.descriptor,
              seed_groups.get_group(features),
              features,
              config['time-step-size'])
@@ -104,11 +345,50 @@ def _create_markov_chains(seed, markov_ts, features, config):
                              tqdm(all_parameters,
                                   total=len(feature_combinations),
                                   desc='Calculating markov chains')))
-    return markov_chains
+    # sorted, so that markov chain tables are always written in the same order
+    return dict(sorted(markov_chains.items(), key=lambda item: uo.feature_id(item[0])))
+
+
+def _seed_digest(seed, markov_ts):
+    """A digest of the seed and the time use data, i.e. of everything sampled from."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(seed).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(markov_ts).values.tobytes())
+    return digest.hexdigest()
+
+
+def _config_digest(config):
+    """A digest of all config values that affect the result."""
+    relevant_config = {key: value for key, value in config.items()
+                       if key not in CONFIG_KEYS_NOT_AFFECTING_RESULT}
+    return hashlib.sha1(
+        json.dumps(relevant_config, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+def _markov_chains_path(path_to_db):
+    return Path(str(path_to_db) + '.markov-chains.pickle')
+
+
+def _write_markov_chains_cache(markov_chains, manifest, path_to_db):
+    pd.to_pickle({
+        'seed-digest': manifest['seed-digest'],
+        'config-digest': manifest['config-digest'],
+        'markov-chains': markov_chains
+    }, _markov_chains_path(path_to_db))
+
+
+def _read_markov_chains(manifest, path_to_db):
+    """The markov chains of the last run, or None if they are missing or outdated."""
+    if not _markov_chains_path(path_to_db).exists():
+        return None
+    cache = pd.read_pickle(_markov_chains_path(path_to_db))
+    if any(cache[key] != manifest[key] for key in ['seed-digest', 'config-digest']):
+        return None
+    return cache['markov-chains']
 
 
 def _amend_seed_by_markov_model(seed, markov_chains, features, simulation_start_time):
-    seed_groups = seed.groupby([str(feature) for feature in features])
+    seed_groups = seed.groupby([str(feature) for feature in features], observed=True)
     for feature_combination, index in seed_groups.groups.items():
         seed.loc[index, 'markov_id'] = uo.feature_id(feature_combination)
         seed.loc[index, 'initial_activity'] = markov_chains[feature_combination]\
@@ -131,74 +411,458 @@ def _amend_seed_by_metabolic_rate(seed, config):
     return seed
 
 
-def _prepare_seed_index(seed):
-    sn1_plus_sn2 = seed.index.droplevel(2)
-    seed = seed.copy()
-    seed['household_id'] = list(sn1_plus_sn2)
-    seed.reset_index(inplace=True)
-    seed.rename(columns={'SN3': 'person_id'}, inplace=True)
-    seed.set_index(['household_id', 'person_id'], inplace=True)
-    seed.drop(['SN1', 'SN2'], axis=1, inplace=True)
-    return seed
+def _controls_digest(region, census_data_hh, census_data_ppl):
+    controls = sorted((str(feature), str(category), int(value))
+                      for census_data in [census_data_hh, census_data_ppl]
+                      for feature, data in census_data.items()
+                      for category, value in data.loc[region, :].items())
+    return hashlib.sha1(repr(controls).encode('utf-8')).hexdigest()
 
 
-def _create_synthetic_population(seed, census_data_hh, census_data_ppl, config):
+def _population_manifest(census_data_hh, census_data_ppl, config, seed_digest):
     random_hh_feature = list(census_data_hh.values())[0]
-    regions = list(random_hh_feature.index)
-    controls_hh = {region: {str(feature): census_data_hh[feature].loc[region, :]
-                            for feature in config['household-features']}
-                   for region in regions}
-    controls_ppl = {region: {str(feature): census_data_ppl[feature].loc[region, :]
-                             for feature in config['people-features']}
-                    for region in regions}
-    number_households = {region: random_hh_feature.loc[region, :].sum() for region in regions}
-    household_counter = count(start=1, step=1)
-    household_ids = {region: [household_counter.__next__()
-                              for _ in range(number_households[region])]
-                     for region in regions}
-    random_numbers = {region: [random.uniform(0, 1) for _ in range(number_households[region])]
-                      for region in regions}
-    hh_chunk_size = int(NUMBER_HOUSEHOLDS_HARINGEY / config['number-processes'] / 4)
-
-    with Pool(config['number-processes']) as pool:
-        hipf_params = ((seed, controls_hh[region], controls_ppl[region], region)
+    return {
+        'seed-digest': seed_digest,
+        'config-digest': _config_digest(config),
+        'features': [str(feature) for feature in config['people-features'] +
+                     config['household-features']],
+        'spatial-resolution': str(config['spatial-resolution']),
+        'household-sampling': config['household-sampling'],
+        'regions': {
+            region: {
+                'controls-digest': _controls_digest(region, census_data_hh, census_data_ppl),
+                'number-households': int(random_hh_feature.loc[region, :].sum())
+            }
+            for region in random_hh_feature.index
+        }
+    }
+
+
+def _manifest_path(path_to_db):
+    return Path(str(path_to_db) + '.manifest.json')
+
+
+def _write_manifest(manifest, household_ids, path_to_db):
+    manifest = dict(manifest, regions={
+        region: dict(region_manifest, **{'first-household-id': household_ids[region].start})
+        for region, region_manifest in manifest['regions'].items()
+    })
+    with _manifest_path(path_to_db).open('w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+
+
+def _read_manifest(path_to_db):
+    with _manifest_path(path_to_db).open('r') as manifest_file:
+        return json.load(manifest_file)
+
+
+def _number_households(manifest):
+    return sum(region_manifest['number-households']
+               for region_manifest in manifest['regions'].values())
+
+
+def _household_ids(manifest, first_household_id):
+    household_ids = {}
+    next_household_id = first_household_id
+    for region, region_manifest in manifest['regions'].items():
+        number_households = region_manifest['number-households']
+        household_ids[region] = range(next_household_id, next_household_id + number_households)
+        next_household_id += number_households
+    return household_ids
+
+
+def _shard_household_ids(household_ids, shard):
+    shard_number, number_shards = shard
+    regions = list(household_ids.keys())[shard_number - 1::number_shards]
+    return {region: household_ids[region] for region in regions}
+
+
+def _write_shard(shard, households, citizens, fit_quality, manifest, markov_chains, seed_index,
+                 path_to_shard):
+    pd.to_pickle({
+        'shard': shard,
+        'households': households,
+        'citizens': citizens,
+        'fit-quality': fit_quality,
+        'manifest': manifest,
+        'markov-chains': markov_chains,
+        'seed-index': seed_index
+    }, path_to_shard)
+
+
+def _check_shards(shards):
+    number_shards = shards[0]['shard'][1]
+    shard_numbers = sorted(shard['shard'][0] for shard in shards)
+    if any(shard['shard'][1] != number_shards for shard in shards):
+        raise ValueError('Shards stem from runs with different numbers of shards.')
+    if shard_numbers != list(range(1, number_shards + 1)):
+        raise ValueError('Expected shards 1 to {}, but got {}.'.format(number_shards,
+                                                                       shard_numbers))
+    for shard in shards[1:]:
+        if shard['manifest'] != shards[0]['manifest']:
+            raise ValueError('Shards stem from runs with different features or controls.')
+        if not shard['seed-index'].equals(shards[0]['seed-index']):
+            raise ValueError('Shards stem from runs with different seeds.')
+        if not _equal_markov_chains(shard['markov-chains'], shards[0]['markov-chains']):
+            raise ValueError('Shards stem from runs with different markov chains.')
+
+
+def _equal_markov_chains(markov_chains, other_markov_chains):
+    if list(markov_chains.keys()) != list(other_markov_chains.keys()):
+        return False
+    return all(
+        markov_chain.time_step_size == other_markov_chains[key].time_step_size and
+        np.array_equal(markov_chain.transition_probabilities,
+                       other_markov_chains[key].transition_probabilities)
+        for key, markov_chain in markov_chains.items()
+    )
+
+
+def _check_incremental_update(old_manifest, manifest):
+    changed = [key for key in INCREMENTAL_MANIFEST_KEYS if old_manifest.get(key) != manifest[key]]
+    if changed:
+        raise ValueError('{} changed since the last run, incremental update impossible.'
+                         .format(', '.join(changed)))
+
+
+def _update_synthetic_population(seed, census_data_hh, census_data_ppl, config, manifest,
+                                 path_to_db):
+    old_manifest = _read_manifest(path_to_db)
+    _check_incremental_update(old_manifest, manifest)
+    old_regions = old_manifest['regions']
+    changed_regions = {
+        region: region_manifest for region, region_manifest in manifest['regions'].items()
+        if (region not in old_regions or
+            old_regions[region]['controls-digest'] != region_manifest['controls-digest'])
+    }
+    removed_regions = [region for region in old_regions if region not in manifest['regions']]
+    print("{} regions changed, {} regions removed.".format(len(changed_regions),
+                                                           len(removed_regions)))
+    if not changed_regions and not removed_regions:
+        return
+    dwellings = _read_input_db_table(uo.DWELLINGS_TABLE_NAME, path_to_db)
+    people = _read_input_db_table(uo.PEOPLE_TABLE_NAME, path_to_db)
+    # changed regions get fresh ids, so that ids of all other households remain stable
+    household_ids = _household_ids(
+        {'regions': changed_regions},
+        first_household_id=max(region_manifest['first-household-id'] +
+                               region_manifest['number-households']
+                               for region_manifest in old_regions.values())
+    )
+    households, citizens = _create_synthetic_population(
+        seed,
+        census_data_hh,
+        census_data_ppl,
+        config,
+        household_ids
+    )
+    outdated_dwellings = dwellings.region.isin(list(changed_regions.keys()) + removed_regions)
+    people = people[~people.dwellingId.isin(dwellings.index[outdated_dwellings])]
+    dwellings = pd.concat([dwellings[~outdated_dwellings], _dwellings_df(households, config)])
+    people = pd.concat([people, _citizens_df(citizens, first_index=people.index.max() + 1
+                                             if len(people) > 0 else 0)])
+    _df_to_input_db(dwellings, uo.DWELLINGS_TABLE_NAME, path_to_db, if_exists='replace')
+    _df_to_input_db(people, uo.PEOPLE_TABLE_NAME, path_to_db, if_exists='replace')
+    fit_quality = _read_fit_quality(path_to_db)
+    fit_quality = pd.concat([
+        fit_quality[~fit_quality.index.get_level_values('region').isin(
+            list(changed_regions.keys()) + removed_regions
+        )],
+        _fit_quality(seed, households, census_data_hh, census_data_ppl, config)
+    ]).sort_index()
+    _write_fit_quality(fit_quality, path_to_db)
+    _update_snapshot(households, citizens, list(changed_regions.keys()) + removed_regions,
+                     path_to_db)
+    all_household_ids = {
+        region: (household_ids[region] if region in household_ids
+                 else range(old_regions[region]['first-household-id'],
+                            old_regions[region]['first-household-id'] +
+                            old_regions[region]['number-households']))
+        for region in manifest['regions']
+    }
+    _write_manifest(manifest, all_household_ids, path_to_db)
+
+
+def _update_snapshot(households, citizens, outdated_regions, path_to_db):
+    old_households, old_citizens = uo.Snapshot(_snapshot_path(path_to_db)).population()
+    outdated_regions = set(outdated_regions)
+    outdated_household_ids = set(household.id for household in old_households
+                                 if household.region in outdated_regions)
+    path_to_new_snapshot = Path(str(_snapshot_path(path_to_db)) + '.new')
+    with uo.SnapshotWriter(path_to_new_snapshot) as snapshot_writer:
+        snapshot_writer.append(
+            [household for household in old_households
+             if household.id not in outdated_household_ids],
+            [citizen for citizen in old_citizens
+             if citizen.householdId not in outdated_household_ids]
+        )
+        snapshot_writer.append(households, citizens)
+    shutil.rmtree(_snapshot_path(path_to_db).as_posix())
+    path_to_new_snapshot.rename(_snapshot_path(path_to_db))
+
+
+def _create_synthetic_population(seed, census_data_hh, census_data_ppl, config, household_ids):
+    """Creates the synthetic population of all regions in `household_ids`.
+
+    `household_ids` maps each region to the range of ids of its households.
+    """
+    return _create_synthetic_population_replicates(
+        seed,
+        census_data_hh,
+        census_data_ppl,
+        config,
+        [household_ids]
+    )[0]
+
+
+def _create_synthetic_population_replicates(seed, census_data_hh, census_data_ppl, config,
+                                            replicate_household_ids):
+    """Creates several synthetic populations of the same regions from a single fit.
+
+    `replicate_household_ids` contains for each replicate a mapping of each region to the range
+    of ids of its households. Ids of different replicates must not overlap.
+
+    Returns:
+        a list of tuples of households and citizens, one for each replicate
+    """
+    regions = list(replicate_household_ids[0].keys())
+    controls_hh = uo.census.CensusCube(census_data_hh)
+    controls_ppl = uo.census.CensusCube(census_data_ppl)
+    number_replicates = len(replicate_household_ids)
+    number_households = sum(len(ids) for ids in replicate_household_ids[0].values())
+    hh_chunk_size = max(1, int(number_replicates * number_households /
+                               config['number-processes'] / 4))
+
+    with uo.shareddata.SharedFrame(seed) as shared_seed, \
+            Pool(config['number-processes'], initializer=uo.shareddata.attach,
+                 initargs=(shared_seed.descriptor, )) as pool:
+        seed = shared_seed.descriptor # workers attach to the seed instead of receiving copies
+        hipf_params = ((seed, controls_hh.subset([region]), controls_ppl.subset([region]), region)
                        for region in regions)
         household_weights = dict(tqdm(
             pool.imap_unordered(uo.synthpop.run_hipf, hipf_params),
             total=len(regions),
             desc='Hierarchical IPF         '
         ))
-        household_params = ((region, seed, household_weights[region],
-                             random_numbers[region], household_ids[region])
-                            for region in regions)
-        households = list(chain(*tqdm(
-            pool.imap_unordered(uo.synthpop.sample_households, household_params),
-            total=len(regions),
+        # random numbers are derived from household ids within the workers
+        if config['household-sampling'] == uo.synthpop.SYSTEMATIC_SAMPLING:
+            household_tasks = [(uo.synthpop.sample_households_systematic,
+                                (region, seed, household_weights[region],
+                                 controls_hh.features, household_ids[region]))
+                               for region in regions
+                               for household_ids in replicate_household_ids]
+        else:
+            household_tasks = [(uo.synthpop.sample_household_replicates,
+                                (region, seed, household_weights[region],
+                                 [household_ids[region]
+                                  for household_ids in replicate_household_ids]))
+                               for region in regions]
+        # results are tagged with chunk ids and put back into the order of household ids,
+        # hence the population never depends on the number of processes or their timing
+        household_results = list(uo.synthpop.in_chunk_order(tqdm(
+            pool.imap_unordered(
+                uo.synthpop.run_chunk,
+                ((chunk_id, task, params)
+                 for chunk_id, (task, params) in enumerate(household_tasks))
+            ),
+            total=len(household_tasks),
             desc='Sampling households      '
         )))
-        household_chunks = [households[i:i + hh_chunk_size]
-                            for i in range(0, len(households), hh_chunk_size)]
-        citizens = list(chain(*tqdm(
+        if config['household-sampling'] == uo.synthpop.SYSTEMATIC_SAMPLING:
+            region_replicates = [household_results[i:i + number_replicates]
+                                 for i in range(0, len(household_results), number_replicates)]
+        else:
+            region_replicates = household_results
+        del household_results
+        households = [list(chain(*(replicates[replicate] for replicates in region_replicates)))
+                      for replicate in range(number_replicates)]
+        del region_replicates
+        household_chunks = [(replicate, replicate_households[i:i + hh_chunk_size])
+                            for replicate, replicate_households in enumerate(households)
+                            for i in range(0, len(replicate_households), hh_chunk_size)]
+        citizen_chunks = uo.synthpop.in_chunk_order(tqdm(
             pool.imap_unordered(
-                uo.synthpop.sample_citizen,
-                ((households, seed) for households in household_chunks)
+                uo.synthpop.run_chunk,
+                ((chunk_id, uo.synthpop.sample_citizen, (chunk_households, seed))
+                 for chunk_id, (unused, chunk_households) in enumerate(household_chunks))
             ),
-            total=math.ceil(NUMBER_HOUSEHOLDS_HARINGEY / hh_chunk_size),
+            total=len(household_chunks),
             desc='Sampling individuals     '
-        )))
-
-    assert len(households) == NUMBER_HOUSEHOLDS_HARINGEY
-    assert abs(len(citizens) - NUMBER_USUAL_RESIDENTS_HARINGEY) < 2000
+        ))
+        citizens = [[] for replicate in range(number_replicates)]
+        for (replicate, unused), chunk_citizens in zip(household_chunks, citizen_chunks):
+            citizens[replicate] += chunk_citizens
+
+    assert all(len(replicate_households) == number_households
+               for replicate_households in households)
+    return list(zip(households, citizens))
+
+
+def _stream_synthetic_population(seed, census_data_hh, census_data_ppl, config, household_ids,
+                                 memory_budget, path_to_db):
+    """Creates the synthetic population of all regions in `household_ids` and writes it.
+
+    Regions are fitted and sampled in the workers, and written in order of household ids, in
+    batches. About half of the memory budget (in bytes) is used for regions in flight, half for
+    the batch to be written. Regions are only handed to the workers when their households fit
+    into the budget, hence slow writing or a slow region block further regions.
+
+    Returns:
+        a tuple of the number of households and the fit quality of all regions
+    """
+    capacity = max(1, memory_budget // 2 // ESTIMATED_BYTES_PER_HOUSEHOLD)
+    budget = _HouseholdBudget(capacity)
+    number_households = 0
+    number_citizens = 0
+    households = []
+    citizens = []
+    fit_quality = []
+
+    controls_hh = uo.census.CensusCube(census_data_hh)
+    controls_ppl = uo.census.CensusCube(census_data_ppl)
+    with uo.SnapshotWriter(_snapshot_path(path_to_db)) as snapshot_writer, \
+            uo.shareddata.SharedFrame(seed) as shared_seed, \
+            Pool(config['number-processes'], initializer=uo.shareddata.attach,
+                 initargs=(shared_seed.descriptor, )) as pool:
+        def region_params():
+            for region, region_household_ids in household_ids.items():
+                budget.acquire(len(region_household_ids)) # blocks the task handler of the pool
+                yield (shared_seed.descriptor,
+                       controls_hh.subset([region]),
+                       controls_ppl.subset([region]),
+                       region,
+                       region_household_ids,
+                       config['household-sampling'])
+        try:
+            # imap keeps the order of regions and hence of household ids
+            for region, region_households, region_citizens in tqdm(
+                    pool.imap(uo.synthpop.synthesise_region, region_params()),
+                    total=len(household_ids),
+                    desc='Synthesising population  '):
+                budget.release(len(region_households))
+                households += region_households
+                citizens += region_citizens
+                if len(households) >= capacity:
+                    fit_quality.append(_fit_quality(seed, households, census_data_hh,
+                                                    census_data_ppl, config))
+                    _append_population(households, citizens, number_citizens, config,
+                                       snapshot_writer, path_to_db)
+                    number_households += len(households)
+                    number_citizens += len(citizens)
+                    households = []
+                    citizens = []
+        finally:
+            budget.close()
+        fit_quality.append(_fit_quality(seed, households, census_data_hh, census_data_ppl,
+                                        config))
+        _append_population(households, citizens, number_citizens, config, snapshot_writer,
+                           path_to_db)
+    return number_households + len(households), pd.concat(fit_quality).sort_index()
+
+
+class _HouseholdBudget():
+    """Limits the number of households in flight.
+
+    A single request larger than the capacity is granted when nothing else is in flight.
+    """
+
+    def __init__(self, capacity):
+        self.__capacity = capacity
+        self.__used = 0
+        self.__closed = False
+        self.__condition = threading.Condition()
+
+    def acquire(self, number_households):
+        with self.__condition:
+            self.__condition.wait_for(
+                lambda: (self.__closed or self.__used == 0 or
+                         self.__used + number_households <= self.__capacity)
+            )
+            self.__used += number_households
+
+    def release(self, number_households):
+        with self.__condition:
+            self.__used -= number_households
+            self.__condition.notify_all()
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+
+def _append_population(households, citizens, first_citizen_index, config, snapshot_writer,
+                       path_to_db):
+    snapshot_writer.append(households, citizens)
+    _df_to_input_db(_dwellings_df(households, config), uo.DWELLINGS_TABLE_NAME, path_to_db,
+                    if_exists='append')
+    _df_to_input_db(_citizens_df(citizens, first_index=first_citizen_index),
+                    uo.PEOPLE_TABLE_NAME, path_to_db, if_exists='append')
+
+
+def _merged_population(shards):
+    # the population of each shard is ordered by household id, hence a k-way merge restores the
+    # order of a run without shards; citizens of a household all stem from the same shard and
+    # keep their order
+    households = list(heapq.merge(*(shard['households'] for shard in shards),
+                                  key=attrgetter('id')))
+    citizens = list(heapq.merge(*(shard['citizens'] for shard in shards),
+                                key=attrgetter('householdId')))
     return households, citizens
 
 
-def _df_to_input_db(df, table_name, path_to_db):
+def _fit_quality(seed, households, census_data_hh, census_data_ppl, config):
+    totals = uo.synthpop.population_totals(
+        seed,
+        households,
+        config['people-features'] + config['household-features']
+    )
+    return uo.synthpop.fit_quality(totals, {**census_data_hh, **census_data_ppl})
+
+
+def _snapshot_path(path_to_db):
+    return Path(str(path_to_db) + '.snapshot')
+
+
+def _fit_quality_path(path_to_db):
+    return Path(str(path_to_db) + '.fit-quality.csv')
+
+
+def _write_fit_quality(fit_quality, path_to_db):
+    print("Fit quality, worst region per feature:")
+    print(fit_quality.groupby(level='feature').max())
+    fit_quality.to_csv(_fit_quality_path(path_to_db))
+
+
+def _seed_index_path(path_to_db):
+    return Path(str(path_to_db) + '.seed-index.csv')
+
+
+def _write_seed_index(seed_index, path_to_db):
+    seed_index.to_csv(_seed_index_path(path_to_db))
+
+
+def _read_fit_quality(path_to_db):
+    return pd.read_csv(_fit_quality_path(path_to_db), index_col=['region', 'feature'],
+                       dtype={'region': str})
+
+
+def _df_to_input_db(df, table_name, path_to_db, if_exists='fail'):
+    disk_engine = sqlalchemy.create_engine('sqlite:///{}'.format(path_to_db))
+    df.to_sql(name=table_name, con=disk_engine, if_exists=if_exists)
+
+
+def _read_input_db_table(table_name, path_to_db):
     disk_engine = sqlalchemy.create_engine('sqlite:///{}'.format(path_to_db))
-    df.to_sql(name=table_name, con=disk_engine)
+    return pd.read_sql_table(table_name, disk_engine, index_col='index')
 
 
 def _write_dwellings_table(households, config, path_to_db):
-    df = pd.DataFrame(
+    _df_to_input_db(_dwellings_df(households, config), uo.DWELLINGS_TABLE_NAME, path_to_db)
+
+
+def _dwellings_df(households, config):
+    return pd.DataFrame(
         index=[household.id for household in households],
         data={
             'thermalMassCapacity': config['dwelling']['thermal-mass-capacity'],
@@ -218,12 +882,15 @@ def _write_dwellings_table(households, config, path_to_db):
             'region': [household.region for household in households]
         }
     )
-    _df_to_input_db(df, uo.DWELLINGS_TABLE_NAME, path_to_db)
 
 
 def _write_citizens_table(citizens, path_to_db):
-    df = pd.DataFrame(
-        index=list(range(len(citizens))),
+    _df_to_input_db(_citizens_df(citizens), uo.PEOPLE_TABLE_NAME, path_to_db)
+
+
+def _citizens_df(citizens, first_index=0):
+    return pd.DataFrame(
+        index=list(range(first_index, first_index + len(citizens))),
         data={
             'markovChainId': [citizen.markovId for citizen in citizens],
             'dwellingId': [citizen.householdId for citizen in citizens],
@@ -233,7 +900,6 @@ def _write_citizens_table(citizens, path_to_db):
             'randomSeed': [citizen.randomSeed for citizen in citizens]
         }
     )
-    _df_to_input_db(df, uo.PEOPLE_TABLE_NAME, path_to_db)
 
 
 def _write_markov_chains(markov_chains, path_to_db):
@@ -297,4 +963,4 @@ def _write_simulation_parameter_table(config, path_to_db):
 
 
 if __name__ == '__main__':
-    simulation_input()
+    cli()
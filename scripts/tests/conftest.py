@@ -0,0 +1,121 @@
+"""Fixtures running `simulationinput.py` on a small synthetic seed and census."""
+from datetime import time
+from pathlib import Path
+import random
+import sys
+
+from click.testing import CliRunner
+import pandas as pd
+import pytest
+import requests_cache
+import yaml
+
+import urbanoccupants as uo
+from urbanoccupants.types import AgeStructure, Pseudo
+
+SCRIPTS_PATH = Path(__file__).parent.parent
+sys.path.append(SCRIPTS_PATH.as_posix())
+import simulationinput # noqa: E402
+requests_cache.uninstall_cache() # installed when importing simulationinput
+
+PATH_TO_DEFAULT_CONFIG = SCRIPTS_PATH.parent / 'config' / 'default.yaml'
+REGIONS = ['E01000001', 'E01000002', 'E01000003', 'E01000004']
+AGES = [AgeStructure.AGE_0_TO_4, AgeStructure.AGE_20_TO_24, AgeStructure.AGE_30_TO_44,
+        AgeStructure.AGE_65_TO_74]
+NUMBER_SEED_HOUSEHOLDS = 40
+
+
+def census_data_of_regions(number_households):
+    """Census data of households of average size 2.4, all ages equally frequent."""
+    households = pd.DataFrame(index=REGIONS, data={Pseudo.SINGLETON: number_households})
+    people = {}
+    for region, households_of_region in zip(REGIONS, number_households):
+        number_people = int(households_of_region * 2.4)
+        people[region] = {age: number_people // len(AGES) for age in AGES}
+        people[region][AGES[0]] += number_people - sum(people[region].values())
+    return {
+        uo.HouseholdFeature.PSEUDO: households,
+        uo.PeopleFeature.AGE: pd.DataFrame.from_dict(people, orient='index')[AGES]
+    }
+
+
+@pytest.fixture
+def census_data(monkeypatch):
+    """Census data read by the script, tests may replace the data of features."""
+    census_data = census_data_of_regions([60, 70, 80, 90])
+    for feature in census_data.keys():
+        monkeypatch.setattr(feature, '_census_read_function',
+                            lambda geographical_layer, feature=feature: census_data[feature])
+    yield census_data
+    uo.census.use_census_store(None)
+    uo.census.aggregate_output_areas(False)
+
+
+def seed_and_markov_ts():
+    rnd = random.Random('simulation input tests')
+    people = [(1, household, person, rnd.choice(AGES))
+              for household in range(1, NUMBER_SEED_HOUSEHOLDS + 1)
+              for person in range(1, rnd.choice([1, 2, 2, 3, 4]) + 1)]
+    index = pd.MultiIndex.from_tuples([person[:3] for person in people],
+                                      names=uo.tus.SEED_INDEX_LEVELS)
+    seed = pd.DataFrame(index=index, data={
+        str(uo.PeopleFeature.AGE): [person[3] for person in people],
+        str(uo.HouseholdFeature.PSEUDO): Pseudo.SINGLETON
+    })
+    time_steps = [time(hour, 0) for hour in range(24)]
+    markov_index = pd.MultiIndex.from_tuples(
+        [person[:3] + (daytype, time_step)
+         for person in people
+         for daytype in ['weekday', 'weekend']
+         for time_step in time_steps],
+        names=uo.tus.SEED_INDEX_LEVELS + ['daytype', 'time_of_day']
+    )
+    markov_ts = pd.Series(index=markov_index, name='activity',
+                          data=[rnd.choice(list(uo.Activity)) for unused in markov_index])
+    return seed, markov_ts
+
+
+@pytest.fixture
+def inputs(tmpdir, census_data, monkeypatch):
+    """Paths to seed, markov time series, and config; as dict to be changed by tests."""
+    seed, markov_ts = seed_and_markov_ts()
+    seed.to_pickle(tmpdir.join('seed.pickle').strpath)
+    markov_ts.to_pickle(tmpdir.join('markov-ts.pickle').strpath)
+    config = yaml.safe_load(PATH_TO_DEFAULT_CONFIG.read_text())
+    config.update({
+        'people-features': ['AGE'],
+        'household-features': ['PSEUDO'],
+        'time-step-size-minutes': 60,
+        'number-processes': 1,
+        'number-time-steps': 24
+    })
+    tmpdir.join('config.yaml').write(yaml.safe_dump(config))
+    midas = ['MIDAS hourly weather', 'Date (MM/DD/YYYY),Time (HH:MM),Dry-bulb (C)']
+    midas += ['01/07/2005,{}:00,{}'.format(hour, hour / 2) for hour in range(1, 25)]
+    tmpdir.join('midas.csv').write('\n'.join(midas))
+    monkeypatch.setattr(simulationinput, 'MIDAS_DATABASE_PATH', Path(tmpdir.join('midas.csv')))
+    monkeypatch.setattr(simulationinput, 'CENSUS_STORE_PATH', Path(tmpdir.join('census-store')))
+    return {
+        'seed': tmpdir.join('seed.pickle').strpath,
+        'markov-ts': tmpdir.join('markov-ts.pickle').strpath,
+        'config': tmpdir.join('config.yaml').strpath
+    }
+
+
+@pytest.fixture
+def create(inputs):
+    """Runs `simulationinput.py create` on the inputs, and fails on errors by default."""
+    def create(path_to_result, *options, expect_success=True):
+        result = CliRunner().invoke(
+            simulationinput.cli,
+            ['create', inputs['seed'], inputs['markov-ts'], inputs['config'],
+             str(path_to_result)] + list(options)
+        )
+        if expect_success and result.exit_code != 0:
+            raise result.exception if result.exception else AssertionError(result.output)
+        return result
+    return create
+
+
+def read_table(table_name, path_to_db):
+    return simulationinput._read_input_db_table(table_name, path_to_db)
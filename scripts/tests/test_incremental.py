@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+import yaml
+
+import urbanoccupants as uo
+
+import simulationinput
+from conftest import census_data_of_regions, read_table, REGIONS
+
+
+@pytest.fixture
+def result(tmpdir, create):
+    path_to_result = tmpdir.join('result.db').strpath
+    create(path_to_result)
+    return path_to_result
+
+
+def test_unchanged_inputs_keep_population(result, create, monkeypatch):
+    dwellings = read_table(uo.DWELLINGS_TABLE_NAME, result)
+    people = read_table(uo.PEOPLE_TABLE_NAME, result)
+    monkeypatch.setattr(simulationinput, '_create_markov_chains', pytest.fail)
+
+    create(result, '--incremental')
+
+    pd.testing.assert_frame_equal(read_table(uo.DWELLINGS_TABLE_NAME, result), dwellings)
+    pd.testing.assert_frame_equal(read_table(uo.PEOPLE_TABLE_NAME, result), people)
+
+
+def test_changed_region_is_replaced_only(result, create, census_data, monkeypatch):
+    dwellings = read_table(uo.DWELLINGS_TABLE_NAME, result)
+    people = read_table(uo.PEOPLE_TABLE_NAME, result)
+    census_data.update(census_data_of_regions([60, 70, 100, 90]))
+    monkeypatch.setattr(simulationinput, '_create_markov_chains', pytest.fail)
+
+    create(result, '--incremental')
+
+    new_dwellings = read_table(uo.DWELLINGS_TABLE_NAME, result)
+    new_people = read_table(uo.PEOPLE_TABLE_NAME, result)
+    unchanged = dwellings.region != REGIONS[2]
+    pd.testing.assert_frame_equal(new_dwellings[new_dwellings.region != REGIONS[2]],
+                                  dwellings[unchanged])
+    assert (new_dwellings.region == REGIONS[2]).sum() == 100
+    assert new_dwellings[new_dwellings.region == REGIONS[2]].index.min() > dwellings.index.max()
+    pd.testing.assert_frame_equal(
+        new_people[new_people.dwellingId.isin(dwellings.index[unchanged])],
+        people[people.dwellingId.isin(dwellings.index[unchanged])]
+    )
+    assert new_people.dwellingId.isin(new_dwellings.index).all()
+    households, citizens = uo.Snapshot(simulationinput._snapshot_path(result)).population()
+    assert sorted(household.id for household in households) == sorted(new_dwellings.index)
+    assert len(citizens) == len(new_people)
+
+
+def test_changed_seed_fails(result, create, inputs):
+    seed = pd.read_pickle(inputs['seed'])
+    seed.iloc[0, 0] = uo.types.AgeStructure.AGE_90_AND_OVER
+    seed.to_pickle(inputs['seed'])
+
+    outcome = create(result, '--incremental', expect_success=False)
+
+    assert isinstance(outcome.exception, ValueError)
+    assert 'seed-digest' in str(outcome.exception)
+
+
+@pytest.mark.parametrize('change', [
+    lambda config: config['dwelling'].update({'floor-area': 200}),
+    lambda config: config.update({'metabolic-heat-gain-active': 200}),
+    lambda config: config.update({'time-step-size-minutes': 30})
+])
+def test_changed_config_fails(result, create, inputs, change):
+    with open(inputs['config'], 'r') as config_file:
+        config = yaml.safe_load(config_file)
+    change(config)
+    with open(inputs['config'], 'w') as config_file:
+        yaml.safe_dump(config, config_file)
+
+    outcome = create(result, '--incremental', expect_success=False)
+
+    assert isinstance(outcome.exception, ValueError)
+    assert 'config-digest' in str(outcome.exception)
+
+
+def test_changed_number_of_processes_is_fine(result, create, inputs):
+    with open(inputs['config'], 'r') as config_file:
+        config = yaml.safe_load(config_file)
+    config['number-processes'] = 2
+    with open(inputs['config'], 'w') as config_file:
+        yaml.safe_dump(config, config_file)
+
+    create(result, '--incremental')
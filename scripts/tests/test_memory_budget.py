@@ -0,0 +1,102 @@
+import threading
+import tracemalloc
+
+import pandas as pd
+import pytest
+import yaml
+
+import urbanoccupants as uo
+
+import simulationinput
+from conftest import census_data_of_regions, read_table, seed_and_markov_ts, \
+    PATH_TO_DEFAULT_CONFIG, REGIONS
+
+TIMEOUT = 5 # seconds
+
+
+def acquire_in_thread(budget, number_households):
+    acquired = threading.Event()
+
+    def acquire():
+        budget.acquire(number_households)
+        acquired.set()
+    threading.Thread(target=acquire, daemon=True).start()
+    return acquired
+
+
+def test_acquire_within_capacity():
+    budget = simulationinput._HouseholdBudget(10)
+    assert acquire_in_thread(budget, 4).wait(TIMEOUT)
+    assert acquire_in_thread(budget, 6).wait(TIMEOUT)
+
+
+def test_acquire_waits_for_release():
+    budget = simulationinput._HouseholdBudget(10)
+    budget.acquire(8)
+    acquired = acquire_in_thread(budget, 5)
+    assert not acquired.wait(0.1)
+    budget.release(8)
+    assert acquired.wait(TIMEOUT)
+
+
+def test_request_larger_than_capacity_is_granted_when_nothing_in_flight():
+    budget = simulationinput._HouseholdBudget(10)
+    assert acquire_in_thread(budget, 50).wait(TIMEOUT)
+    acquired = acquire_in_thread(budget, 1)
+    assert not acquired.wait(0.1)
+    budget.release(50)
+    assert acquired.wait(TIMEOUT)
+
+
+def test_close_releases_waiting_requests():
+    budget = simulationinput._HouseholdBudget(10)
+    budget.acquire(10)
+    acquired = acquire_in_thread(budget, 1)
+    assert not acquired.wait(0.1)
+    budget.close()
+    assert acquired.wait(TIMEOUT)
+
+
+def test_regions_larger_than_budget(tmpdir, create, monkeypatch):
+    path_to_unbudgeted = tmpdir.join('unbudgeted.db').strpath
+    path_to_budgeted = tmpdir.join('budgeted.db').strpath
+    create(path_to_unbudgeted)
+    # 1 MB holds 50 households, but each region has more
+    monkeypatch.setattr(simulationinput, 'ESTIMATED_BYTES_PER_HOUSEHOLD', 1024 ** 2 // 2 // 50)
+
+    create(path_to_budgeted, '--memory-budget', '1')
+
+    for table_name in [uo.DWELLINGS_TABLE_NAME, uo.PEOPLE_TABLE_NAME]:
+        pd.testing.assert_frame_equal(read_table(table_name, path_to_budgeted),
+                                      read_table(table_name, path_to_unbudgeted))
+
+
+def test_estimated_bytes_per_household_cover_population_and_tables():
+    seed, unused = seed_and_markov_ts()
+    seed = uo.tus.to_integer_keys(uo.encode_features(seed), uo.tus.integer_seed_lookup(seed.index))
+    seed['markov_id'] = 1
+    seed['initial_activity'] = uo.Activity.SLEEP_AT_HOME
+    config = yaml.safe_load(PATH_TO_DEFAULT_CONFIG.read_text())
+    seed = simulationinput._amend_seed_by_metabolic_rate(seed, config)
+    number_households = 5000
+    census_data = census_data_of_regions([number_households] * len(REGIONS))
+    controls_hh = uo.census.CensusCube({uo.HouseholdFeature.PSEUDO:
+                                        census_data[uo.HouseholdFeature.PSEUDO]})
+    controls_ppl = uo.census.CensusCube({uo.PeopleFeature.AGE:
+                                         census_data[uo.PeopleFeature.AGE]})
+
+    tracemalloc.start()
+    try:
+        unused, households, citizens = uo.synthpop.synthesise_region(
+            (seed, controls_hh, controls_ppl, REGIONS[0], range(1, number_households + 1),
+             uo.synthpop.INDEPENDENT_SAMPLING)
+        )
+        dwellings = simulationinput._dwellings_df(households, config)
+        people = simulationinput._citizens_df(citizens)
+        unused, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(dwellings) == number_households
+    assert len(people) / number_households == pytest.approx(2.4, abs=0.1)
+    assert peak / number_households < simulationinput.ESTIMATED_BYTES_PER_HOUSEHOLD
@@ -0,0 +1,69 @@
+from click.testing import CliRunner
+import pandas as pd
+import pytest
+import sqlalchemy
+
+import urbanoccupants as uo
+
+import simulationinput
+
+
+@pytest.fixture
+def shards(tmpdir, create):
+    paths_to_shards = [tmpdir.join('shard-{}.pickle'.format(i)).strpath for i in [1, 2]]
+    for i, path_to_shard in enumerate(paths_to_shards, start=1):
+        create(path_to_shard, '--shard', '{}/2'.format(i))
+    return paths_to_shards
+
+
+def merge(inputs, path_to_result, paths_to_shards):
+    return CliRunner().invoke(
+        simulationinput.cli,
+        ['merge', inputs['config'], path_to_result] + paths_to_shards
+    )
+
+
+def test_merged_shards_equal_run_without_shards(tmpdir, inputs, create, shards):
+    path_to_unsharded = tmpdir.join('unsharded.db').strpath
+    path_to_merged = tmpdir.join('merged.db').strpath
+    create(path_to_unsharded)
+
+    outcome = merge(inputs, path_to_merged, shards)
+
+    assert outcome.exit_code == 0, outcome.output
+    unsharded_db = sqlalchemy.create_engine('sqlite:///{}'.format(path_to_unsharded))
+    merged_db = sqlalchemy.create_engine('sqlite:///{}'.format(path_to_merged))
+    table_names = sqlalchemy.inspect(unsharded_db).get_table_names()
+    assert sqlalchemy.inspect(merged_db).get_table_names() == table_names
+    for table_name in table_names:
+        pd.testing.assert_frame_equal(pd.read_sql_table(table_name, merged_db),
+                                      pd.read_sql_table(table_name, unsharded_db))
+    for path in [simulationinput._manifest_path, simulationinput._fit_quality_path,
+                 simulationinput._seed_index_path]:
+        assert path(path_to_merged).read_text() == path(path_to_unsharded).read_text()
+    assert (uo.Snapshot(simulationinput._snapshot_path(path_to_merged)).population() ==
+            uo.Snapshot(simulationinput._snapshot_path(path_to_unsharded)).population())
+
+
+def test_merge_fails_for_different_markov_chains(tmpdir, inputs, shards):
+    shard = pd.read_pickle(shards[1])
+    key = list(shard['markov-chains'].keys())[0]
+    shard['markov-chains'] = dict(shard['markov-chains'],
+                                  **{'other': shard['markov-chains'][key]})
+    pd.to_pickle(shard, shards[1])
+
+    outcome = merge(inputs, tmpdir.join('merged.db').strpath, shards)
+
+    assert isinstance(outcome.exception, ValueError)
+    assert 'markov chains' in str(outcome.exception)
+
+
+def test_merge_fails_for_different_seed_index(tmpdir, inputs, shards):
+    shard = pd.read_pickle(shards[1])
+    shard['seed-index'] = shard['seed-index'].iloc[:-1]
+    pd.to_pickle(shard, shards[1])
+
+    outcome = merge(inputs, tmpdir.join('merged.db').strpath, shards)
+
+    assert isinstance(outcome.exception, ValueError)
+    assert 'seeds' in str(outcome.exception)
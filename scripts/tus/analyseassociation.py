@@ -22,11 +22,11 @@ def analyse_association(path_to_seed, path_to_ts_association, path_to_full_resul
     stats = pd.DataFrame({
         'mean_association': ts_association.mean(),
         'std_association': ts_association.std(),
-        'min_cluster_size': [seed.groupby(features).size().min()
+        'min_cluster_size': [seed.groupby(features, observed=True).size().min()
                              for features in ts_association.columns],
-        'mean_cluster_size': [seed.groupby(features).size().mean()
+        'mean_cluster_size': [seed.groupby(features, observed=True).size().mean()
                               for features in ts_association.columns],
-        'std_cluster_size': [seed.groupby(features).size().std()
+        'std_cluster_size': [seed.groupby(features, observed=True).size().std()
                              for features in ts_association.columns]
     })
     stats.sort_values(by='mean_association', ascending=False, inplace=True)
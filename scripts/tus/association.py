@@ -95,12 +95,7 @@ def _cramers_phi_for_feature(seed):
     if not isinstance(seed, pd.Series) and not isinstance(seed, pd.DataFrame):
         raise ValueError('Seed must be pandas series or dataframe, but was {}.'
                          .format(type(seed)))
-    if seed.shape[1] == 1: # 1 feature
-        if isinstance(seed, pd.DataFrame):
-            seed = seed.iloc[:, 0] # not sure why, but apply on a single-columned df fails
-        feature_ids = seed.apply(uo.feature_id)
-    else: # 2 or more features
-        feature_ids = seed.apply(uo.feature_id, axis=1)
+    feature_ids = pd.Series(uo.feature_ids(seed), index=seed.index)
 
     def cramers_phi(series):
         return cramers_corrected_stat(pd.crosstab(series.values, feature_ids))
@@ -4,7 +4,7 @@ import click
 import pandas as pd
 import pytus2000
 
-from urbanoccupants import PeopleFeature, HouseholdFeature
+from urbanoccupants import PeopleFeature, HouseholdFeature, encode_features
 from urbanoccupants.types import HouseholdType
 from urbanoccupants.tus import filter_features_and_drop_nan
 
@@ -22,14 +22,15 @@ def read_seed(path_to_input, path_to_output):
     e.g. a couple with children household must have at least 3 individuals, otherwise
     it is discarded as well.
 
-    Output is written in plain pickle format.
+    Output is written in plain pickle format, with all features encoded as ordered
+    categoricals.
     """
     individual_data = _read_raw_data(path_to_input)
     print("Read {} individuals.".format(individual_data.shape[0]))
     seed = _map_to_internal_types(individual_data)
     seed = _filter_invalid_households(seed)
     print("Write {} individuals.".format(seed.shape[0]))
-    seed.to_pickle(path_to_output)
+    encode_features(seed).to_pickle(path_to_output)
 
 
 def _read_raw_data(path_to_input):
@@ -151,6 +151,7 @@ def read_seed_uktus15(path_to_input, path_to_output):
     print(f"Age non-null: {age_nonnull} ({age_pct:.1f}%)")
     print(f"Economic activity non-null: {econ_nonnull} ({econ_pct:.1f}%)")
     
+    seed = uo.encode_features(seed)
     seed.to_pickle(path_to_output)
     print(f"Wrote seed to {path_to_output}")
 
@@ -0,0 +1,25 @@
+"""Fake nomis responses shared by the census tests."""
+from unittest.mock import Mock
+
+import urbanoccupants.census as census
+
+
+REGIONS = ['E01000001', 'E01000002']
+
+
+def nomis_csv(cell_names):
+    rows = ['"GEOGRAPHY_CODE","CELL_NAME","OBS_VALUE"']
+    rows += ['"{}","{}",{}'.format(region, cell_name, i + 1)
+             for region in REGIONS
+             for i, cell_name in enumerate(cell_names)]
+    return '\n'.join(rows).encode('utf-8')
+
+
+def fake_nomis(url, **kwargs):
+    if census.NOMIS_KS102EW_DATASET_ID in url:
+        content = nomis_csv(census.AGE_STRUCTURE_MAP.keys())
+    elif census.NOMIS_KS601EW_DATASET_ID in url:
+        content = nomis_csv(census.ECONOMIC_ACTIVITY_MAP.keys())
+    else:
+        raise ValueError(url)
+    return Mock(content=content)
@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+from urbanoccupants.synthpop import AliasTable, sample_households
+
+
+NUMBER_DRAWS = 20000
+
+
+@pytest.fixture
+def household_weights():
+    return pd.Series(
+        index=[(1, 1), (1, 2), (2, 1), (3, 1)],
+        data=[10.5, 0.5, 4.0, 5.0]
+    )
+
+
+@pytest.fixture
+def random_numbers():
+    random.seed('alias table tests')
+    return [random.uniform(0, 1) for unused in range(NUMBER_DRAWS)]
+
+
+@pytest.fixture
+def alias_table(household_weights):
+    return AliasTable(household_weights)
+
+
+def test_probabilities_are_preserved(alias_table, household_weights, random_numbers):
+    samples = pd.Series(list(alias_table.sample(random_numbers)))
+    frequencies = samples.value_counts(normalize=True)
+    expected = household_weights / household_weights.sum()
+    for household_id, probability in expected.items():
+        assert frequencies[household_id] == pytest.approx(probability, abs=0.01)
+
+
+def test_every_column_is_a_valid_distribution(alias_table):
+    df = alias_table.to_dataframe()
+    assert ((df.probability >= 0) & (df.probability <= 1 + 1e-12)).all()
+    assert df.alias.between(0, len(df) - 1).all()
+
+
+def test_reconstructs_weights(alias_table, household_weights):
+    # the mass of a household is its own column plus all columns aliasing to it
+    df = alias_table.to_dataframe()
+    mass = np.array(df.probability, dtype=np.float64)
+    np.add.at(mass, df.alias.values, 1 - df.probability.values)
+    np.testing.assert_allclose(
+        mass / len(df),
+        household_weights.values / household_weights.sum()
+    )
+
+
+def test_sampling_is_deterministic(alias_table, random_numbers):
+    assert list(alias_table.sample(random_numbers)) == list(alias_table.sample(random_numbers))
+
+
+def test_serialisation_round_trip(alias_table, random_numbers):
+    restored = AliasTable.from_dataframe(alias_table.to_dataframe())
+    assert_frame_equal(restored.to_dataframe(), alias_table.to_dataframe())
+    assert list(restored.sample(random_numbers)) == list(alias_table.sample(random_numbers))
+
+
+def test_zero_weight_is_never_sampled(random_numbers):
+    table = AliasTable(pd.Series(index=['a', 'b', 'c'], data=[1.0, 0.0, 3.0]))
+    assert 'b' not in set(table.sample(random_numbers))
+
+
+@pytest.mark.parametrize('weights', [[], [1.0, -1.0], [0.0, 0.0], [1.0, np.nan]])
+def test_invalid_weights_fail(weights):
+    with pytest.raises(ValueError):
+        AliasTable(pd.Series(data=weights, dtype=np.float64))
+
+
+def test_households_can_be_sampled_from_alias_table(alias_table, household_weights,
+                                                    random_numbers):
+    household_ids = list(range(1, len(random_numbers) + 1))
+    households = sample_households(
+        ('region', None, alias_table, random_numbers, household_ids)
+    )
+    assert [household.id for household in households] == household_ids
+    assert all(household.region == 'region' for household in households)
+    assert set(household.seedId for household in households) == set(household_weights.index)
@@ -0,0 +1,65 @@
+from unittest.mock import patch
+
+import pytest
+
+import urbanoccupants.census as census
+from urbanoccupants import PeopleFeature
+from urbanoccupants.types import EconomicActivity
+
+from nomis_fakes import fake_nomis
+
+
+@pytest.fixture
+def requests_get():
+    census.invalidate_census_data_cache()
+    with patch.object(census.requests, 'get', side_effect=fake_nomis) as requests_get:
+        yield requests_get
+    census.invalidate_census_data_cache()
+
+
+def test_data_is_read_only_once(requests_get):
+    first = census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    second = census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    assert requests_get.call_count == 1
+    assert first is second
+
+
+def test_data_is_read_for_each_layer(requests_get):
+    census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    census.read_age_structure_data(census.GeographicalLayer.MSOA)
+    assert requests_get.call_count == 2
+
+
+def test_data_is_read_only(requests_get):
+    data = census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    with pytest.raises(ValueError):
+        data.iloc[0, 0] = 42
+
+
+def test_invalidation(requests_get):
+    census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    census.invalidate_census_data_cache(dataset_id=census.NOMIS_KS102EW_DATASET_ID)
+    census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    assert requests_get.call_count == 2
+
+
+def test_invalidation_of_other_layer_keeps_data(requests_get):
+    census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    census.invalidate_census_data_cache(geographical_layer=census.GeographicalLayer.MSOA)
+    census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    assert requests_get.call_count == 1
+
+
+def test_feature_data_reads_each_table_once(requests_get):
+    data = PeopleFeature.ECONOMIC_ACTIVITY.read_census_data(census.GeographicalLayer.LSOA)
+    PeopleFeature.AGE.read_census_data(census.GeographicalLayer.LSOA)
+    census.read_pseudo_individual_data(census.GeographicalLayer.LSOA)
+    assert requests_get.call_count == 2
+    assert EconomicActivity.BELOW_16 in data.columns
+    assert EconomicActivity.ABOVE_74 in data.columns
+
+
+def test_feature_data_does_not_alter_memoised_data(requests_get):
+    PeopleFeature.ECONOMIC_ACTIVITY.read_census_data(census.GeographicalLayer.LSOA)
+    memoised = census.read_economic_activity_data(census.GeographicalLayer.LSOA)
+    assert EconomicActivity.BELOW_16 not in memoised.columns
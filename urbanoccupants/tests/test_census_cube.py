@@ -0,0 +1,83 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from urbanoccupants import PeopleFeature, HouseholdFeature
+from urbanoccupants.census import CensusCube
+from urbanoccupants.types import AgeStructure, HouseholdType
+
+
+@pytest.fixture
+def census_data():
+    return {
+        PeopleFeature.AGE: pd.DataFrame(
+            index=['E02', 'E01', 'E03'],
+            data={AgeStructure.AGE_0_TO_4: [2, 1, 3], AgeStructure.AGE_5_TO_7: [20, 10, 30]}
+        ),
+        HouseholdFeature.HOUSEHOLD_TYPE: pd.DataFrame(
+            index=['E01', 'E02', 'E03'],
+            data={HouseholdType.ONE_PERSON_HOUSEHOLD: [4, 5, 6]}
+        )
+    }
+
+
+@pytest.fixture
+def cube(census_data):
+    return CensusCube(census_data)
+
+
+def test_shared_regions(cube):
+    assert cube.regions == ['E01', 'E02', 'E03']
+    assert cube.region_code('E02') == 1
+
+
+def test_arrays(cube):
+    assert cube.features == [str(PeopleFeature.AGE), str(HouseholdFeature.HOUSEHOLD_TYPE)]
+    assert cube.array(PeopleFeature.AGE).dtype == np.int64
+    assert cube.array(PeopleFeature.AGE).tolist() == [[1, 10], [2, 20], [3, 30]]
+    assert cube.array(HouseholdFeature.HOUSEHOLD_TYPE).tolist() == [[4], [5], [6]]
+    assert cube.categories(PeopleFeature.AGE) == [AgeStructure.AGE_0_TO_4,
+                                                  AgeStructure.AGE_5_TO_7]
+
+
+def test_total_is_row_sum_of_first_feature(cube):
+    assert cube.total('E02') == 22
+    assert isinstance(cube.total('E02'), int)
+
+
+def test_controls_equal_census_data(cube, census_data):
+    controls = cube.controls('E03')
+    for feature, data in census_data.items():
+        assert controls[str(feature)] == data.loc['E03', :].to_dict()
+
+
+def test_subset(cube):
+    subset = cube.subset(['E03', 'E01'])
+    assert subset.regions == ['E01', 'E03']
+    assert subset.controls('E03') == cube.controls('E03')
+    with pytest.raises(KeyError):
+        subset.controls('E02')
+
+
+def test_subset_of_unknown_region_fails(cube):
+    with pytest.raises(ValueError):
+        cube.subset(['E04'])
+
+
+def test_cube_can_be_sent_to_workers(cube):
+    subset = pickle.loads(pickle.dumps(cube.subset(['E02'])))
+    assert subset.controls('E02') == cube.controls('E02')
+
+
+def test_round_trip(cube, census_data):
+    cube_data = cube.to_census_data()
+    for feature, data in census_data.items():
+        assert cube_data[str(feature)].equals(data.sort_index())
+
+
+def test_different_regions_fail(census_data):
+    census_data[PeopleFeature.AGE] = census_data[PeopleFeature.AGE].iloc[1:]
+    with pytest.raises(ValueError):
+        CensusCube(census_data)
@@ -0,0 +1,161 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from pandas.testing import assert_frame_equal
+import pytest
+import requests
+
+import urbanoccupants.census as census
+
+
+RECORDED_NOMIS_PATH = Path(__file__).parent / 'resources' / 'nomis'
+RESPONSE_DELAY = 0.05 # seconds, so that concurrent requests overlap
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class NomisStandIn():
+    """A local HTTP server answering nomis queries with recorded nomis CSVs.
+
+    The dataset is taken from the url path, of the query only paging is considered. The
+    stand-in records all requests, the maximum number of concurrent requests, and can fail the
+    first requests.
+    """
+
+    def __init__(self, number_failing_requests=0):
+        self.requests = []
+        self.max_concurrent_requests = 0
+        self.number_failing_requests = number_failing_requests
+        self.__concurrent_requests = 0
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), self.__handler())
+        self.url = 'http://127.0.0.1:{}/api/v01/dataset/'.format(self.__server.server_port)
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, content = stand_in._respond(self.path)
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/csv')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+        return Handler
+
+    def _respond(self, path):
+        with self.__lock:
+            self.requests.append(path)
+            failing = len(self.requests) <= self.number_failing_requests
+            self.__concurrent_requests += 1
+            self.max_concurrent_requests = max(self.max_concurrent_requests,
+                                               self.__concurrent_requests)
+        time.sleep(RESPONSE_DELAY)
+        with self.__lock:
+            self.__concurrent_requests -= 1
+        if failing:
+            return 503, b'Service Unavailable'
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        dataset_id = url.path.split('/')[-1].split('.')[0]
+        header, *rows = (RECORDED_NOMIS_PATH / '{}.csv'.format(dataset_id)).read_bytes()\
+            .splitlines(keepends=True)
+        offset = int(query.get('recordoffset', [0])[0])
+        limit = int(query.get('recordlimit', [len(rows)])[0])
+        return 200, b''.join([header] + rows[offset:offset + limit])
+
+
+@pytest.fixture
+def store(tmpdir, monkeypatch):
+    monkeypatch.setattr(census, 'RETRY_BACKOFF', 0.01)
+    census.invalidate_census_data_cache()
+    census.use_census_store(tmpdir.join('census-store'))
+    yield tmpdir.join('census-store')
+    census.invalidate_census_data_cache()
+    census.use_census_store(None)
+
+
+@pytest.fixture
+def nomis(monkeypatch):
+    with NomisStandIn() as nomis:
+        monkeypatch.setattr(census, 'NOMIS_API_URL', nomis.url)
+        yield nomis
+
+
+@pytest.fixture
+def flaky_nomis(monkeypatch):
+    with NomisStandIn(number_failing_requests=2) as nomis:
+        monkeypatch.setattr(census, 'NOMIS_API_URL', nomis.url)
+        yield nomis
+
+
+def test_prefetch_retrieves_each_pair_once(store, nomis):
+    census.prefetch_census_data()
+    assert len(nomis.requests) == 4 * len(census.GeographicalLayer)
+
+
+def test_prefetch_is_concurrent(store, nomis):
+    census.prefetch_census_data()
+    assert nomis.max_concurrent_requests > 1
+
+
+def test_prefetch_respects_concurrency_limit_per_host(store, nomis, monkeypatch):
+    monkeypatch.setattr(census, 'MAX_CONCURRENT_REQUESTS_PER_HOST', 2)
+    census.prefetch_census_data()
+    assert nomis.max_concurrent_requests == 2
+
+
+def test_warm_store_needs_no_requests(store, nomis):
+    census.prefetch_census_data()
+    census.invalidate_census_data_cache()
+    census.prefetch_census_data()
+    assert len(nomis.requests) == 4 * len(census.GeographicalLayer)
+
+
+def test_recorded_data_is_pivoted(store, nomis):
+    data = census.read_qualification_level_data(census.GeographicalLayer.LSOA)
+    assert list(data.index) == ['E01002040', 'E01002041', 'E01002042']
+    assert set(data.columns) == set(census.QUALIFICATION_MAP.values())
+
+
+def test_failing_requests_are_retried(store, flaky_nomis):
+    data = census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    assert len(flaky_nomis.requests) == 3
+    assert len(data.index) == 3
+
+
+def test_retries_are_limited(store, flaky_nomis, monkeypatch):
+    monkeypatch.setattr(census, 'MAX_RETRIES', 1)
+    with pytest.raises(requests.HTTPError):
+        census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    assert len(flaky_nomis.requests) == 2
+
+
+def test_pages_are_concatenated(store, nomis, monkeypatch):
+    monkeypatch.setattr(census, 'NOMIS_RECORD_LIMIT', 10)
+    data = census.read_economic_activity_data(census.GeographicalLayer.WARD)
+    census.invalidate_census_data_cache()
+    census.use_census_store(None)
+    monkeypatch.setattr(census, 'NOMIS_RECORD_LIMIT', 25000)
+    single_page = census.read_economic_activity_data(census.GeographicalLayer.WARD)
+    assert len(nomis.requests) == 5 # 30 records: three full pages, one empty, one single page
+    assert_frame_equal(data, single_page)
@@ -0,0 +1,110 @@
+from unittest.mock import Mock, patch
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+import urbanoccupants.census as census
+
+from nomis_fakes import REGIONS, fake_nomis, nomis_csv
+
+
+def fake_nomis_all_datasets(url, **kwargs):
+    if census.NOMIS_QS116EW_DATASET_ID in url:
+        rows = ['"GEOGRAPHY_CODE","C_AHTHUK11_NAME","OBS_VALUE"']
+        rows += ['"{}","{}",{}'.format(region, cell_name, i + 1)
+                 for region in REGIONS
+                 for i, cell_name in enumerate(census.HOUSEHOLDTYPE_MAP.keys())]
+        return Mock(content='\n'.join(rows).encode('utf-8'))
+    if census.NOMIS_KS501EW_DATASET_ID in url:
+        return Mock(content=nomis_csv(census.QUALIFICATION_MAP.keys()))
+    return fake_nomis(url)
+
+
+@pytest.fixture
+def requests_get():
+    census.invalidate_census_data_cache()
+    with patch.object(census.requests, 'get',
+                      side_effect=fake_nomis_all_datasets) as requests_get:
+        yield requests_get
+    census.invalidate_census_data_cache()
+    census.use_census_store(None)
+
+
+@pytest.fixture
+def store(tmpdir, requests_get):
+    census.use_census_store(tmpdir.join('census-store'))
+    return tmpdir.join('census-store')
+
+
+def test_data_is_written_to_store(store, requests_get):
+    census.read_age_structure_data(census.GeographicalLayer.LSOA)
+    assert store.join('{}-LSOA.npz'.format(census.NOMIS_KS102EW_DATASET_ID)).exists()
+
+
+def test_stored_data_equals_retrieved_data(store, requests_get):
+    retrieved = census.read_household_type_data(census.GeographicalLayer.LSOA)
+    census.invalidate_census_data_cache()
+    stored = census.read_household_type_data(census.GeographicalLayer.LSOA)
+    assert requests_get.call_count == 1
+    assert stored is not retrieved
+    assert_frame_equal(stored, retrieved)
+
+
+def test_prefetch_retrieves_all_datasets_and_layers(store, requests_get):
+    paths = census.prefetch_census_data()
+    assert len(paths) == 4 * len(census.GeographicalLayer)
+    assert all(path.exists() for path in paths)
+    assert requests_get.call_count == 4 * len(census.GeographicalLayer)
+
+
+def test_prefetch_keeps_stored_data(store, requests_get):
+    census.prefetch_census_data([census.GeographicalLayer.WARD])
+    census.invalidate_census_data_cache()
+    census.prefetch_census_data([census.GeographicalLayer.WARD])
+    assert requests_get.call_count == 4
+
+
+def test_offline_after_prefetch(store, requests_get):
+    census.prefetch_census_data([census.GeographicalLayer.MSOA])
+    census.invalidate_census_data_cache()
+    census.use_census_store(store, offline=True)
+    census.read_qualification_level_data(census.GeographicalLayer.MSOA)
+    census.read_economic_activity_data(census.GeographicalLayer.MSOA)
+    assert requests_get.call_count == 4
+
+
+def test_offline_fails_for_missing_data(store, requests_get):
+    census.use_census_store(store, offline=True)
+    with pytest.raises(ValueError):
+        census.read_age_structure_data(census.GeographicalLayer.OA)
+    assert requests_get.call_count == 0
+
+
+def test_prefetch_needs_store(requests_get):
+    with pytest.raises(ValueError):
+        census.prefetch_census_data()
+
+
+@pytest.fixture
+def read_shape_file():
+    shapes = pd.DataFrame(index=pd.Index(REGIONS, name='LSOA11CD'), data={'area': [1.5, 2.5]})
+    with patch.object(census, '_read_haringey_shape_file',
+                      return_value=shapes) as read_shape_file:
+        yield read_shape_file
+
+
+def test_shapes_are_read_once_per_layer(store, read_shape_file):
+    first = census.read_haringey_shape_file(census.GeographicalLayer.LSOA)
+    second = census.read_haringey_shape_file(census.GeographicalLayer.LSOA)
+    census.read_haringey_shape_file(census.GeographicalLayer.MSOA)
+    assert read_shape_file.call_count == 2
+    assert_frame_equal(first, second)
+    assert store.join('shapes-LSOA.pickle').exists()
+
+
+def test_offline_fails_for_missing_shapes(store, read_shape_file):
+    census.use_census_store(store, offline=True)
+    with pytest.raises(ValueError):
+        census.read_haringey_shape_file(census.GeographicalLayer.WARD)
+    assert read_shape_file.call_count == 0
@@ -0,0 +1,55 @@
+from multiprocessing import Pool
+import random
+
+import pytest
+
+from urbanoccupants.synthpop import run_chunk, in_chunk_order
+
+
+def squares(param_tuple):
+    first, last = param_tuple
+    return [x * x for x in range(first, last)]
+
+
+@pytest.fixture
+def tagged_results():
+    results = [(chunk_id, [chunk_id]) for chunk_id in range(20)]
+    random.Random('chunk order tests').shuffle(results)
+    return results
+
+
+def test_results_are_ordered_by_chunk_id(tagged_results):
+    assert list(in_chunk_order(tagged_results)) == [[chunk_id] for chunk_id in range(20)]
+
+
+def test_results_are_yielded_as_soon_as_possible():
+    results = in_chunk_order(iter([(1, 'b'), (0, 'a'), (2, 'c')]))
+    assert next(results) == 'a'
+    assert next(results) == 'b'
+    assert next(results) == 'c'
+
+
+def test_first_chunk_id():
+    assert list(in_chunk_order([(6, 'b'), (5, 'a')], first_chunk_id=5)) == ['a', 'b']
+
+
+def test_missing_chunk_fails():
+    with pytest.raises(ValueError):
+        list(in_chunk_order([(0, 'a'), (2, 'c')]))
+
+
+def test_duplicated_chunk_fails():
+    with pytest.raises(ValueError):
+        list(in_chunk_order([(0, 'a'), (0, 'a')]))
+
+
+def test_run_chunk_tags_result():
+    assert run_chunk((3, squares, (1, 4))) == (3, [1, 4, 9])
+
+
+@pytest.mark.parametrize('number_processes', [1, 3])
+def test_unordered_parallel_results_are_ordered(number_processes):
+    params = [(chunk_id, squares, (chunk_id * 10, chunk_id * 10 + 10)) for chunk_id in range(30)]
+    with Pool(number_processes) as pool:
+        results = list(in_chunk_order(pool.imap_unordered(run_chunk, params)))
+    assert results == [squares(param_tuple) for _, _, param_tuple in params]
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal, assert_series_equal
+import pytest
+
+from urbanoccupants import PeopleFeature, HouseholdFeature, encode_features, decode_features, \
+    feature_id, feature_ids
+from urbanoccupants.hipf import fit_hipf
+from urbanoccupants.types import AgeStructure, EconomicActivity, HouseholdType
+
+
+AGE = str(PeopleFeature.AGE)
+ECONOMIC_ACTIVITY = str(PeopleFeature.ECONOMIC_ACTIVITY)
+HOUSEHOLD_TYPE = str(HouseholdFeature.HOUSEHOLD_TYPE)
+
+
+@pytest.fixture
+def seed():
+    index = pd.MultiIndex.from_tuples([(1, 1), (1, 2), (2, 1), (3, 1), (3, 2)],
+                                      names=['household_id', 'person_id'])
+    return pd.DataFrame(
+        index=index,
+        data={
+            AGE: [AgeStructure.AGE_30_TO_44, AgeStructure.AGE_0_TO_4,
+                  AgeStructure.AGE_90_AND_OVER, AgeStructure.AGE_30_TO_44, np.nan],
+            ECONOMIC_ACTIVITY: [EconomicActivity.EMPLOYEE_FULL_TIME, EconomicActivity.BELOW_16,
+                                EconomicActivity.ABOVE_74, EconomicActivity.RETIRED,
+                                EconomicActivity.RETIRED],
+            HOUSEHOLD_TYPE: [HouseholdType.COUPLE_WITH_DEPENDENT_CHILDREN,
+                             HouseholdType.COUPLE_WITH_DEPENDENT_CHILDREN,
+                             HouseholdType.ONE_PERSON_HOUSEHOLD,
+                             HouseholdType.COUPLE_WITHOUT_DEPENDENT_CHILDREN,
+                             HouseholdType.COUPLE_WITHOUT_DEPENDENT_CHILDREN],
+            'other': [1, 2, 3, 4, 5]
+        }
+    )
+
+
+def test_feature_columns_are_encoded_as_int8(seed):
+    encoded = encode_features(seed)
+    for column in [AGE, ECONOMIC_ACTIVITY, HOUSEHOLD_TYPE]:
+        assert encoded[column].cat.codes.dtype == np.int8
+        assert encoded[column].cat.ordered
+    assert encoded['other'].dtype == seed['other'].dtype
+
+
+def test_categories_ordered_by_enum_value():
+    categories = list(PeopleFeature.AGE.categorical_dtype.categories)
+    assert categories == sorted(AgeStructure, key=lambda value: value.value)
+
+
+def test_round_trip(seed):
+    assert_frame_equal(decode_features(encode_features(seed)), seed)
+
+
+def test_encoding_twice_is_harmless(seed):
+    assert_frame_equal(encode_features(encode_features(seed)), encode_features(seed))
+
+
+def test_missing_values_are_preserved(seed):
+    assert encode_features(seed)[AGE].isnull().sum() == 1
+
+
+def test_comparison_with_enum(seed):
+    encoded = encode_features(seed)
+    assert_series_equal(
+        encoded[AGE] < AgeStructure.AGE_18_TO_19,
+        pd.Series([False, True, False, False, False], index=seed.index, name=AGE)
+    )
+
+
+def test_feature_ids_of_encoded_values(seed):
+    features = [ECONOMIC_ACTIVITY, HOUSEHOLD_TYPE]
+    expected = [feature_id(tuple(row)) for row in seed[features].itertuples(index=False)]
+    assert list(feature_ids(encode_features(seed)[features])) == expected
+
+
+def test_feature_ids_of_missing_values_fail(seed):
+    with pytest.raises(ValueError) as excinfo:
+        feature_ids(encode_features(seed)[[AGE]])
+    assert AGE in str(excinfo.value)
+
+
+def test_hipf_with_encoded_seed(seed):
+    seed = seed.drop([AGE], axis=1)
+    controls_households = {HOUSEHOLD_TYPE: {HouseholdType.COUPLE_WITH_DEPENDENT_CHILDREN: 10,
+                                            HouseholdType.ONE_PERSON_HOUSEHOLD: 20,
+                                            HouseholdType.COUPLE_WITHOUT_DEPENDENT_CHILDREN: 30}}
+    controls_individuals = {ECONOMIC_ACTIVITY: {EconomicActivity.EMPLOYEE_FULL_TIME: 20,
+                                                EconomicActivity.BELOW_16: 10,
+                                                EconomicActivity.ABOVE_74: 20,
+                                                EconomicActivity.RETIRED: 50}}
+    expected = fit_hipf(seed, controls_individuals, controls_households, maxiter=10)
+    actual = fit_hipf(encode_features(seed), controls_individuals, controls_households,
+                      maxiter=10)
+    assert_series_equal(actual, expected)
@@ -1,8 +1,12 @@
 from enum import Enum
+import itertools
 
+import numpy as np
 import pandas as pd
+import pytest
 
-from urbanoccupants.synthpop import feature_id, _pairing_function
+from urbanoccupants.synthpop import feature_id, feature_ids, compact_feature_ids, \
+    _pairing_function
 
 
 class Feature(Enum):
@@ -11,6 +15,9 @@ class Feature(Enum):
     C = 3
 
 
+ValueFeature = Enum('ValueFeature', [('VALUE_{}'.format(value), value) for value in range(16)])
+
+
 def test_1d_feature():
     assert feature_id(Feature.A) == 1
 
@@ -31,3 +38,52 @@ def test_3d_feature_tuple():
 def test_3d_tuple_series():
     assert (feature_id(pd.Series([Feature.A, Feature.B, Feature.C])) ==
             _pairing_function(_pairing_function(1, 2), 3))
+
+
+@pytest.mark.parametrize('feature_values', [
+    [(1, 2)],
+    [(1, 2, 3)],
+    [(0, 0, 0, 0), (15, 12, 7, 2), (3, 11, 5, 1)],
+    [(9, 4, 6, 2, 12), (0, 1, 0, 1, 0)]
+])
+def test_vectorised_ids_equal_scalar_ids(feature_values):
+    expected = [feature_id(tuple(ValueFeature(value) for value in values))
+                for values in feature_values]
+    assert list(feature_ids(np.array(feature_values))) == expected
+
+
+def test_vectorised_1d_ids_equal_values():
+    assert list(feature_ids([3, 1, 2])) == [3, 1, 2]
+
+
+def test_vectorised_ids_are_int64():
+    assert feature_ids(np.array([(1, 2), (3, 4)], dtype=np.int8)).dtype == np.int64
+
+
+def test_vectorised_ids_detect_overflow():
+    with pytest.raises(OverflowError):
+        feature_ids(np.array([(1000, 1000, 1000, 1000, 1000)]))
+
+
+@pytest.mark.parametrize('feature_values', [
+    (3_500_000_000, 0),
+    (3_500_000_001, 0),
+    (3_500_000_000, 1)
+])
+def test_vectorised_ids_close_to_int64_limit(feature_values):
+    x, y = feature_values
+    expected = (x + y) * (x + y + 1) // 2 + y
+    assert expected <= np.iinfo(np.int64).max
+    assert list(feature_ids(np.array([feature_values]))) == [expected]
+
+
+def test_compact_ids_are_dense():
+    radices = [16, 13, 8, 3, 12]
+    all_values = np.array(list(itertools.product(*[range(radix) for radix in radices])))
+    ids = compact_feature_ids(all_values, radices)
+    assert sorted(ids) == list(range(len(all_values)))
+
+
+def test_compact_ids_fail_for_values_outside_radix():
+    with pytest.raises(ValueError):
+        compact_feature_ids(np.array([(1, 3)]), [2, 3])
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from urbanoccupants.synthpop import Household, PeopleFeature, HouseholdFeature, \
+    population_totals, fit_quality, encode_features
+from urbanoccupants.types import AgeStructure, Pseudo
+
+
+@pytest.fixture
+def seed():
+    index = pd.MultiIndex.from_tuples(
+        [((1, 1), 1), ((1, 1), 2), ((1, 2), 1), ((2, 1), 1), ((2, 1), 2), ((2, 1), 3)],
+        names=['household_id', 'person_id']
+    )
+    return pd.DataFrame(
+        index=index,
+        data={
+            str(PeopleFeature.AGE): [AgeStructure.AGE_30_TO_44, AgeStructure.AGE_0_TO_4,
+                                     AgeStructure.AGE_90_AND_OVER, AgeStructure.AGE_30_TO_44,
+                                     AgeStructure.AGE_30_TO_44, AgeStructure.AGE_5_TO_7],
+            str(HouseholdFeature.PSEUDO): Pseudo.SINGLETON
+        }
+    )
+
+
+@pytest.fixture
+def households():
+    return [
+        Household(1, (1, 1), 'region a'),
+        Household(2, (2, 1), 'region a'),
+        Household(3, (1, 2), 'region b'),
+        Household(4, (1, 2), 'region b'),
+        Household(5, (1, 1), 'region b')
+    ]
+
+
+@pytest.fixture
+def totals(seed, households):
+    return population_totals(seed, households, [PeopleFeature.AGE, HouseholdFeature.PSEUDO])
+
+
+def test_people_are_counted_per_category(totals):
+    age = totals[PeopleFeature.AGE]
+    assert age.loc['region a', AgeStructure.AGE_30_TO_44] == 3
+    assert age.loc['region a', AgeStructure.AGE_0_TO_4] == 1
+    assert age.loc['region a', AgeStructure.AGE_5_TO_7] == 1
+    assert age.loc['region b', AgeStructure.AGE_90_AND_OVER] == 2
+    assert age.loc['region b', AgeStructure.AGE_30_TO_44] == 1
+    assert age.sum(axis=1).to_dict() == {'region a': 5, 'region b': 4}
+
+
+def test_households_are_counted_once(totals):
+    assert totals[HouseholdFeature.PSEUDO][Pseudo.SINGLETON].to_dict() == {
+        'region a': 2, 'region b': 3
+    }
+
+
+def test_encoded_seed_gives_same_totals(seed, households, totals):
+    encoded_totals = population_totals(encode_features(seed), households, [PeopleFeature.AGE])
+    pd.testing.assert_frame_equal(encoded_totals[PeopleFeature.AGE], totals[PeopleFeature.AGE])
+
+
+def test_households_from_other_seed_fail(seed):
+    with pytest.raises(ValueError):
+        population_totals(seed, [Household(1, (3, 1), 'region a')], [PeopleFeature.AGE])
+
+
+def test_perfect_fit_has_no_error(totals):
+    quality = fit_quality(totals, {feature: data.copy() for feature, data in totals.items()})
+    assert (quality == 0).all().all()
+    assert len(quality) == 4
+
+
+def test_errors(totals):
+    census_data = {HouseholdFeature.PSEUDO: pd.DataFrame(
+        index=['region a', 'region b'],
+        data={Pseudo.SINGLETON: [4, 3]}
+    )}
+    quality = fit_quality({HouseholdFeature.PSEUDO: totals[HouseholdFeature.PSEUDO]},
+                          census_data)
+    region_a = quality.loc[('region a', str(HouseholdFeature.PSEUDO))]
+    assert region_a.tae == 2
+    assert region_a.srmse == pytest.approx(0.5)
+    assert region_a.max_relative_error == pytest.approx(0.5)
+    assert quality.loc[('region b', str(HouseholdFeature.PSEUDO))].tae == 0
+
+
+def test_zero_controls_use_absolute_error(totals):
+    census_data = {PeopleFeature.AGE: totals[PeopleFeature.AGE].copy()}
+    census_data[PeopleFeature.AGE][AgeStructure.AGE_5_TO_7] = 0
+    quality = fit_quality({PeopleFeature.AGE: totals[PeopleFeature.AGE]}, census_data)
+    assert quality.loc[('region a', str(PeopleFeature.AGE))].max_relative_error == 1
+    assert np.isfinite(quality.srmse).all()
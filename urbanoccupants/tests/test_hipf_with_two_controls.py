@@ -73,7 +73,6 @@ def assert_weights_equal(expected_weights, weights, precision=1):
     assert_series_equal(expected_weights, weights, check_less_precise=precision)
 
 
-@pytest.mark.xfail(reason="Currently the algorithms do not seem to be equal.")
 def test_same_result_like_mlipf(reference_sample, expected_weights, controls_individuals,
                                 controls_households):
     weights = fit_hipf(
@@ -87,7 +86,7 @@ def test_same_result_like_mlipf(reference_sample, expected_weights, controls_ind
     assert_weights_equal(expected_weights, weights)
 
 
-@pytest.mark.parametrize("tol", [1, pytest.param(0.1, marks=pytest.mark.xfail)])
+@pytest.mark.parametrize("tol", [1, 0.1])
 def test_converges(reference_sample, controls_households, controls_individuals, tol):
     weights = fit_hipf(
         reference_sample=reference_sample,
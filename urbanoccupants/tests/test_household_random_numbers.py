@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from urbanoccupants.synthpop import household_random_numbers
+
+
+NUMBER_HOUSEHOLDS = 10000
+
+
+@pytest.fixture
+def all_random_numbers():
+    return household_random_numbers(range(1, NUMBER_HOUSEHOLDS + 1))
+
+
+def test_numbers_are_uniform(all_random_numbers):
+    assert ((all_random_numbers >= 0) & (all_random_numbers < 1)).all()
+    assert all_random_numbers.mean() == pytest.approx(0.5, abs=0.02)
+    assert len(np.unique(all_random_numbers)) == NUMBER_HOUSEHOLDS
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 333, NUMBER_HOUSEHOLDS])
+def test_independent_of_chunking(all_random_numbers, chunk_size):
+    chunks = [household_random_numbers(range(start, min(start + chunk_size,
+                                                        NUMBER_HOUSEHOLDS + 1)))
+              for start in range(1, NUMBER_HOUSEHOLDS + 1, chunk_size)]
+    np.testing.assert_array_equal(np.concatenate(chunks), all_random_numbers)
+
+
+def test_independent_of_order(all_random_numbers):
+    household_ids = np.array([5000, 3, 4, 5, 17, 16, 9999])
+    np.testing.assert_array_equal(
+        household_random_numbers(household_ids),
+        all_random_numbers[household_ids - 1]
+    )
+
+
+def test_depends_on_key(all_random_numbers):
+    other = household_random_numbers(range(1, NUMBER_HOUSEHOLDS + 1), key=42)
+    assert not np.array_equal(other, all_random_numbers)
+
+
+def test_no_households():
+    assert len(household_random_numbers([])) == 0
+
+
+def test_negative_ids_fail():
+    with pytest.raises(ValueError):
+        household_random_numbers([-1, 0, 1])
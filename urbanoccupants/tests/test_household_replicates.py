@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from urbanoccupants.synthpop import AliasTable, sample_households, sample_household_replicates
+
+
+NUMBER_HOUSEHOLDS = 500
+
+
+@pytest.fixture(params=['series', 'alias table'])
+def household_weights(request):
+    weights = pd.Series(
+        index=[(1, 1), (1, 2), (2, 1), (3, 1)],
+        data=[10.5, 0.5, 4.0, 5.0]
+    )
+    return weights if request.param == 'series' else AliasTable(weights)
+
+
+@pytest.fixture
+def replicate_household_ids():
+    return [range(1 + replicate * NUMBER_HOUSEHOLDS, 1 + (replicate + 1) * NUMBER_HOUSEHOLDS)
+            for replicate in range(3)]
+
+
+@pytest.fixture
+def replicates(household_weights, replicate_household_ids):
+    return sample_household_replicates(
+        ('region', None, household_weights, replicate_household_ids)
+    )
+
+
+def test_number_of_replicates(replicates):
+    assert len(replicates) == 3
+    assert all(len(households) == NUMBER_HOUSEHOLDS for households in replicates)
+
+
+def test_replicates_have_their_household_ids(replicates, replicate_household_ids):
+    for households, household_ids in zip(replicates, replicate_household_ids):
+        assert [household.id for household in households] == list(household_ids)
+        assert all(household.region == 'region' for household in households)
+
+
+def test_replicates_equal_single_draws(replicates, household_weights, replicate_household_ids):
+    for households, household_ids in zip(replicates, replicate_household_ids):
+        assert households == sample_households(
+            ('region', None, household_weights, None, household_ids)
+        )
+
+
+def test_replicates_differ(replicates):
+    seed_ids = [[household.seedId for household in households] for households in replicates]
+    assert seed_ids[0] != seed_ids[1]
+    assert seed_ids[1] != seed_ids[2]
+
+
+def test_replicates_of_different_sizes_fail(household_weights):
+    with pytest.raises(ValueError):
+        sample_household_replicates(
+            ('region', None, household_weights, [range(1, 5), range(5, 7)])
+        )
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from urbanoccupants.hipf import fit_hipf
+from urbanoccupants.tus import integer_seed_lookup, to_integer_keys
+
+
+PANDAS_HAS_INT32_INDICES = pd.Index(np.zeros(1, dtype=np.int32)).dtype == np.int32
+
+
+@pytest.fixture
+def seed():
+    index = pd.MultiIndex.from_tuples(
+        [(2, 1, 1), (1, 5, 2), (1, 5, 1), (2, 1, 2), (1, 3, 1)],
+        names=['SN1', 'SN2', 'SN3']
+    )
+    return pd.DataFrame(index=index, data={'age': [30, 12, 40, 35, 80]})
+
+
+@pytest.fixture
+def markov_ts(seed):
+    index = pd.MultiIndex.from_tuples(
+        [sn + (daytype, time_of_day)
+         for sn in seed.index
+         for daytype in ['weekday', 'weekend']
+         for time_of_day in range(3)],
+        names=['SN1', 'SN2', 'SN3', 'daytype', 'time_of_day']
+    )
+    return pd.Series(index=index, data=range(len(index)), name='activity')
+
+
+@pytest.fixture
+def lookup(seed):
+    return integer_seed_lookup(seed.index)
+
+
+def test_lookup_is_dense_and_ordered(lookup):
+    assert list(lookup.index) == [0, 1, 2, 3, 4]
+    assert list(lookup.household_id) == [0, 1, 1, 2, 2]
+    assert list(zip(lookup.SN1, lookup.SN2, lookup.SN3)) == [
+        (1, 3, 1), (1, 5, 1), (1, 5, 2), (2, 1, 1), (2, 1, 2)
+    ]
+
+
+def test_lookup_ids_are_int32(lookup):
+    assert lookup.household_id.dtype == np.int32
+    assert lookup.index.dtype == (np.int32 if PANDAS_HAS_INT32_INDICES else np.int64)
+
+
+def test_lookup_from_markov_ts_equals_lookup_from_seed(markov_ts, lookup):
+    pd.testing.assert_frame_equal(integer_seed_lookup(markov_ts.index), lookup)
+
+
+def test_seed_gets_integer_keys(seed, lookup):
+    integer_seed = to_integer_keys(seed, lookup)
+    assert integer_seed.index.names == ['household_id', 'person_id']
+    assert integer_seed.loc[(2, 4), 'age'] == 35
+    assert integer_seed.loc[(1, 1), 'age'] == 40
+    assert list(integer_seed.age) == list(seed.age)
+
+
+def test_markov_ts_keeps_other_levels(markov_ts, lookup):
+    integer_markov_ts = to_integer_keys(markov_ts, lookup)
+    assert integer_markov_ts.index.names == ['household_id', 'person_id', 'daytype',
+                                             'time_of_day']
+    assert integer_markov_ts.loc[(1, 2, 'weekend', 1)] == markov_ts.loc[(1, 5, 2, 'weekend', 1)]
+
+
+def test_keys_can_be_looked_up(seed, lookup):
+    integer_seed = to_integer_keys(seed, lookup)
+    person_ids = integer_seed.index.get_level_values('person_id')
+    assert list(lookup.loc[person_ids, ['SN1', 'SN2', 'SN3']].itertuples(index=False,
+                                                                           name=None)) == \
+        list(seed.index)
+
+
+def test_unknown_people_fail(seed, lookup):
+    with pytest.raises(ValueError):
+        to_integer_keys(seed, lookup.iloc[1:])
+
+
+def test_hipf_meets_controls_with_integer_keys():
+    # feasible controls: household weights 10, 20, 30, 40 meet them exactly
+    index = pd.MultiIndex.from_tuples(
+        [(1, 1, 1), (1, 1, 2), (1, 2, 1), (2, 1, 1), (2, 1, 2), (2, 1, 3), (2, 2, 1), (2, 2, 2)],
+        names=['SN1', 'SN2', 'SN3']
+    )
+    seed = pd.DataFrame(index=index, data={
+        'household_type': ['a', 'a', 'b', 'a', 'a', 'a', 'b', 'b'],
+        'age': ['x', 'y', 'x', 'x', 'y', 'y', 'y', 'y']
+    })
+    controls_households = {'household_type': {'a': 40, 'b': 60}}
+    controls_individuals = {'age': {'x': 60, 'y': 150}}
+    integer_seed = to_integer_keys(seed, integer_seed_lookup(seed.index))
+    weights = fit_hipf(integer_seed, controls_individuals, controls_households, maxiter=100)
+    np.testing.assert_allclose(weights.values, [10, 20, 30, 40], rtol=0.001)
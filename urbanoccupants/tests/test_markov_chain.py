@@ -4,6 +4,7 @@ import math
 from io import StringIO
 import random
 
+import numpy as np
 import pandas as pd
 from pandas.testing import assert_frame_equal
 import pytest
@@ -224,3 +225,51 @@ def test_dataframe_representation(markov_chain, markov_chain_as_dataframe):
         check_exact=False,
         check_less_precise=2
     )
+
+
+def test_transition_probabilities_are_dense_array(markov_chain):
+    probabilities = markov_chain.transition_probabilities
+    assert probabilities.shape == (2, 2, len(Activity), len(Activity))
+    assert probabilities.dtype == np.float64
+    assert (probabilities >= 0).all()
+
+
+def test_unaligned_time_stamp_fails(markov_chain, random_func):
+    with pytest.raises(KeyError):
+        markov_chain.move(Activity.HOME, datetime(2017, 3, 8, 6, 0), random_func)
+
+
+def test_estimation_equals_counting_of_each_transition():
+    random.seed('markov chain estimation')
+    time_step_size = timedelta(hours=4)
+    time_steps = [time(hour, 0) for hour in range(0, 24, 4)]
+    day_time_series = pd.DataFrame(
+        index=time_steps,
+        data={'person{}'.format(i): [random.choice(list(Activity)) for unused in time_steps]
+              for i in range(20)}
+    )
+    probabilities = WeekMarkovChain._day_markov_chain(day_time_series, time_step_size)
+    for step, time_step in enumerate(time_steps):
+        current_vector = day_time_series.loc[time_step]
+        next_vector = day_time_series.loc[time_steps[(step + 1) % len(time_steps)]]
+        for from_index, from_activity in enumerate(Activity):
+            for to_index, to_activity in enumerate(Activity):
+                current_mask = current_vector == from_activity
+                expected = ((current_mask & (next_vector == to_activity)).sum() /
+                            current_mask.sum() if current_mask.any() else 0.0)
+                assert probabilities[step, from_index, to_index] == expected
+
+
+def test_estimation_fails_for_unknown_activities(weekday_time_series, weekend_day_time_series):
+    weekday_time_series.iloc[0, 0] = 'swimming'
+    with pytest.raises(ValueError):
+        WeekMarkovChain(weekday_time_series, weekend_day_time_series, timedelta(hours=12))
+
+
+def test_dataframe_representation_with_zeros(markov_chain):
+    df = markov_chain.to_dataframe(drop_zeros=False)
+    assert len(df.index) == 2 * 2 * len(Activity) * len(Activity)
+    assert_frame_equal(
+        df[df[person.MARKOV_CHAIN_PROBABILITY_COLUMN_NAME] > 0],
+        markov_chain.to_dataframe()
+    )
@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+import urbanoccupants.census as census
+from urbanoccupants.census import expand_geography_codes, compress_geography_codes, \
+    plan_nomis_queries, GeographicalLayer
+
+
+@pytest.mark.parametrize('codes,runs', [
+    ([1, 2, 3, 7], ['1...3', '7']),
+    ([7, 3, 1, 2, 2], ['1...3', '7']),
+    ([5], ['5']),
+    ([4, 6, 8], ['4', '6', '8']),
+    ([], [])
+])
+def test_compression(codes, runs):
+    assert compress_geography_codes(codes) == runs
+
+
+@pytest.mark.parametrize('layer', list(GeographicalLayer))
+def test_layers_round_trip(layer):
+    codes = layer.nomis_geography_codes
+    assert expand_geography_codes(','.join(compress_geography_codes(codes))) == sorted(codes)
+
+
+@pytest.mark.parametrize('layer', list(GeographicalLayer))
+def test_haringey_layers_fit_one_query(layer):
+    assert len(plan_nomis_queries(layer.nomis_geography_codes)) == 1
+
+
+def test_chunks_are_url_safe():
+    codes = list(range(0, 10000, 2)) # no runs at all
+    chunks = plan_nomis_queries(codes, max_length=100)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert sum((expand_geography_codes(chunk) for chunk in chunks), []) == codes
+
+
+def test_chunks_are_queried_and_concatenated():
+    chunks = plan_nomis_queries(range(0, 400, 2), max_length=100)
+    pages = {
+        chunk: pd.DataFrame({'GEOGRAPHY_CODE': ['E0{}'.format(i)] * 2,
+                             'CELL_NAME': ['a', 'b'],
+                             'OBS_VALUE': [i, 2 * i]})
+        for i, chunk in enumerate(chunks)
+    }
+    with patch.object(census, '_query_nomis_pages',
+                      side_effect=lambda dataset_id, query, geography: pages[geography]), \
+            patch.object(census, 'NOMIS_MAX_GEOGRAPHY_LENGTH', 100):
+        data = census._query_nomis('dataset', 'query', range(0, 400, 2))
+    assert_frame_equal(data, pd.concat(pages.values(), ignore_index=True))
@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+import urbanoccupants.census as census
+from urbanoccupants.census import GeographicalLayer, aggregate_census_data
+from urbanoccupants.types import AgeStructure
+
+from nomis_fakes import REGIONS, fake_nomis
+
+
+@pytest.fixture
+def lookup():
+    return pd.DataFrame(
+        index=pd.Index(['OA1', 'OA2', 'OA3'], name='OA'),
+        data={
+            'LSOA': ['LSOA1', 'LSOA1', 'LSOA2'],
+            'MSOA': ['MSOA1', 'MSOA1', 'MSOA1'],
+            'WARD': ['WARD2', 'WARD1', 'WARD1']
+        }
+    )
+
+
+@pytest.fixture
+def oa_data():
+    return pd.DataFrame(
+        index=pd.Index(['OA3', 'OA1', 'OA2'], name='GEOGRAPHY_CODE'),
+        columns=pd.Index([AgeStructure.AGE_0_TO_4, AgeStructure.AGE_5_TO_7], name='CELL_NAME'),
+        data=[[1, 2], [10, 20], [100, 200]]
+    )
+
+
+def test_aggregation_to_lsoa(oa_data, lookup):
+    lsoa_data = aggregate_census_data(oa_data, lookup, GeographicalLayer.LSOA)
+    assert list(lsoa_data.index) == ['LSOA1', 'LSOA2']
+    assert lsoa_data.loc['LSOA1'].tolist() == [110, 220]
+    assert lsoa_data.loc['LSOA2'].tolist() == [1, 2]
+    assert lsoa_data.index.name == 'GEOGRAPHY_CODE'
+    assert list(lsoa_data.columns) == list(oa_data.columns)
+
+
+def test_aggregation_to_ward(oa_data, lookup):
+    ward_data = aggregate_census_data(oa_data, lookup, GeographicalLayer.WARD)
+    assert ward_data.loc['WARD1'].tolist() == [101, 202]
+    assert ward_data.loc['WARD2'].tolist() == [10, 20]
+
+
+@pytest.mark.parametrize('layer', list(GeographicalLayer))
+def test_aggregation_keeps_totals(oa_data, lookup, layer):
+    aggregated = aggregate_census_data(oa_data, lookup, layer)
+    assert (aggregated.sum() == oa_data.sum()).all()
+
+
+def test_output_area_missing_in_lookup_fails(oa_data, lookup):
+    with pytest.raises(ValueError):
+        aggregate_census_data(oa_data, lookup.iloc[1:], GeographicalLayer.MSOA)
+
+
+@pytest.fixture
+def aggregation():
+    lookup = pd.DataFrame(index=pd.Index(REGIONS, name='OA'),
+                          data={'LSOA': 'LSOA1', 'MSOA': 'MSOA1', 'WARD': 'WARD1'})
+    census.invalidate_census_data_cache()
+    census.aggregate_output_areas()
+    with patch.object(census.requests, 'get', side_effect=fake_nomis) as requests_get, \
+            patch.object(census, '_output_area_lookup', return_value=lookup):
+        yield requests_get
+    census.aggregate_output_areas(enabled=False)
+    census.invalidate_census_data_cache()
+
+
+def test_all_layers_from_one_download(aggregation):
+    oa_data = census.read_age_structure_data(GeographicalLayer.OA)
+    for layer in [GeographicalLayer.LSOA, GeographicalLayer.MSOA, GeographicalLayer.WARD]:
+        data = census.read_age_structure_data(layer)
+        assert list(data.index) == ['{}1'.format(layer.name)]
+        assert_frame_equal(data.sum().to_frame(), oa_data.sum().to_frame())
+    assert aggregation.call_count == 1
+    assert '&geography={}&'.format(GeographicalLayer.OA.nomis_geo_codes) in \
+        aggregation.call_args[0][0]
@@ -0,0 +1,122 @@
+from datetime import datetime, time, timedelta
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from urbanoccupants import Activity, Person, PopulationSimulator, WeekMarkovChain
+import urbanoccupants.person as person
+
+
+TIME_STEP_SIZE = timedelta(hours=1)
+INITIAL_TIME = datetime(2017, 3, 10, 18, 0) # Friday, to cross into the weekend
+NUMBER_STEPS = 48
+NUMBER_CITIZENS = 60
+
+
+def random_time_series(number_people):
+    time_steps = [time(hour, 0) for hour in range(24)]
+    return pd.DataFrame(
+        index=time_steps,
+        data={'person{}'.format(i): [random.choice(list(Activity)) for unused in time_steps]
+              for i in range(number_people)}
+    )
+
+
+@pytest.fixture
+def markov_chains():
+    random.seed('population simulator tests')
+    return {
+        markov_id: WeekMarkovChain(random_time_series(5), random_time_series(5), TIME_STEP_SIZE)
+        for markov_id in [3, 7, 11]
+    }
+
+
+@pytest.fixture
+def citizens(markov_chains):
+    random.seed('population simulator citizens')
+    markov_ids = [random.choice(list(markov_chains.keys())) for unused in range(NUMBER_CITIZENS)]
+    initial_activities = [
+        random.choice(markov_chains[markov_id].valid_states(INITIAL_TIME))
+        for markov_id in markov_ids
+    ]
+    random_seeds = [random.randrange(2 ** 40) for unused in range(NUMBER_CITIZENS)]
+    return markov_ids, initial_activities, random_seeds
+
+
+def simulator(markov_chains, markov_ids, initial_activities, random_seeds):
+    return PopulationSimulator(
+        markov_chains=markov_chains,
+        markov_ids=markov_ids,
+        initial_activities=initial_activities,
+        random_seeds=random_seeds,
+        initial_time=INITIAL_TIME,
+        time_step_size=TIME_STEP_SIZE
+    )
+
+
+@pytest.fixture
+def occupancy(markov_chains, citizens):
+    return simulator(markov_chains, *citizens).run(NUMBER_STEPS)
+
+
+def number_generator(random_seed):
+    counter = iter(range(1, NUMBER_STEPS + 1))
+
+    def uniform(minimum, maximum):
+        assert (minimum, maximum) == (0, 1)
+        return person._splitmix64_uniform(np.array([random_seed], dtype=np.uint64),
+                                          next(counter))[0]
+    return uniform
+
+
+def test_occupancy_matrix(occupancy, citizens):
+    assert occupancy.shape == (NUMBER_CITIZENS, NUMBER_STEPS)
+    assert occupancy.dtype == np.int8
+    assert [person.ACTIVITIES[index] for index in occupancy[:, 0]] == citizens[1]
+
+
+def test_occupancy_equals_single_persons(occupancy, markov_chains, citizens):
+    for citizen, (markov_id, initial_activity, random_seed) in enumerate(zip(*citizens)):
+        single_person = Person(
+            week_markov_chain=markov_chains[markov_id],
+            initial_activity=initial_activity,
+            number_generator=number_generator(random_seed),
+            initial_time=INITIAL_TIME,
+            time_step_size=TIME_STEP_SIZE
+        )
+        activities = []
+        for unused in range(NUMBER_STEPS):
+            activities.append(single_person.activity)
+            single_person.step()
+        assert [person.ACTIVITIES[index] for index in occupancy[citizen]] == activities
+
+
+def test_citizens_do_not_depend_on_each_other(occupancy, markov_chains, citizens):
+    subset = slice(10, 20)
+    occupancy_of_subset = simulator(
+        markov_chains,
+        *[values[subset] for values in citizens]
+    ).run(NUMBER_STEPS)
+    np.testing.assert_array_equal(occupancy_of_subset, occupancy[subset])
+
+
+def test_simulation_can_be_continued(occupancy, markov_chains, citizens):
+    population = simulator(markov_chains, *citizens)
+    first_half = population.run(NUMBER_STEPS // 2)
+    second_half = population.run(NUMBER_STEPS // 2)
+    assert population.time == INITIAL_TIME + NUMBER_STEPS * TIME_STEP_SIZE
+    np.testing.assert_array_equal(np.hstack([first_half, second_half]), occupancy)
+
+
+def test_unknown_markov_ids_fail(markov_chains, citizens):
+    markov_ids, initial_activities, random_seeds = citizens
+    with pytest.raises(ValueError):
+        simulator(markov_chains, [1] + markov_ids[1:], initial_activities, random_seeds)
+
+
+def test_inconsistent_time_step_size_fails(markov_chains, citizens):
+    with pytest.raises(AssertionError):
+        PopulationSimulator(markov_chains, *citizens, initial_time=INITIAL_TIME,
+                            time_step_size=timedelta(minutes=30))
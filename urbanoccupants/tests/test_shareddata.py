@@ -0,0 +1,105 @@
+from datetime import time, timedelta
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal, assert_series_equal
+import pytest
+
+from urbanoccupants import Activity, PeopleFeature, encode_features
+from urbanoccupants.shareddata import SharedFrame, attach, resolve
+from urbanoccupants.tus import markov_chain_for_cluster
+from urbanoccupants.types import AgeStructure
+
+
+AGE = str(PeopleFeature.AGE)
+
+
+@pytest.fixture
+def seed():
+    index = pd.MultiIndex.from_tuples([((1, 1), 1), ((1, 1), 2), ((2, 5), 1)],
+                                      names=['household_id', 'person_id'])
+    return encode_features(pd.DataFrame(
+        index=index,
+        data={
+            AGE: [AgeStructure.AGE_30_TO_44, AgeStructure.AGE_0_TO_4, np.nan],
+            'markov_id': [12.0, 4.0, 12.0],
+            'initial_activity': [Activity.HOME, Activity.SLEEP_AT_HOME, Activity.HOME]
+        }
+    ))
+
+
+@pytest.fixture
+def markov_ts():
+    people = [(1, 1, 1), (1, 1, 2), (2, 5, 1)]
+    index = pd.MultiIndex.from_tuples(
+        [person + (daytype, time_of_day)
+         for person in people
+         for daytype in ['weekday', 'weekend']
+         for time_of_day in [time(0, 0), time(12, 0)]],
+        names=['SN1', 'SN2', 'SN3', 'daytype', 'time_of_day']
+    )
+    values = [Activity.HOME, Activity.NOT_AT_HOME] * 6
+    values[5] = Activity.HOME
+    return pd.Series(values, index=index, dtype='category', name='markov_ts')
+
+
+@pytest.fixture
+def shared_seed(seed):
+    with SharedFrame(seed) as shared_seed:
+        yield shared_seed
+
+
+@pytest.fixture
+def shared_markov_ts(markov_ts):
+    with SharedFrame(markov_ts) as shared_markov_ts:
+        yield shared_markov_ts
+
+
+def test_frame_round_trip(seed, shared_seed):
+    attached = attach(shared_seed.descriptor)
+    expected = seed.copy()
+    expected['initial_activity'] = expected['initial_activity'].astype('category')
+    assert_frame_equal(attached, expected)
+
+
+def test_series_round_trip(markov_ts, shared_markov_ts):
+    assert_series_equal(attach(shared_markov_ts.descriptor), markov_ts)
+
+
+def test_data_is_attached_once(shared_seed):
+    assert attach(shared_seed.descriptor) is attach(shared_seed.descriptor)
+
+
+def test_descriptor_is_small(shared_markov_ts):
+    assert len(repr(shared_markov_ts.descriptor)) < 100
+
+
+def test_resolve_passes_through_data(seed):
+    assert resolve(seed) is seed
+
+
+def test_unknown_data_type_fails():
+    with pytest.raises(ValueError):
+        SharedFrame(np.array([1, 2, 3]))
+
+
+def _number_of_people(descriptor):
+    return len(resolve(descriptor).index.droplevel([3, 4]).unique())
+
+
+def test_workers_attach(shared_markov_ts):
+    with Pool(2, initializer=attach, initargs=(shared_markov_ts.descriptor, )) as pool:
+        results = pool.map(_number_of_people, [shared_markov_ts.descriptor] * 4)
+    assert results == [3] * 4
+
+
+def test_markov_chain_from_shared_time_series(markov_ts, shared_markov_ts):
+    group_of_people = pd.DataFrame(
+        index=pd.MultiIndex.from_tuples([(1, 1, 1), (2, 5, 1)], names=['SN1', 'SN2', 'SN3'])
+    )
+    time_step_size = timedelta(hours=12)
+    _, expected = markov_chain_for_cluster((markov_ts, group_of_people, None, time_step_size))
+    _, actual = markov_chain_for_cluster((shared_markov_ts.descriptor, group_of_people, None,
+                                          time_step_size))
+    assert_frame_equal(actual.to_dataframe(), expected.to_dataframe())
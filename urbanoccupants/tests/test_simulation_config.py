@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import pytest
+
+from urbanoccupants import read_simulation_config
+from urbanoccupants.synthpop import INDEPENDENT_SAMPLING, SYSTEMATIC_SAMPLING
+
+
+PATH_TO_DEFAULT_CONFIG = Path(__file__).parent.parent.parent / 'config' / 'default.yaml'
+
+
+def config_file(tmpdir, household_sampling_line):
+    lines = [line for line in PATH_TO_DEFAULT_CONFIG.read_text().splitlines()
+             if not line.startswith('household-sampling:')]
+    if household_sampling_line is not None:
+        lines.append(household_sampling_line)
+    path = tmpdir.join('config.yaml')
+    path.write('\n'.join(lines))
+    return str(path)
+
+
+def test_household_sampling_defaults_to_independent(tmpdir):
+    config = read_simulation_config(config_file(tmpdir, None))
+    assert config['household-sampling'] == INDEPENDENT_SAMPLING
+
+
+def test_household_sampling_is_read(tmpdir):
+    config = read_simulation_config(config_file(tmpdir, 'household-sampling: systematic'))
+    assert config['household-sampling'] == SYSTEMATIC_SAMPLING
+
+
+def test_unknown_household_sampling_fails(tmpdir):
+    with pytest.raises(ValueError):
+        read_simulation_config(config_file(tmpdir, 'household-sampling: random'))
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from urbanoccupants import Activity
+from urbanoccupants.synthpop import Household, Citizen
+from urbanoccupants.snapshot import Snapshot, SnapshotWriter, write_snapshot, HOUSEHOLDS, \
+    CITIZENS
+
+
+@pytest.fixture
+def households():
+    return [
+        Household(1, (10, 1), 'E01'),
+        Household(2, (10, 2), 'E01'),
+        Household(3, (10, 1), 'E02')
+    ]
+
+
+@pytest.fixture
+def citizens():
+    return [
+        Citizen(1, 1234567, Activity.HOME, 140.0, 70.0, 1001),
+        Citizen(1, 7654321, Activity.SLEEP_AT_HOME, 98.0, 49.0, 1002),
+        Citizen(2, 1234567, Activity.NOT_AT_HOME, 140.0, 70.0, 2001),
+        Citizen(3, 7654321, Activity.HOME, 140.0, 70.0, 3001)
+    ]
+
+
+@pytest.fixture
+def snapshot(tmpdir, households, citizens):
+    path = tmpdir.join('snapshot')
+    write_snapshot(path, households, citizens)
+    return Snapshot(path)
+
+
+def test_population_round_trip(snapshot, households, citizens):
+    assert snapshot.population() == (households, citizens)
+
+
+def test_lengths(snapshot):
+    assert len(snapshot) == 3
+    assert snapshot.number_citizens == 4
+
+
+def test_columns_are_memory_mapped(snapshot):
+    random_seeds = snapshot.column(CITIZENS, 'randomSeed')
+    assert isinstance(random_seeds, np.memmap)
+    assert list(random_seeds) == [1001, 1002, 2001, 3001]
+
+
+def test_coded_columns(snapshot):
+    assert snapshot.code_table('region') == ['E01', 'E02']
+    assert list(snapshot.column(HOUSEHOLDS, 'region')) == [0, 0, 1]
+    assert snapshot.code_table('seedId') == [(10, 1), (10, 2)]
+
+
+def test_loads_only_requested_columns(snapshot):
+    df = snapshot.citizens(columns=['initialActivity', 'activeMetabolicRate'])
+    assert list(df.columns) == ['initialActivity', 'activeMetabolicRate']
+    assert list(df.initialActivity) == [Activity.HOME, Activity.SLEEP_AT_HOME,
+                                        Activity.NOT_AT_HOME, Activity.HOME]
+
+
+def test_unknown_column_fails(snapshot):
+    with pytest.raises(ValueError):
+        snapshot.column(HOUSEHOLDS, 'markovId')
+
+
+def test_batches_equal_single_write(tmpdir, households, citizens):
+    path = tmpdir.join('batches')
+    with SnapshotWriter(path) as writer:
+        writer.append(households[:2], citizens[:3])
+        writer.append(households[2:], citizens[3:])
+    assert Snapshot(path).population() == (households, citizens)
+
+
+def test_empty_population(tmpdir):
+    path = tmpdir.join('empty')
+    write_snapshot(path, [], [])
+    assert Snapshot(path).population() == ([], [])
+
+
+def test_existing_snapshot_is_not_overwritten(tmpdir, households, citizens):
+    path = tmpdir.join('snapshot')
+    write_snapshot(path, households, citizens)
+    with pytest.raises(ValueError):
+        SnapshotWriter(path)
+
+
+def test_incomplete_snapshot_fails(tmpdir, households, citizens):
+    path = tmpdir.join('incomplete')
+    writer = SnapshotWriter(path)
+    writer.append(households, citizens)
+    with pytest.raises(ValueError):
+        Snapshot(path)
+    writer.close()
+
+
+def test_integer_seed_ids(tmpdir, citizens):
+    path = tmpdir.join('integer')
+    households = [Household(1, 10, 'E01'), Household(2, 11, 'E01'), Household(3, 10, 'E02')]
+    write_snapshot(path, households, citizens)
+    snapshot = Snapshot(path)
+    assert snapshot.code_table('seedId') == [10, 11]
+    assert snapshot.population() == (households, citizens)
@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from urbanoccupants.synthpop import INDEPENDENT_SAMPLING, SYSTEMATIC_SAMPLING, run_hipf, \
+    sample_citizen, sample_households, sample_households_systematic, synthesise_region
+
+
+HOUSEHOLD_IDS = range(101, 201)
+
+
+@pytest.fixture
+def seed():
+    # feasible controls: household weights 10, 20, 30, 40 meet them exactly
+    index = pd.MultiIndex.from_tuples(
+        [(1, 1), (1, 2), (2, 3), (3, 4), (3, 5), (3, 6), (4, 7), (4, 8)],
+        names=['household_id', 'person_id']
+    )
+    return pd.DataFrame(index=index, data={
+        'household_type': ['a', 'a', 'b', 'a', 'a', 'a', 'b', 'b'],
+        'age': ['x', 'y', 'x', 'x', 'y', 'y', 'y', 'y'],
+        'markov_id': [1, 2, 1, 1, 2, 2, 2, 2],
+        'initial_activity': ['home'] * 8,
+        'metabolic_heat_gain_active': [140.0] * 8,
+        'metabolic_heat_gain_passive': [70.0] * 8
+    })
+
+
+@pytest.fixture
+def controls_households():
+    return {'household_type': {'a': 40, 'b': 60}}
+
+
+@pytest.fixture
+def controls_individuals():
+    return {'age': {'x': 60, 'y': 150}}
+
+
+def test_independent_sampling_equals_separate_steps(seed, controls_households,
+                                                    controls_individuals):
+    region, households, citizens = synthesise_region(
+        (seed, controls_households, controls_individuals, 'region', HOUSEHOLD_IDS,
+         INDEPENDENT_SAMPLING)
+    )
+    unused, household_weights = run_hipf((seed, controls_households, controls_individuals,
+                                           'region'))
+    expected_households = sample_households(
+        ('region', seed, household_weights, None, HOUSEHOLD_IDS)
+    )
+    assert region == 'region'
+    assert households == expected_households
+    assert citizens == sample_citizen((expected_households, seed))
+
+
+def test_systematic_sampling_equals_separate_steps(seed, controls_households,
+                                                   controls_individuals):
+    region, households, citizens = synthesise_region(
+        (seed, controls_households, controls_individuals, 'region', HOUSEHOLD_IDS,
+         SYSTEMATIC_SAMPLING)
+    )
+    unused, household_weights = run_hipf((seed, controls_households, controls_individuals,
+                                           'region'))
+    expected_households = sample_households_systematic(
+        ('region', seed, household_weights, ['household_type'], HOUSEHOLD_IDS)
+    )
+    assert region == 'region'
+    assert households == expected_households
+    assert citizens == sample_citizen((expected_households, seed))
+
+
+def test_unknown_sampling_fails(seed, controls_households, controls_individuals):
+    with pytest.raises(ValueError):
+        synthesise_region(
+            (seed, controls_households, controls_individuals, 'region', HOUSEHOLD_IDS,
+             'unknown')
+        )
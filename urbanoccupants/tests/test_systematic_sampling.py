@@ -0,0 +1,107 @@
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from urbanoccupants.synthpop import HouseholdFeature, sample_households, \
+    sample_households_systematic
+from urbanoccupants.types import HouseholdType
+
+
+NUMBER_HOUSEHOLDS = 1000
+
+
+@pytest.fixture
+def seed():
+    households = [
+        ((1, 1), 1, HouseholdType.ONE_PERSON_HOUSEHOLD),
+        ((1, 2), 1, HouseholdType.ONE_PERSON_HOUSEHOLD),
+        ((2, 1), 2, HouseholdType.COUPLE_WITHOUT_DEPENDENT_CHILDREN),
+        ((2, 2), 3, HouseholdType.COUPLE_WITH_DEPENDENT_CHILDREN),
+        ((3, 1), 3, HouseholdType.COUPLE_WITH_DEPENDENT_CHILDREN),
+        ((3, 2), 2, HouseholdType.LONE_PARENT_WITH_DEPENDENT_CHILDREN)
+    ]
+    index = pd.MultiIndex.from_tuples(
+        [(household_id, person_id)
+         for household_id, size, unused in households
+         for person_id in range(1, size + 1)],
+        names=['household_id', 'person_id']
+    )
+    return pd.DataFrame(
+        index=index,
+        data={str(HouseholdFeature.HOUSEHOLD_TYPE): [household_type
+                                                      for unused, size, household_type
+                                                      in households
+                                                      for person_id in range(size)]}
+    )
+
+
+@pytest.fixture
+def household_weights():
+    return pd.Series(
+        index=[(1, 1), (1, 2), (2, 1), (2, 2), (3, 1), (3, 2)],
+        data=[10.3, 0.0, 4.4, 3.1, 1.9, 0.77]
+    )
+
+
+@pytest.fixture
+def households(seed, household_weights):
+    return sample_households_systematic((
+        'region', seed, household_weights, [HouseholdFeature.HOUSEHOLD_TYPE],
+        range(1, NUMBER_HOUSEHOLDS + 1)
+    ))
+
+
+def expected_number(household_weights, seed_ids):
+    return household_weights[seed_ids].sum() / household_weights.sum() * NUMBER_HOUSEHOLDS
+
+
+def test_number_of_households(households):
+    assert [household.id for household in households] == list(range(1, NUMBER_HOUSEHOLDS + 1))
+    assert all(household.region == 'region' for household in households)
+
+
+def test_strata_hit_their_quota(households, household_weights):
+    counts = Counter(household.seedId for household in households)
+    strata = [[(1, 1), (1, 2)], [(2, 1)], [(2, 2), (3, 1)], [(3, 2)]]
+    for stratum in strata:
+        number = sum(counts[seed_id] for seed_id in stratum)
+        assert abs(number - expected_number(household_weights, stratum)) < 1
+
+
+def test_households_hit_their_weight_closely(households, household_weights):
+    counts = Counter(household.seedId for household in households)
+    for seed_id in household_weights.index:
+        assert abs(counts[seed_id] - expected_number(household_weights, [seed_id])) <= 1
+
+
+def test_zero_weight_is_never_sampled(households):
+    assert (1, 2) not in set(household.seedId for household in households)
+
+
+def test_less_noise_than_independent_draws(seed, household_weights, households):
+    independent = sample_households(
+        ('region', seed, household_weights, None, range(1, NUMBER_HOUSEHOLDS + 1))
+    )
+
+    def total_absolute_error(households):
+        counts = Counter(household.seedId for household in households)
+        return sum(abs(counts[seed_id] - expected_number(household_weights, [seed_id]))
+                   for seed_id in household_weights.index)
+
+    assert total_absolute_error(households) < total_absolute_error(independent)
+
+
+def test_sampling_is_deterministic(seed, household_weights, households):
+    assert households == sample_households_systematic((
+        'region', seed, household_weights, [HouseholdFeature.HOUSEHOLD_TYPE],
+        range(1, NUMBER_HOUSEHOLDS + 1)
+    ))
+
+
+def test_single_household(seed, household_weights):
+    households = sample_households_systematic(
+        ('region', seed, household_weights, [], [7])
+    )
+    assert len(households) == 1
+    assert households[0].seedId in set(household_weights.index)
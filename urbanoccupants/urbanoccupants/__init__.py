@@ -1,9 +1,11 @@
-from .person import Person, Activity, WeekMarkovChain
+from .person import Person, Activity, WeekMarkovChain, PopulationSimulator
 try:
     from .census import GeographicalLayer
 except Exception:
     GeographicalLayer = None
-from .synthpop import PeopleFeature, HouseholdFeature, feature_id
+from .synthpop import PeopleFeature, HouseholdFeature, feature_id, feature_ids, \
+    compact_feature_ids, encode_features, decode_features
+from .snapshot import Snapshot, SnapshotWriter, write_snapshot
 from .version import __version__
 from .utils import read_simulation_config
 from .datamodel import MARKOV_CHAIN_INDEX_TABLE_NAME, DWELLINGS_TABLE_NAME, PEOPLE_TABLE_NAME, \
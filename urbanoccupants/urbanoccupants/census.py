@@ -4,12 +4,19 @@ For definitions of any of the terms see [the original glossary]
 (http://www.ons.gov.uk/ons/guide-method/census/2011/census-data/2011-census-data/2011-first-release/
 2011-census-definitions/2011-census-glossary.pdf).
 
-Census data is retrieved from nomis, see https://www.nomisweb.co.uk.
+Census data is retrieved from nomis, see https://www.nomisweb.co.uk. Using `use_census_store`,
+retrieved data is kept in a local store on disk, which can be filled in one go using
+`prefetch_census_data`. Afterwards, census data can be read fully offline.
 """
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+import functools
 import io
 from pathlib import Path
 import tempfile
+import threading
+import time
+from urllib.parse import urlparse
 import zipfile
 
 import requests
@@ -49,6 +56,9 @@ NOMIS_LSOA_GEOGRAPHY = ("1249904514,1249904516,1249904519,1249904520,1249904579,
                         "1249904554,1249904604,1249904606...1249904608,1249904578,1249904581," +
                         "1249904584,1249934354")
 NOMIS_OA_GEOGRAPHY = "1254106458...1254107181,1254258316,1254262366...1254262393"
+NOMIS_API_URL = "https://www.nomisweb.co.uk/api/v01/dataset/"
+NOMIS_MAX_GEOGRAPHY_LENGTH = 1500 # characters of the geography parameter, keeps urls safe
+NOMIS_RECORD_LIMIT = 25000 # rows per page, the maximum nomis returns for one request
 NOMIS_GEOGRAPHY_CODE_COLUMN_NAME = "GEOGRAPHY_CODE"
 NOMIS_VALUE_NAME_COLUMN_NAME = "CELL_NAME"
 NOMIS_VALUE_COLUMN_NAME = "OBS_VALUE"
@@ -60,12 +70,17 @@ WARD_SHAPE_FILE_PATH = Path('./statistical-gis-boundaries-london/ESRI/London_War
 MSOA_SHAPE_FILE_PATH = Path('./statistical-gis-boundaries-london/ESRI/MSOA_2011_London_gen_MHW.shp')
 LSOA_SHAPE_FILE_PATH = Path('./statistical-gis-boundaries-london/ESRI/LSOA_2011_London_gen_MHW.shp')
 OA_SHAPE_FILE_PATH = Path('./statistical-gis-boundaries-london/ESRI/OA_2011_London_gen_MHW.shp')
+BOROUGH_SHAPE_FILE_PATH = Path('./statistical-gis-boundaries-london/ESRI/'
+                               'London_Borough_Excluding_MHW.shp')
+SHAPE_FILE_SUFFIXES = ['.shp', '.shx', '.dbf', '.prj', '.cpg']
+BOROUGH_NAME_COLUMN_NAME = 'NAME'
 BOROUGH_ID_IN_WARD_DATA_SET = 'BOROUGH'
 BOROUGH_ID_COLUMN_NAME = 'LAD11NM'
 WARD_ID_COLUMN_NAME = 'GSS_CODE'
 MSOA_ID_COLUMN_NAME = 'MSOA11CD'
 LSOA_ID_COLUMN_NAME = 'LSOA11CD'
 OA_ID_COLUMN_NAME = 'OA11CD'
+OUTPUT_AREA_LOOKUP_FILE_NAME = 'output-area-lookup.csv'
 
 
 class GeographicalLayer(Enum):
@@ -82,6 +97,11 @@ class GeographicalLayer(Enum):
         self.borough_col_name = borough_col_name
         self.index_col_name = index_col_name
 
+    @property
+    def nomis_geography_codes(self):
+        """The nomis geography codes of all areas on this layer, as list of integers."""
+        return expand_geography_codes(self.nomis_geo_codes)
+
 
 AGE_STRUCTURE_MAP = {
     "Age 0 to 4": AgeStructure.AGE_0_TO_4,
@@ -154,34 +174,414 @@ HOUSEHOLDTYPE_MAP = {
 }
 
 
+MAX_CONCURRENT_REQUESTS_PER_HOST = 4
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0 # seconds before the first retry, doubling with each retry
+REQUEST_TIMEOUT = 60 # seconds
+
+_CENSUS_DATA_CACHE = {}
+_HOST_SEMAPHORES = {}
+_HOST_SEMAPHORES_LOCK = threading.Lock()
+_CENSUS_STORE = {'path': None, 'offline': False}
+_AGGREGATION = {'enabled': False}
+_CENSUS_READ_FUNCTIONS = []
+
+
+def _memoised(dataset_id, category_type):
+    """Memoises a census read function by (dataset, geographical layer).
+
+    The memoised frames are shared between all callers and are hence read-only: any attempt to
+    change their values raises a ValueError. Callers who need to modify a frame must copy it.
+    Use `invalidate_census_data_cache` to drop memoised frames.
+
+    If a census store is in use, frames are read from the store, and retrieved data is written
+    to it, see `use_census_store`. If output areas are aggregated, frames of all coarser layers
+    are derived from output area data, see `aggregate_output_areas`.
+    """
+    def decorator(read_function):
+        @functools.wraps(read_function)
+        def memoised_read_function(geographical_layer=GeographicalLayer.LSOA):
+            key = (dataset_id, geographical_layer)
+            if key not in _CENSUS_DATA_CACHE:
+                if _AGGREGATION['enabled'] and geographical_layer != GeographicalLayer.OA:
+                    data = aggregate_census_data(
+                        memoised_read_function(GeographicalLayer.OA),
+                        read_output_area_lookup(),
+                        geographical_layer
+                    )
+                else:
+                    data = _read_through_store(read_function, dataset_id, category_type,
+                                               geographical_layer)
+                _CENSUS_DATA_CACHE[key] = _read_only(data)
+            return _CENSUS_DATA_CACHE[key]
+        memoised_read_function.dataset_id = dataset_id
+        _CENSUS_READ_FUNCTIONS.append(memoised_read_function)
+        return memoised_read_function
+    return decorator
+
+
+def _read_only(df):
+    values = df.values.copy()
+    values.flags.writeable = False
+    return pd.DataFrame(values, index=df.index, columns=df.columns, copy=False)
+
+
+def invalidate_census_data_cache(dataset_id=None, geographical_layer=None):
+    """Drops memoised census data.
+
+    Parameters:
+        * dataset_id:         only drop data of this nomis dataset, e.g.
+                              NOMIS_KS102EW_DATASET_ID (optional)
+        * geographical_layer: only drop data of this GeographicalLayer (optional)
+
+    Without any parameter, all memoised data is dropped.
+    """
+    for key in list(_CENSUS_DATA_CACHE.keys()):
+        if ((dataset_id is None or key[0] == dataset_id) and
+                (geographical_layer is None or key[1] == geographical_layer)):
+            del _CENSUS_DATA_CACHE[key]
+
+
+def use_census_store(path, offline=False):
+    """Serves census data from a local store on disk.
+
+    The store holds one compact file per (dataset, geographical layer) with the pivoted integer
+    table, as returned by the census read functions. Data missing in the store is retrieved
+    from nomis and added to the store, unless in offline mode.
+
+    Parameters:
+        * path:    the folder of the store, will be created if it does not exist; None to stop
+                   using a store
+        * offline: if True, data missing in the store raises a ValueError instead of being
+                   retrieved from nomis (optional)
+    """
+    _CENSUS_STORE['path'] = Path(path) if path is not None else None
+    _CENSUS_STORE['offline'] = offline
+
+
+def prefetch_census_data(geographical_layers=None, max_workers=None):
+    """Fills the census store with all census datasets in one go.
+
+    All (dataset, geographical layer) pairs missing in the store are retrieved concurrently,
+    with at most `MAX_CONCURRENT_REQUESTS_PER_HOST` requests to one host at a time. Data already
+    in the store is not retrieved again.
+
+    Parameters:
+        * geographical_layers: the GeographicalLayers to prefetch, by default all (optional)
+        * max_workers:         the number of threads, by default one per pair (optional)
+
+    Returns:
+        a list of the paths of all store files of the prefetched data
+    """
+    if _CENSUS_STORE['path'] is None:
+        raise ValueError('No census store in use, see `use_census_store`.')
+    if geographical_layers is None:
+        geographical_layers = list(GeographicalLayer)
+    if _AGGREGATION['enabled']: # all other layers are derived from output areas
+        read_output_area_lookup()
+        geographical_layers = [GeographicalLayer.OA]
+    pairs = [(read_function, geographical_layer)
+             for read_function in _CENSUS_READ_FUNCTIONS
+             for geographical_layer in geographical_layers]
+    with ThreadPoolExecutor(max_workers=max_workers or len(pairs)) as executor:
+        list(executor.map(lambda pair: pair[0](pair[1]), pairs)) # re-raises errors of threads
+    paths = [_store_file_path(read_function.dataset_id, geographical_layer)
+             for read_function in _CENSUS_READ_FUNCTIONS
+             for geographical_layer in geographical_layers]
+    if _AGGREGATION['enabled']:
+        paths.append(_CENSUS_STORE['path'] / OUTPUT_AREA_LOOKUP_FILE_NAME)
+    return paths
+
+
+def aggregate_output_areas(enabled=True):
+    """Derives census data of all layers coarser than output areas from output area data.
+
+    Output areas aggregate exactly to LSOAs and MSOAs, and to wards through the lookup table,
+    see `read_output_area_lookup`. Hence, census tables are retrieved for output areas only,
+    and all layers are consistent with each other.
+    """
+    _AGGREGATION['enabled'] = enabled
+
+
+def aggregate_census_data(data, lookup, geographical_layer):
+    """Aggregates census data of output areas to a coarser geographical layer.
+
+    Parameters:
+        * data:               census data of output areas, as returned by the read functions
+        * lookup:             the lookup table from output areas to coarser layers, see
+                              `read_output_area_lookup`
+        * geographical_layer: the GeographicalLayer to aggregate to
+
+    Returns:
+        the census data of all areas on the geographical layer
+    """
+    if geographical_layer == GeographicalLayer.OA:
+        return data
+    area_codes = lookup[geographical_layer.name].reindex(data.index)
+    if area_codes.isnull().any():
+        raise ValueError('Output areas are missing in the lookup: {}.'
+                         .format(list(data.index[area_codes.isnull().values])))
+    aggregated = data.groupby(area_codes.values).sum()
+    aggregated.index.name = data.index.name
+    return aggregated
+
+
+def read_output_area_lookup():
+    """Reads the lookup table from output areas of Haringey to all coarser layers.
+
+    LSOAs and MSOAs are taken from the attributes of the output area boundaries. Each output
+    area is assigned to the ward containing its representative point. The lookup table is
+    memoised and, if a census store is in use, kept in the store.
+
+    Returns:
+        a DataFrame indexed by output area, with one column per coarser GeographicalLayer named
+        by the layer, holding the code of the area containing the output area
+    """
+    key = (OUTPUT_AREA_LOOKUP_FILE_NAME, GeographicalLayer.OA)
+    if key not in _CENSUS_DATA_CACHE:
+        _CENSUS_DATA_CACHE[key] = _read_only(_read_output_area_lookup_through_store())
+    return _CENSUS_DATA_CACHE[key]
+
+
+def _read_output_area_lookup_through_store():
+    if _CENSUS_STORE['path'] is None:
+        return _output_area_lookup()
+    path = _CENSUS_STORE['path'] / OUTPUT_AREA_LOOKUP_FILE_NAME
+    if path.exists():
+        return pd.read_csv(path.as_posix(), index_col=0, dtype=str)
+    if _CENSUS_STORE['offline']:
+        raise ValueError('Output area lookup is missing in the store {}.'
+                         .format(_CENSUS_STORE['path']))
+    lookup = _output_area_lookup()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lookup.to_csv(path.with_suffix('.part').as_posix())
+    path.with_suffix('.part').rename(path) # readers never see incomplete files
+    return lookup
+
+
+def _output_area_lookup():
+    output_areas = read_haringey_shape_file(GeographicalLayer.OA)
+    wards = read_haringey_shape_file(GeographicalLayer.WARD)
+    points = output_areas.geometry.representative_point()
+    ward_codes = pd.Series(index=output_areas.index, dtype=object)
+    for ward_code, ward in wards.geometry.items():
+        ward_codes[points.within(ward).values] = ward_code
+    lookup = pd.DataFrame(
+        index=output_areas.index,
+        data={
+            GeographicalLayer.LSOA.name: output_areas[LSOA_ID_COLUMN_NAME],
+            GeographicalLayer.MSOA.name: output_areas[MSOA_ID_COLUMN_NAME],
+            GeographicalLayer.WARD.name: ward_codes
+        }
+    )
+    lookup.index.name = GeographicalLayer.OA.name
+    return lookup
+
+
+def expand_geography_codes(geography):
+    """Expands a nomis geography parameter like "1...3,7" to the list of codes [1, 2, 3, 7]."""
+    codes = []
+    for part in geography.split(','):
+        if '...' in part:
+            first, last = part.split('...')
+            codes.extend(range(int(first), int(last) + 1))
+        else:
+            codes.append(int(part))
+    return codes
+
+
+def compress_geography_codes(codes):
+    """Compresses nomis geography codes into runs, e.g. [1, 2, 3, 7] to ["1...3", "7"].
+
+    Codes are sorted and made unique first.
+    """
+    runs = []
+    for code in sorted(set(codes)):
+        if runs and code == runs[-1][1] + 1:
+            runs[-1][1] = code
+        else:
+            runs.append([code, code])
+    return ['{}...{}'.format(first, last) if last > first else str(first)
+            for first, last in runs]
+
+
+def plan_nomis_queries(codes, max_length=None):
+    """Plans the geography parameters of nomis queries retrieving data of all codes.
+
+    Codes are compressed into runs, see `compress_geography_codes`, which are split into chunks
+    such that the geography parameter of each query is at most `max_length` characters long,
+    by default `NOMIS_MAX_GEOGRAPHY_LENGTH`.
+
+    Returns:
+        a list of geography parameters, one per query
+    """
+    if max_length is None:
+        max_length = NOMIS_MAX_GEOGRAPHY_LENGTH
+    chunks = []
+    for run in compress_geography_codes(codes):
+        if chunks and len(chunks[-1]) + 1 + len(run) <= max_length:
+            chunks[-1] = chunks[-1] + ',' + run
+        else:
+            chunks.append(run)
+    return chunks
+
+
+def _query_nomis(dataset_id, query, geography_codes):
+    """Retrieves a nomis dataset for many geographies as one long DataFrame.
+
+    The geographies are queried in chunks, see `plan_nomis_queries`, which are retrieved
+    concurrently, each page by page.
+    """
+    geographies = plan_nomis_queries(geography_codes)
+    if len(geographies) == 1:
+        return _query_nomis_pages(dataset_id, query, geographies[0])
+    with ThreadPoolExecutor(max_workers=len(geographies)) as executor:
+        chunks = list(executor.map(
+            lambda geography: _query_nomis_pages(dataset_id, query, geography),
+            geographies
+        ))
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _query_nomis_pages(dataset_id, query, geography):
+    pages = []
+    while True:
+        url = "{}{}.data.csv?{}&geography={}&recordoffset={}&recordlimit={}".format(
+            NOMIS_API_URL, dataset_id, query, geography,
+            len(pages) * NOMIS_RECORD_LIMIT, NOMIS_RECORD_LIMIT
+        )
+        pages.append(pd.read_csv(io.BytesIO(_get(url).content)))
+        if len(pages[-1]) < NOMIS_RECORD_LIMIT:
+            return pd.concat(pages, ignore_index=True) if len(pages) > 1 else pages[0]
+
+
+def _get(url):
+    """Retrieves a url, retrying with exponential backoff, and limiting requests per host."""
+    for retry in range(MAX_RETRIES + 1):
+        try:
+            with _host_semaphore(urlparse(url).netloc):
+                response = requests.get(url, timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+            return response
+        except requests.RequestException:
+            if retry == MAX_RETRIES:
+                raise
+        time.sleep(RETRY_BACKOFF * 2 ** retry)
+
+
+def _host_semaphore(host):
+    with _HOST_SEMAPHORES_LOCK:
+        if host not in _HOST_SEMAPHORES:
+            _HOST_SEMAPHORES[host] = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS_PER_HOST)
+        return _HOST_SEMAPHORES[host]
+
+
+def _read_through_store(read_function, dataset_id, category_type, geographical_layer):
+    if _CENSUS_STORE['path'] is None:
+        return read_function(geographical_layer)
+    path = _store_file_path(dataset_id, geographical_layer)
+    if path.exists():
+        return _read_store_file(path, category_type)
+    if _CENSUS_STORE['offline']:
+        raise ValueError('Census data {} on layer {} is missing in the store {}, prefetch it '
+                         'first.'.format(dataset_id, geographical_layer.name,
+                                         _CENSUS_STORE['path']))
+    data = read_function(geographical_layer)
+    _write_store_file(data, path)
+    return data
+
+
+def _store_file_path(dataset_id, geographical_layer):
+    return _CENSUS_STORE['path'] / '{}-{}.npz'.format(dataset_id, geographical_layer.name)
+
+
+def _write_store_file(df, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    part_path = path.with_suffix('.part')
+    with part_path.open('wb') as part_file: # file object, so that numpy keeps the name
+        np.savez(
+            part_file,
+            values=df.values.astype(np.int64),
+            index=np.array(df.index, dtype=str),
+            index_name=df.index.name,
+            columns=np.array([category.name for category in df.columns], dtype=str),
+            columns_name=df.columns.name
+        )
+    part_path.rename(path) # readers never see incomplete files
+
+
+def _read_store_file(path, category_type):
+    with np.load(path.as_posix(), allow_pickle=False) as store_file:
+        return pd.DataFrame(
+            store_file['values'],
+            index=pd.Index(store_file['index'].astype(object), name=str(store_file['index_name'])),
+            columns=pd.Index([category_type[name] for name in store_file['columns']],
+                             name=str(store_file['columns_name']))
+        )
+
+
 def read_haringey_shape_file(geographical_layer=GeographicalLayer.LSOA):
     """Reads shape file of Haringey from London Data Store.
 
-    Make sure to use requests_cache to cache the retrieved data.
+    If a census store is in use, the geometries of Haringey are kept in the store per
+    geographical layer, already filtered and indexed, so that the London boundary files are
+    retrieved and read only once. Otherwise, make sure to use requests_cache to cache the
+    retrieved data.
     """
-    import geopandas as gpd
-    r = requests.get(LONDON_BOUNDARY_FILE_URL)
+    if _CENSUS_STORE['path'] is None:
+        return _read_haringey_shape_file(geographical_layer)
+    path = _CENSUS_STORE['path'] / 'shapes-{}.pickle'.format(geographical_layer.name)
+    if path.exists():
+        return pd.read_pickle(path.as_posix())
+    if _CENSUS_STORE['offline']:
+        raise ValueError('Shapes on layer {} are missing in the store {}.'
+                         .format(geographical_layer.name, _CENSUS_STORE['path']))
+    data = _read_haringey_shape_file(geographical_layer)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data.to_pickle(path.with_suffix('.part').as_posix())
+    path.with_suffix('.part').rename(path) # readers never see incomplete files
+    return data
+
+
+def _read_haringey_shape_file(geographical_layer):
+    r = _get(LONDON_BOUNDARY_FILE_URL)
     z = zipfile.ZipFile(io.BytesIO(r.content))
     with tempfile.TemporaryDirectory(prefix='london-boundary-files') as tmpdir:
-        z.extractall(path=tmpdir)
-        shape_file = Path(tmpdir) / geographical_layer.shape_file_path
-        data = gpd.read_file(shape_file.as_posix())
+        boroughs = _read_zipped_shape_file(z, BOROUGH_SHAPE_FILE_PATH, tmpdir)
+        haringey = boroughs[boroughs[BOROUGH_NAME_COLUMN_NAME] == 'Haringey']
+        # reads only the features within the bounding box of Haringey from the London file
+        data = _read_zipped_shape_file(z, geographical_layer.shape_file_path, tmpdir,
+                                       bbox=tuple(haringey.total_bounds))
     data = data[data[geographical_layer.borough_col_name] == 'Haringey']
     return data.set_index(geographical_layer.index_col_name)
 
 
+def _read_zipped_shape_file(zip_file, shape_file_path, folder, bbox=None):
+    """Extracts only the files of one shape file from the zip, and reads it."""
+    import geopandas as gpd
+    member_names = set(zip_file.namelist())
+    for suffix in SHAPE_FILE_SUFFIXES:
+        member_name = shape_file_path.with_suffix(suffix).as_posix()
+        if member_name in member_names:
+            zip_file.extract(member_name, path=folder)
+    return gpd.read_file((Path(folder) / shape_file_path).as_posix(), bbox=bbox)
+
+
+@_memoised(NOMIS_KS102EW_DATASET_ID, AgeStructure)
 def read_age_structure_data(geographical_layer=GeographicalLayer.LSOA):
     """Retrieves age structure date from Census 2011 for Haringey.
 
     Data is taken from the KS102EW table from the UK Census 2011.
     Data is retrieved from nomis, see https://www.nomisweb.co.uk.
+
+    Data is memoised per geographical layer, the returned frame is read-only. This holds for
+    all census read functions.
     """
-    url = ("https://www.nomisweb.co.uk/api/v01/dataset/{}.data.csv" +
-           "?date=latest&geography={}&rural_urban=0&measures=20100" +
-           "&select=geography_code,cell_name,obs_value").format(NOMIS_KS102EW_DATASET_ID,
-                                                                geographical_layer.nomis_geo_codes)
-    r = requests.get(url)
-    df = pd.read_csv(io.BytesIO(r.content))
+    df = _query_nomis(
+        NOMIS_KS102EW_DATASET_ID,
+        "date=latest&rural_urban=0&measures=20100&select=geography_code,cell_name,obs_value",
+        geographical_layer.nomis_geography_codes
+    )
     df = df.pivot(
         index='GEOGRAPHY_CODE',
         columns='CELL_NAME',
@@ -191,19 +591,19 @@ def read_age_structure_data(geographical_layer=GeographicalLayer.LSOA):
     return df
 
 
+@_memoised(NOMIS_QS116EW_DATASET_ID, HouseholdType)
 def read_household_type_data(geographical_layer=GeographicalLayer.LSOA):
     """Retrieves household type date from Census 2011 for Haringey.
 
     Data is taken from the QS116EW table from the UK Census 2011.
     Data is retrieved from nomis, see https://www.nomisweb.co.uk.
     """
-    url = ("https://www.nomisweb.co.uk/api/v01/dataset/{}.data.csv" +
-           "?date=latest&geography={}&rural_urban=0&measures=20100" +
-           "&select=geography_code,c_ahthuk11_name," +
-           "obs_value").format(NOMIS_QS116EW_DATASET_ID,
-                               geographical_layer.nomis_geo_codes)
-    r = requests.get(url)
-    df = pd.read_csv(io.BytesIO(r.content))
+    df = _query_nomis(
+        NOMIS_QS116EW_DATASET_ID,
+        ("date=latest&rural_urban=0&measures=20100" +
+         "&select=geography_code,c_ahthuk11_name,obs_value"),
+        geographical_layer.nomis_geography_codes
+    )
     df = df.pivot(
         index='GEOGRAPHY_CODE',
         columns='C_AHTHUK11_NAME',
@@ -213,18 +613,18 @@ def read_household_type_data(geographical_layer=GeographicalLayer.LSOA):
     return df
 
 
+@_memoised(NOMIS_KS501EW_DATASET_ID, Qualification)
 def read_qualification_level_data(geographical_layer=GeographicalLayer.LSOA):
     """Retrieves highest qualification level data from Census 2011 for Haringey.
 
     Data is taken from the KS501EW table from the UK Census 2011.
     Data is retrieved from nomis, see https://www.nomisweb.co.uk.
     """
-    url = ("https://www.nomisweb.co.uk/api/v01/dataset/{}.data.csv" +
-           "?date=latest&geography={}&rural_urban=0&measures=20100" +
-           "&select=geography_code,cell_name,obs_value").format(NOMIS_KS501EW_DATASET_ID,
-                                                                geographical_layer.nomis_geo_codes)
-    r = requests.get(url)
-    df = pd.read_csv(io.BytesIO(r.content))
+    df = _query_nomis(
+        NOMIS_KS501EW_DATASET_ID,
+        "date=latest&rural_urban=0&measures=20100&select=geography_code,cell_name,obs_value",
+        geographical_layer.nomis_geography_codes
+    )
     df = df.pivot(
         index='GEOGRAPHY_CODE',
         columns='CELL_NAME',
@@ -234,19 +634,19 @@ def read_qualification_level_data(geographical_layer=GeographicalLayer.LSOA):
     return df
 
 
+@_memoised(NOMIS_KS601EW_DATASET_ID, EconomicActivity)
 def read_economic_activity_data(geographical_layer=GeographicalLayer.LSOA):
     """Retrieves economic activity data from Census 2011 for Haringey.
 
     Data is taken from the KS601EW table from the UK Census 2011.
     Data is retrieved from nomis, see https://www.nomisweb.co.uk.
     """
-    url = ("https://www.nomisweb.co.uk/api/v01/dataset/{}.data.csv" +
-           "?date=latest&geography={}&rural_urban=0&measures=20100" +
-           "&c_sex=0" +
-           "&select=geography_code,cell_name,obs_value").format(NOMIS_KS601EW_DATASET_ID,
-                                                                geographical_layer.nomis_geo_codes)
-    r = requests.get(url)
-    df = pd.read_csv(io.BytesIO(r.content))
+    df = _query_nomis(
+        NOMIS_KS601EW_DATASET_ID,
+        ("date=latest&rural_urban=0&measures=20100&c_sex=0" +
+         "&select=geography_code,cell_name,obs_value"),
+        geographical_layer.nomis_geography_codes
+    )
     df = df.pivot(
         index='GEOGRAPHY_CODE',
         columns='CELL_NAME',
@@ -261,7 +661,7 @@ def read_pseudo_individual_data(geographical_layer=GeographicalLayer.LSOA):
 
     The data set will be equivalent to the population sum.
     """
-    data = read_age_structure_data(geographical_layer)
+    data = read_age_structure_data(geographical_layer).copy()
     data[Pseudo.SINGLETON] = data.sum(axis=1)
     return data[[Pseudo.SINGLETON]]
 
@@ -271,6 +671,95 @@ def read_pseudo_household_data(geographical_layer=GeographicalLayer.LSOA):
 
     The data set will be equivalent to the household sum.
     """
-    data = read_household_type_data(geographical_layer)
+    data = read_household_type_data(geographical_layer).copy()
     data[Pseudo.SINGLETON] = data.sum(axis=1)
     return data[[Pseudo.SINGLETON]]
+
+
+class CensusCube():
+    """Census data of several features on one geographical layer as dense integer arrays.
+
+    For each feature, the cube holds an int64 array of shape (regions, categories). All
+    features share the code table of regions, each feature has its own code table of
+    categories. Features are referred to by their name, i.e. `str(feature)`, so that cubes can
+    be sent to worker processes.
+
+    Parameters:
+        * census_data: a dict mapping features to their census data of the same regions, as
+                       returned by the census read functions or `read_census_data` of features
+    """
+
+    def __init__(self, census_data):
+        if len(census_data) == 0:
+            raise ValueError('Census cube needs at least one feature.')
+        regions = list(census_data.values())[0].index.sort_values()
+        if any(not data.index.sort_values().equals(regions) for data in census_data.values()):
+            raise ValueError('Census data of all features must cover the same regions.')
+        self.__regions = regions
+        self.__categories = {str(feature): list(data.columns)
+                             for feature, data in census_data.items()}
+        self.__arrays = {str(feature): data.reindex(regions).values.astype(np.int64)
+                         for feature, data in census_data.items()}
+
+    @classmethod
+    def from_features(cls, features, geographical_layer):
+        """Reads the census data of all features on the geographical layer into a cube."""
+        return cls({feature: feature.read_census_data(geographical_layer)
+                    for feature in features})
+
+    @property
+    def features(self):
+        """The names of all features."""
+        return list(self.__arrays.keys())
+
+    @property
+    def regions(self):
+        """All regions, in order of their codes."""
+        return list(self.__regions)
+
+    def region_code(self, region):
+        """The code of a region, i.e. its row in the arrays."""
+        return self.__regions.get_loc(region)
+
+    def categories(self, feature):
+        """The categories of a feature, in order of the columns of its array."""
+        return self.__categories[str(feature)]
+
+    def array(self, feature):
+        """The array (regions x categories) of a feature."""
+        return self.__arrays[str(feature)]
+
+    def total(self, region):
+        """The grand total of one region, taken from the first feature.
+
+        Features of the same population, e.g. all household features, share their totals.
+        """
+        return int(self.__arrays[self.features[0]][self.region_code(region)].sum())
+
+    def controls(self, region):
+        """The controls of one region, as dict from feature name to a dict of its values.
+
+        This is the format `hipf.fit_hipf` expects. HIPF works on dicts rather than arrays, so
+        a cube saves memory and pickling when it is sent to workers, but not the fitting
+        itself. Building the dicts of one region is cheap compared to fitting the region.
+        """
+        row = self.region_code(region)
+        return {feature: dict(zip(self.__categories[feature], array[row].tolist()))
+                for feature, array in self.__arrays.items()}
+
+    def subset(self, regions):
+        """A cube of only the given regions, e.g. to be sent to a worker process."""
+        cube = CensusCube.__new__(CensusCube)
+        rows = self.__regions.get_indexer(regions)
+        if (rows < 0).any():
+            raise ValueError('Unknown regions: {}.'.format(list(np.array(regions)[rows < 0])))
+        cube.__regions = self.__regions[np.sort(rows)]
+        cube.__categories = self.__categories
+        cube.__arrays = {feature: array[np.sort(rows)] for feature, array in self.__arrays.items()}
+        return cube
+
+    def to_census_data(self):
+        """The census data of all features, as dict from feature name to DataFrame."""
+        return {feature: pd.DataFrame(array, index=self.__regions,
+                                      columns=self.__categories[feature])
+                for feature, array in self.__arrays.items()}
@@ -134,8 +134,9 @@ def _fit(reference_sample, weights, controls):
     for control_name, control_values in controls.items():
         summed_weights = {key: new_weights[reference_sample[control_name] == key].sum()
                           for key, value in control_values.items()}
-        control_values = reference_sample[control_name].map(control_values)
-        summed_weights = reference_sample[control_name].map(summed_weights)
+        # mapping categorical columns may result in categoricals, hence the cast
+        control_values = reference_sample[control_name].map(control_values).astype(np.float64)
+        summed_weights = reference_sample[control_name].map(summed_weights).astype(np.float64)
         new_weights = new_weights * control_values / summed_weights
     return new_weights
 
@@ -145,13 +146,12 @@ def _aggregate_person_weights_to_household(person_weights):
 
 
 def _expand_weights_to_person(weights, person_index):
-    person_weights = weights.copy()
-    person_weights = pd.DataFrame(person_weights)
-    person_weights['person_id'] = 1
-    person_weights.set_index('person_id', append=True, inplace=True)
-    person_weights = person_weights.reindex(person_index)
-    person_weights.fillna(method='ffill', inplace=True)
-    return person_weights.iloc[:, 0] # return series not dataframe
+    # each person gets the weight of its household, whatever the person ids are
+    return pd.Series(
+        weights.reindex(person_index.get_level_values(0)).values,
+        index=person_index,
+        name=weights.name
+    )
 
 
 def _rescale_weights(reference_sample, weights, controls_individuals, controls_households):
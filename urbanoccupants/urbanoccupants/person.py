@@ -1,9 +1,7 @@
-from collections import OrderedDict
 import datetime
 from enum import Enum
-import math
 
-import pykov
+import numpy as np
 import pandas as pd
 
 
@@ -46,6 +44,11 @@ class Activity(OrderedEnum):
         return self.name
 
 
+ACTIVITIES = list(Activity)
+ACTIVITY_INDEX = {activity: index for index, activity in enumerate(ACTIVITIES)}
+DAY_TYPES = ['weekday', 'weekend']
+
+
 class Person():
     """The model of a citizen making choices on activities and locations.
 
@@ -97,9 +100,126 @@ class Person():
         )
 
 
+class PopulationSimulator():
+    """Simulates the activities of an entire population of citizens at once.
+
+    The activities of all citizens are held as int8 array of indices into `ACTIVITIES`, and
+    each time step moves all citizens at once by inverse transform sampling from the
+    cumulative transition probabilities of their markov chains. The markov chains of all markov
+    ids are stacked into a single array, each citizen refers to its chain by code.
+
+    Each citizen has its own stream of random numbers, seeded by its random seed: the random
+    number of a citizen at the n-th time step is the n-th number of a SplitMix64 generator
+    seeded with the random seed. Hence, the activities of a citizen do not depend on the other
+    citizens simulated together with it. The activities are the same as the ones of a `Person`
+    whose number generator returns the same stream of numbers.
+
+    Parameters:
+        * markov_chains:      a dict of markov ids to WeekMarkovChains
+        * markov_ids:         the markov id of each citizen
+        * initial_activities: the Activity of each citizen at initial time
+        * random_seeds:       the non-negative integer random seed of each citizen
+        * initial_time:       the initial time
+        * time_step_size:     the time step size of the simulation, must be consistent with
+                              time step size of markov chains
+
+    For example:
+
+    simulator = PopulationSimulator(
+        markov_chains=markov_chains,
+        markov_ids=[citizen.markovId for citizen in citizens],
+        initial_activities=[citizen.initialActivity for citizen in citizens],
+        random_seeds=[citizen.randomSeed for citizen in citizens],
+        initial_time=datetime(2016, 12, 15, 12, 00),
+        time_step_size=timedelta(minutes=10)
+    )
+    occupancy = simulator.run(number_steps=144) # (citizens x time steps) int8 matrix
+    """
+
+    def __init__(self, markov_chains, markov_ids, initial_activities, random_seeds,
+                 initial_time, time_step_size):
+        if not markov_chains:
+            raise ValueError('Markov chains are missing.')
+        assert all(chain.time_step_size == time_step_size for chain in markov_chains.values())
+        if not len(markov_ids) == len(initial_activities) == len(random_seeds):
+            raise ValueError('Markov ids, initial activities, and random seeds must have the '
+                             'same length.')
+        chain_codes = {markov_id: code for code, markov_id in enumerate(markov_chains.keys())}
+        unknown_markov_ids = set(markov_ids) - set(chain_codes.keys())
+        if unknown_markov_ids:
+            raise ValueError('Unknown markov ids: {}.'.format(sorted(unknown_markov_ids)))
+        random_seeds = np.asarray(random_seeds, dtype=np.int64)
+        if (random_seeds < 0).any():
+            raise ValueError('Random seeds must be non-negative.')
+        self.__chain = next(iter(markov_chains.values()))
+        self.__probabilities = np.stack([chain.transition_probabilities
+                                         for chain in markov_chains.values()])
+        self.__cumulative_probabilities = np.cumsum(self.__probabilities, axis=-1)
+        self.__chain_codes = np.array([chain_codes[markov_id] for markov_id in markov_ids],
+                                      dtype=np.intp)
+        self.__activities = np.array([ACTIVITY_INDEX[activity]
+                                      for activity in initial_activities], dtype=np.int8)
+        self.__random_seeds = random_seeds.astype(np.uint64)
+        self.__number_steps = 0
+        self.__time = initial_time
+        self.__time_step_size = time_step_size
+
+    def __len__(self):
+        """The number of citizens."""
+        return len(self.__activities)
+
+    @property
+    def time(self):
+        return self.__time
+
+    @property
+    def activities(self):
+        """The current activities of all citizens as indices into `ACTIVITIES`."""
+        return self.__activities.copy()
+
+    def step(self):
+        """Run simulation for one time step.
+
+        Chooses new activities of all citizens.
+        Updates internal time by time step.
+        """
+        day, step = self.__chain._day_and_step(self.__time)
+        rows = (self.__chain_codes, day, step, self.__activities)
+        possible = self.__probabilities[rows] > 0
+        if not possible.any(axis=1).all():
+            raise ValueError('No transition for some citizens at {}.'.format(self.__time))
+        random_numbers = _splitmix64_uniform(self.__random_seeds, self.__number_steps + 1)
+        chosen = possible & (random_numbers[:, np.newaxis] <=
+                             self.__cumulative_probabilities[rows])
+        # fall back to the last possible activity in case of rounding errors
+        last_possible = possible.shape[1] - 1 - np.argmax(possible[:, ::-1], axis=1)
+        self.__activities = np.where(chosen.any(axis=1), np.argmax(chosen, axis=1),
+                                     last_possible).astype(np.int8)
+        self.__number_steps += 1
+        self.__time += self.__time_step_size
+
+    def run(self, number_steps):
+        """Runs the simulation for a number of time steps.
+
+        Returns:
+            an int8 matrix of shape (citizens, time steps) of indices into `ACTIVITIES`, where
+            column n holds the activities n time steps after the current time
+        """
+        occupancy = np.empty((len(self), number_steps), dtype=np.int8)
+        for time_step in range(number_steps):
+            occupancy[:, time_step] = self.__activities
+            self.step()
+        return occupancy
+
+
 class WeekMarkovChain():
     """A time heterogeneous markov chain of people activities for one week.
 
+    The chain is held as dense array of transition probabilities of shape (day type, time step,
+    from activity, to activity), together with the cumulative probabilities along the last
+    axis for sampling. Day types are weekday and weekend, activities are in order of
+    `Activity`.
+
     Parameters:
         * weekday_time_series: 24h time series of Activities with given time step size of a
                                weekday. The index should be instances of time, and there can
@@ -115,132 +235,125 @@ class WeekMarkovChain():
             raise ValueError('Weekday time series contains missing values.')
         if weekend_time_series.isnull().any().any():
             raise ValueError('Weekend time series contains missing values.')
-        self.__chain = {
-            'weekday': WeekMarkovChain._day_markov_chain(weekday_time_series, time_step_size),
-            'weekend': WeekMarkovChain._day_markov_chain(weekend_time_series, time_step_size)
-        }
+        self.__probabilities = np.stack([
+            WeekMarkovChain._day_markov_chain(weekday_time_series, time_step_size),
+            WeekMarkovChain._day_markov_chain(weekend_time_series, time_step_size)
+        ])
         self._add_missing_transitions()
         # there is a chance that after the first round of adding transitions, the markov chain is
         # still not valid (the first element could have a new element now that the second doesn't
         # have). This is ignored for the moment, as the chain is validated anyway again.
         self._validate()
+        self.__cumulative_probabilities = np.cumsum(self.__probabilities, axis=3)
 
     @property
     def time_step_size(self):
         return self.__time_step_size
 
+    @property
+    def transition_probabilities(self):
+        """The array of transition probabilities (day type, time step, from, to)."""
+        return self.__probabilities
+
     def move(self, current_state, current_time, random_func):
-        return self.__chain[WeekMarkovChain._weekday(current_time)][current_time.time()].move(
-            state=current_state,
-            random_func=random_func
-        )
+        day, step = self._day_and_step(current_time)
+        from_activity = ACTIVITY_INDEX[current_state]
+        probabilities = self.__probabilities[day, step, from_activity]
+        cumulative_probabilities = self.__cumulative_probabilities[day, step, from_activity]
+        possible = probabilities > 0
+        if not possible.any():
+            raise ValueError('No transition from {} at {}.'.format(current_state, current_time))
+        random_number = random_func(0, 1)
+        chosen = np.flatnonzero(possible & (random_number <= cumulative_probabilities))
+        if len(chosen) == 0: # rounding errors of the cumulative probabilities
+            chosen = np.flatnonzero(possible)[-1:]
+        return ACTIVITIES[chosen[0]]
 
     def valid_states(self, time_stamp):
         """Returns all valid states at given time stamp."""
-        return [item[0][0] for item in
-                self.__chain[WeekMarkovChain._weekday(time_stamp)][time_stamp.time()].items()]
+        day, step = self._day_and_step(time_stamp)
+        return [ACTIVITIES[from_activity]
+                for from_activity, unused in zip(*np.nonzero(self.__probabilities[day, step]))]
 
-    def to_dataframe(self):
+    def to_dataframe(self, drop_zeros=True):
         """Creates a dataframe representation of a time heterogeneous markov chain.
 
-        Can be used to serialise the markov chain into csv or sql.
+        Can be used to serialise the markov chain into csv or sql. All columns are created
+        directly from the array of transition probabilities.
+
+        Parameters:
+            * drop_zeros: if True, only transitions with non-zero probability are included,
+                          otherwise all (day, time, from, to) combinations are included
         """
-        df = pd.DataFrame(columns=[
-            MARKOV_CHAIN_DAY_COLUMN_NAME,
-            MARKOV_CHAIN_TIME_OF_DAY_COLUMN_NAME,
-            MARKOV_CHAIN_FROM_ACTIVITY_COLUMN_NAME,
-            MARKOV_CHAIN_TO_ACTIVITY_COLUMN_NAME,
-            MARKOV_CHAIN_PROBABILITY_COLUMN_NAME
-        ])
-        for day, day_chain in self.__chain.items():
-            assert day in ['weekday', 'weekend']
-            for time_stamp, single_markov_chain in day_chain.items():
-                assert isinstance(time_stamp, datetime.time)
-                single_df = pd.DataFrame({
-                    MARKOV_CHAIN_DAY_COLUMN_NAME: day,
-                    MARKOV_CHAIN_TIME_OF_DAY_COLUMN_NAME: time_stamp,
-                    MARKOV_CHAIN_FROM_ACTIVITY_COLUMN_NAME: [element[0]
-                                                             for element in single_markov_chain],
-                    MARKOV_CHAIN_TO_ACTIVITY_COLUMN_NAME: [element[1]
-                                                           for element in single_markov_chain],
-                    MARKOV_CHAIN_PROBABILITY_COLUMN_NAME: [single_markov_chain[element]
-                                                           for element in single_markov_chain]
-                })
-                df = df.append(single_df, ignore_index=True)
+        time_steps = list(WeekMarkovChain._day_time_step_generator(self.__time_step_size))
+        if drop_zeros:
+            day, step, from_activity, to_activity = np.nonzero(self.__probabilities)
+        else:
+            day, step, from_activity, to_activity = [
+                indices.ravel() for indices in np.indices(self.__probabilities.shape)
+            ]
+        df = pd.DataFrame({
+            MARKOV_CHAIN_FROM_ACTIVITY_COLUMN_NAME: _object_array(ACTIVITIES)[from_activity],
+            MARKOV_CHAIN_TO_ACTIVITY_COLUMN_NAME: _object_array(ACTIVITIES)[to_activity],
+            MARKOV_CHAIN_PROBABILITY_COLUMN_NAME: self.__probabilities[day, step, from_activity,
+                                                                       to_activity]
+        }, index=pd.MultiIndex.from_arrays(
+            [_object_array(DAY_TYPES)[day], _object_array(time_steps)[step]],
+            names=[MARKOV_CHAIN_DAY_COLUMN_NAME, MARKOV_CHAIN_TIME_OF_DAY_COLUMN_NAME]
+        ))
         assert not df.isnull().any().any()
-        df.set_index(
-            [MARKOV_CHAIN_DAY_COLUMN_NAME, MARKOV_CHAIN_TIME_OF_DAY_COLUMN_NAME],
-            inplace=True
-        )
         return df
 
+    def _day_and_step(self, time_stamp):
+        return (DAY_TYPES.index(WeekMarkovChain._weekday(time_stamp)),
+                self._step(time_stamp.time()))
+
+    def _step(self, time_of_day):
+        minutes = time_of_day.hour * 60 + time_of_day.minute
+        step_minutes = int(self.__time_step_size.total_seconds() / 60)
+        if time_of_day.second or time_of_day.microsecond or minutes % step_minutes:
+            raise KeyError(time_of_day)
+        return minutes // step_minutes
+
     def _validate(self):
-        assert 'weekday' in self.__chain.keys()
-        assert 'weekend' in self.__chain.keys()
-        assert all(isinstance(time_step, datetime.time)
-                   for time_step in self.__chain['weekday'].keys())
-        assert all(isinstance(time_step, datetime.time)
-                   for time_step in self.__chain['weekend'].keys())
-        assert all(isinstance(activity, Activity)
-                   for chain in self.__chain['weekday'].values()
-                   for activity in chain.states())
-        assert all(isinstance(activity, Activity)
-                   for chain in self.__chain['weekend'].values()
-                   for activity in chain.states())
+        number_steps = len(list(WeekMarkovChain._day_time_step_generator(self.__time_step_size)))
+        assert self.__probabilities.shape == (len(DAY_TYPES), number_steps, len(ACTIVITIES),
+                                              len(ACTIVITIES))
         assert self._valid_transitions()
         assert self._valid_probabilities()
 
     def _valid_probabilities(self):
-        return all(WeekMarkovChain._probabilities_add_to_one(self.__chain[day][time])
-                   for day in ['weekday', 'weekend']
-                   for time in WeekMarkovChain._day_time_step_generator(self.__time_step_size))
-
-    @staticmethod
-    def _probabilities_add_to_one(markov_chain):
-        start_states = [item[0][0] for item in markov_chain.items()]
-        return all(math.isclose(
-                   sum(item[1] for item in markov_chain.items() if item[0][0] == start_state),
-                   1.0,
-                   abs_tol=0.001
-                   ) for start_state in start_states)
+        row_sums = self.__probabilities.sum(axis=3)
+        start_states = (self.__probabilities > 0).any(axis=3)
+        return np.allclose(row_sums[start_states], 1.0, rtol=0, atol=0.001)
 
     def _valid_transitions(self):
-        flags = [WeekMarkovChain._valid_transition(self.__chain[day][time],
-                                                   self.__chain[next_day][next_time])
+        flags = [WeekMarkovChain._valid_transition(self.__day_time_chain(day, time),
+                                                   self.__day_time_chain(next_day, next_time))
                  for day, time, next_day, next_time
                  in WeekMarkovChain._all_possible_time_combinations(self.__time_step_size)]
         return all(flags)
 
     @staticmethod
     def _valid_transition(single_markov_chain, next_single_markov_chain):
-        end_states_first = [x[0][1] for x in single_markov_chain.items()]
-        start_states_second = [x[0][0] for x in next_single_markov_chain.items()]
-        return all([state in start_states_second for state in end_states_first])
+        end_states_first = (single_markov_chain > 0).any(axis=0)
+        start_states_second = (next_single_markov_chain > 0).any(axis=1)
+        return not (end_states_first & ~start_states_second).any()
 
     def _add_missing_transitions(self):
         for day, time in WeekMarkovChain._week_time_steps_generator(self.__time_step_size):
             next_day, next_time = WeekMarkovChain._add_delta_to_day_and_time(day, time,
                                                                              self.__time_step_size)
-            current_chain = self.__chain[day][time].items()
-            next_chain = self.__chain[next_day][next_time].items()
-            end_states_current_chain = [x[0][1] for x in current_chain]
-            start_states_next_chain = [x[0][0] for x in next_chain]
-            missing_start_states = [state for state in end_states_current_chain
-                                    if state not in start_states_next_chain]
-            for missing_state in missing_start_states:
-                self._add_transition(
-                    day=next_day,
-                    time=next_time,
-                    from_activity=missing_state,
-                    to_activity=missing_state,
-                    probability=1.0
-                )
+            end_states_current_chain = (self.__day_time_chain(day, time) > 0).any(axis=0)
+            next_chain = self.__day_time_chain(next_day, next_time)
+            start_states_next_chain = (next_chain > 0).any(axis=1)
+            for missing_state in np.flatnonzero(end_states_current_chain &
+                                                ~start_states_next_chain):
+                next_chain[missing_state, missing_state] = 1.0
 
-    def _add_transition(self, day, time, from_activity, to_activity, probability):
-        chain = self.__chain[day][time]
-        elements = OrderedDict(chain)
-        elements[(from_activity, to_activity)] = probability
-        self.__chain[day][time] = pykov.Chain(elements)
+    def __day_time_chain(self, day, time):
+        """The (from, to) array of one day type and time of day, a view, not a copy."""
+        return self.__probabilities[DAY_TYPES.index(day), self._step(time)]
 
     @staticmethod
     def _weekday(time_stamp):
@@ -253,10 +366,38 @@ class WeekMarkovChain():
 
     @staticmethod
     def _day_markov_chain(day_time_series, time_step_size):
-        return {
-            time_step: WeekMarkovChain._markov_chain(time_step, day_time_series, time_step_size)
-            for time_step in WeekMarkovChain._day_time_step_generator(time_step_size)
-        }
+        """Estimates the (time step, from, to) transition probabilities of one day type.
+
+        All transitions of all diaries are counted in one pass: the day time series is encoded
+        as (time step x diary) matrix of activity indices, and each transition is encoded as
+        single number (time step, from, to) which is then counted. The last time step
+        transitions into the first one of the same diary.
+        """
+        time_steps = list(WeekMarkovChain._day_time_step_generator(time_step_size))
+        activities = WeekMarkovChain._activity_matrix(day_time_series.loc[time_steps])
+        next_activities = np.roll(activities, shift=-1, axis=0)
+        number_activities = len(ACTIVITIES)
+        transitions = (np.arange(len(time_steps))[:, np.newaxis] * number_activities +
+                       activities) * number_activities + next_activities
+        counts = np.bincount(
+            transitions.ravel(),
+            minlength=len(time_steps) * number_activities * number_activities
+        ).reshape(len(time_steps), number_activities, number_activities)
+        current_instances = counts.sum(axis=2, keepdims=True)
+        probabilities = np.zeros(counts.shape, dtype=np.float64)
+        np.divide(counts, current_instances, out=probabilities, where=current_instances > 0)
+        return probabilities
+
+    @staticmethod
+    def _activity_matrix(time_series):
+        """Encodes a time series of Activities as int8 matrix of activity indices."""
+        values = time_series.values
+        activities = np.full(values.shape, -1, dtype=np.int8)
+        for index, activity in enumerate(ACTIVITIES):
+            activities[values == activity] = index
+        if (activities < 0).any():
+            raise ValueError('Time series contains values that are no Activities.')
+        return activities
 
     @staticmethod
     def _day_time_step_generator(time_step_size):
@@ -283,30 +424,6 @@ class WeekMarkovChain():
                 )
                 yield day, time_step, next_day, next_time
 
-    @staticmethod
-    def _markov_chain(time_step, day_time_series, time_step_size):
-        next_time_step = WeekMarkovChain._add_delta_to_time(time_step, time_step_size)
-        current_vector = day_time_series.loc[time_step]
-        next_vector = day_time_series.loc[next_time_step]
-        chain_elements = [((current_state, next_state), WeekMarkovChain._probability(current_state,
-                                                                                     next_state,
-                                                                                     current_vector,
-                                                                                     next_vector))
-                          for current_state in Activity
-                          for next_state in Activity]
-        return pykov.Chain(OrderedDict(chain_elements))
-
-    @staticmethod
-    def _probability(current_state, next_state, current_vector, next_vector):
-        if current_state in current_vector.unique():
-            current_mask = current_vector == current_state
-            next_mask = next_vector == next_state
-            next_instances = (current_mask & next_mask).sum()
-            current_instances = current_mask.sum()
-            return next_instances / current_instances
-        else:
-            return 0
-
     @staticmethod
     def _add_delta_to_time(time_step, delta):
         fulldate = datetime.datetime.combine(datetime.datetime(100, 1, 1), time_step)
@@ -322,3 +439,19 @@ class WeekMarkovChain():
         else:
             next_day = 'weekend' if day == 'weekday' else 'weekday'
             return next_day, updated_date.time()
+
+
+def _object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _splitmix64_uniform(seeds, counter):
+    """The `counter`-th uniform random number in [0, 1) of SplitMix64 generators per seed."""
+    with np.errstate(over='ignore'):
+        z = seeds + np.uint64(0x9E3779B97F4A7C15) * np.uint64(counter)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)) * (1.0 / 2 ** 53)
@@ -0,0 +1,195 @@
+"""Sharing large data sets with worker processes through shared memory.
+
+Worker functions of this library, e.g. `synthpop.run_hipf` or `tus.markov_chain_for_cluster`,
+receive the seed and the markov time series inside their parameter tuple, which means both are
+pickled for every single task and copied into every worker. Instead, the data can be
+published once into shared memory using `SharedFrame`, and only its small descriptor is passed
+with each task. Workers attach by name, ideally once in the pool initializer:
+
+    with SharedFrame(seed) as shared_seed, \
+            Pool(4, initializer=attach, initargs=(shared_seed.descriptor, )) as pool:
+        pool.imap_unordered(run_hipf, ((shared_seed.descriptor, ...) for ...))
+
+All worker functions accepting a seed or time series accept a descriptor as well.
+
+Data is stored columnar: numerical columns as they are, categorical columns as their codes,
+and object columns (e.g. Enums) as codes of their unique values. Attached columns of the
+latter two kinds are categoricals, see `synthpop.encode_features`.
+
+Requires Python 3.8 or newer.
+"""
+from collections import namedtuple
+import pickle
+
+import numpy as np
+import pandas as pd
+
+
+SharedFrameDescriptor = namedtuple('SharedFrameDescriptor', ['name', 'metadata_size'])
+_ArrayLayout = namedtuple('_ArrayLayout', ['dtype', 'offset', 'length'])
+_ColumnLayout = namedtuple('_ColumnLayout', ['name', 'array', 'categories', 'ordered'])
+
+_ALIGNMENT = 64
+_ATTACHED = {} # shared memory name -> (shared memory, data); per process
+
+
+class SharedFrame():
+    """A pandas DataFrame or Series published into shared memory.
+
+    The owner of the shared memory is the process creating the `SharedFrame`, and the shared
+    memory lives until `unlink` is called, or the context of the `SharedFrame` is left.
+
+    Parameters:
+        * data: the DataFrame or Series to publish
+    """
+
+    def __init__(self, data):
+        from multiprocessing import shared_memory
+        arrays, metadata = _columnar(data)
+        # memory layout: metadata, followed by all arrays, each aligned
+        layouts = []
+        offset = 0
+        for array in arrays:
+            layouts.append(_ArrayLayout(array.dtype.str, offset, len(array)))
+            offset = _aligned(offset + array.nbytes)
+        metadata['arrays'] = layouts
+        metadata_bytes = pickle.dumps(metadata, protocol=pickle.HIGHEST_PROTOCOL)
+        data_offset = _aligned(len(metadata_bytes))
+        self.__shared_memory = shared_memory.SharedMemory(create=True,
+                                                          size=data_offset + max(offset, 1))
+        self.__shared_memory.buf[:len(metadata_bytes)] = metadata_bytes
+        for array, layout in zip(arrays, layouts):
+            _view(self.__shared_memory, data_offset, layout, writeable=True)[:] = array
+        self.__descriptor = SharedFrameDescriptor(self.__shared_memory.name, len(metadata_bytes))
+
+    @property
+    def descriptor(self):
+        """A small and picklable reference to the shared data, see `attach`."""
+        return self.__descriptor
+
+    def unlink(self):
+        """Releases the shared memory. Attached workers must not access the data anymore."""
+        _ATTACHED.pop(self.__descriptor.name, None)
+        self.__shared_memory.close()
+        self.__shared_memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.unlink()
+
+
+def attach(*descriptors):
+    """Attaches to shared data and returns it.
+
+    Data is attached only once per process and descriptor, any subsequent call returns the
+    same object. Hence, this function can be used as pool initializer, so that the data is
+    available to all tasks of the worker.
+
+    Returns:
+        the DataFrame or Series if a single descriptor is given, a list of them otherwise
+    """
+    data = [_attach(descriptor) for descriptor in descriptors]
+    return data[0] if len(data) == 1 else data
+
+
+def resolve(data):
+    """Returns the attached data if `data` is a descriptor, or `data` itself otherwise."""
+    if isinstance(data, SharedFrameDescriptor):
+        return _attach(data)
+    return data
+
+
+def _attach(descriptor):
+    if descriptor.name not in _ATTACHED:
+        from multiprocessing import shared_memory
+        # pool workers share the resource tracker of the owner, which tracks the shared
+        # memory only once and hence does not release it when workers end
+        shm = shared_memory.SharedMemory(name=descriptor.name)
+        metadata = pickle.loads(bytes(shm.buf[:descriptor.metadata_size]))
+        _ATTACHED[descriptor.name] = (shm, _restore(shm, descriptor.metadata_size, metadata))
+    return _ATTACHED[descriptor.name][1]
+
+
+def _columnar(data):
+    is_series = isinstance(data, pd.Series)
+    df = data.to_frame() if is_series else data
+    if not isinstance(df, pd.DataFrame):
+        raise ValueError('Data must be pandas Series or DataFrame, but was {}.'.format(type(data)))
+    arrays = []
+    columns = []
+    for column_name in df.columns:
+        values, categories, ordered = _encode(df[column_name])
+        columns.append(_ColumnLayout(column_name, len(arrays), categories, ordered))
+        arrays.append(values)
+    index = df.index
+    if isinstance(index, pd.MultiIndex):
+        index_levels = list(index.levels)
+        index_codes = [np.asarray(codes) for codes in index.codes]
+    else:
+        codes, uniques = pd.factorize(index)
+        index_levels = [uniques]
+        index_codes = [codes]
+    metadata = {
+        'is_series': is_series,
+        'series_name': data.name if is_series else None,
+        'columns': columns,
+        'index_names': list(index.names),
+        'index_levels': index_levels,
+        'index_codes': list(range(len(arrays), len(arrays) + len(index_codes))),
+        'is_multi_index': isinstance(index, pd.MultiIndex)
+    }
+    arrays += index_codes
+    return [np.ascontiguousarray(array) for array in arrays], metadata
+
+
+def _encode(values):
+    if isinstance(values.dtype, pd.api.types.CategoricalDtype):
+        return (values.cat.codes.values, list(values.cat.categories), values.cat.ordered)
+    if values.dtype == object:
+        codes, uniques = pd.factorize(values)
+        return (_smallest_codes(codes, len(uniques)), list(uniques), False)
+    return values.values, None, None
+
+
+def _smallest_codes(codes, number_categories):
+    for dtype in [np.int8, np.int16, np.int32]:
+        if number_categories < np.iinfo(dtype).max:
+            return codes.astype(dtype)
+    return codes
+
+
+def _restore(shm, metadata_size, metadata):
+    data_offset = _aligned(metadata_size)
+    arrays = [_view(shm, data_offset, layout, writeable=False) for layout in metadata['arrays']]
+    data = {}
+    for column in metadata['columns']:
+        values = arrays[column.array]
+        if column.categories is not None:
+            values = pd.Categorical.from_codes(values, categories=column.categories,
+                                               ordered=column.ordered)
+        data[column.name] = values
+    index_codes = [arrays[i] for i in metadata['index_codes']]
+    if metadata['is_multi_index']:
+        index = pd.MultiIndex(levels=metadata['index_levels'], codes=index_codes,
+                              names=metadata['index_names'])
+    else:
+        index = metadata['index_levels'][0].take(index_codes[0])\
+            .rename(metadata['index_names'][0])
+    if metadata['is_series']:
+        column = metadata['columns'][0]
+        return pd.Series(data[column.name], index=index, name=metadata['series_name'])
+    return pd.DataFrame(data, index=index, columns=[column.name
+                                                    for column in metadata['columns']])
+
+
+def _view(shm, data_offset, layout, writeable):
+    array = np.ndarray(shape=(layout.length, ), dtype=np.dtype(layout.dtype),
+                       buffer=shm.buf, offset=data_offset + layout.offset)
+    array.flags.writeable = writeable
+    return array
+
+
+def _aligned(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
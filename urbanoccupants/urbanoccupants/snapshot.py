@@ -0,0 +1,232 @@
+"""Columnar and memory-mappable snapshots of synthetic populations.
+
+A snapshot is a folder containing one `.npy` file per column of the households and the
+citizens of a synthetic population, and a `manifest.json` describing the columns and the code
+tables of all coded columns: regions, seed households, markov chains, and activities. Coded
+columns are stored as integer codes into their code table.
+
+Snapshots are written next to the input database of the simulation. Analyses can load only the
+columns they need, without synthesising the population again or scanning the database:
+
+    snapshot = Snapshot(path_to_snapshot)
+    regions = snapshot.households(columns=['region'])
+    random_seeds = snapshot.column(CITIZENS, 'randomSeed') # memory-mapped, no copy
+"""
+import json
+from pathlib import Path
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from .person import Activity
+from .synthpop import Household, Citizen
+
+
+HOUSEHOLDS = 'households'
+CITIZENS = 'citizens'
+MANIFEST_FILE_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+_DTYPES = {
+    HOUSEHOLDS: {
+        'id': np.int64,
+        'seedId': np.int32,
+        'region': np.int32
+    },
+    CITIZENS: {
+        'householdId': np.int64,
+        'markovId': np.int32,
+        'initialActivity': np.int8,
+        'activeMetabolicRate': np.float64,
+        'passiveMetabolicRate': np.float64,
+        'randomSeed': np.int64
+    }
+}
+# coded columns: conversion of their values to json and back
+_CODE_TABLES = {
+    'seedId': (lambda seed_id: list(seed_id) if isinstance(seed_id, tuple) else int(seed_id),
+               lambda seed_id: tuple(seed_id) if isinstance(seed_id, list) else seed_id),
+    'region': (str, str),
+    'markovId': (int, int),
+    'initialActivity': (lambda activity: activity.name, lambda name: Activity[name])
+}
+_TUPLES = {HOUSEHOLDS: Household, CITIZENS: Citizen}
+
+
+class SnapshotWriter():
+    """Writes a snapshot of a synthetic population, possibly in several batches.
+
+    Batches are appended to temporary files, which are turned into `.npy` files when the writer
+    is closed. Hence, the population never needs to be held in memory entirely.
+
+    Parameters:
+        * path: the folder of the snapshot, must not exist
+    """
+
+    def __init__(self, path):
+        self.__path = Path(path)
+        if self.__path.exists():
+            raise ValueError('Snapshot exists already: {}.'.format(self.__path))
+        self.__path.mkdir(parents=True)
+        self.__lengths = {table: 0 for table in _DTYPES.keys()}
+        self.__code_tables = {column: {} for column in _CODE_TABLES.keys()}
+        self.__files = {
+            (table, column): _column_path(self.__path, table, column, '.part').open('wb')
+            for table, columns in _DTYPES.items()
+            for column in columns.keys()
+        }
+        self.__closed = False
+
+    def append(self, households, citizens):
+        """Appends households and citizens, given as lists of `Household` and `Citizen`."""
+        for table, rows in [(HOUSEHOLDS, households), (CITIZENS, citizens)]:
+            for column, dtype in _DTYPES[table].items():
+                values = [getattr(row, column) for row in rows]
+                if column in self.__code_tables:
+                    values = [self.__code(column, value) for value in values]
+                self.__files[(table, column)].write(np.asarray(values, dtype=dtype).tobytes())
+            self.__lengths[table] += len(rows)
+
+    def close(self):
+        """Writes the `.npy` files and the manifest. The snapshot is complete afterwards."""
+        if self.__closed:
+            return
+        self.__closed = True
+        for (table, column), part_file in self.__files.items():
+            part_file.close()
+            part_path = _column_path(self.__path, table, column, '.part')
+            with _column_path(self.__path, table, column).open('wb') as npy_file, \
+                    part_path.open('rb') as part_file:
+                np.lib.format.write_array_header_1_0(npy_file, {
+                    'descr': np.lib.format.dtype_to_descr(np.dtype(_DTYPES[table][column])),
+                    'fortran_order': False,
+                    'shape': (self.__lengths[table], )
+                })
+                shutil.copyfileobj(part_file, npy_file)
+            part_path.unlink()
+        manifest = {
+            'format-version': FORMAT_VERSION,
+            'tables': {
+                table: {
+                    'length': self.__lengths[table],
+                    'columns': {column: np.dtype(dtype).str for column, dtype in columns.items()}
+                }
+                for table, columns in _DTYPES.items()
+            },
+            'code-tables': {
+                column: [_CODE_TABLES[column][0](value) for value in code_table.keys()]
+                for column, code_table in self.__code_tables.items()
+            }
+        }
+        with (self.__path / MANIFEST_FILE_NAME).open('w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+    def __code(self, column, value):
+        code_table = self.__code_tables[column]
+        if value not in code_table:
+            code_table[value] = len(code_table)
+        return code_table[value]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, *args):
+        if exception_type is None:
+            self.close()
+        else: # leave the snapshot incomplete, i.e. without manifest
+            for part_file in self.__files.values():
+                part_file.close()
+
+
+class Snapshot():
+    """A snapshot of a synthetic population, written by `SnapshotWriter`.
+
+    Parameters:
+        * path: the folder of the snapshot
+    """
+
+    def __init__(self, path):
+        self.__path = Path(path)
+        manifest_path = self.__path / MANIFEST_FILE_NAME
+        if not manifest_path.exists():
+            raise ValueError('Snapshot is missing or incomplete: {}.'.format(self.__path))
+        with manifest_path.open('r') as manifest_file:
+            self.__manifest = json.load(manifest_file)
+        if self.__manifest['format-version'] != FORMAT_VERSION:
+            raise ValueError('Unsupported snapshot format version {}.'
+                             .format(self.__manifest['format-version']))
+
+    def __len__(self):
+        """The number of households."""
+        return self.__manifest['tables'][HOUSEHOLDS]['length']
+
+    @property
+    def number_citizens(self):
+        """The number of citizens."""
+        return self.__manifest['tables'][CITIZENS]['length']
+
+    def code_table(self, column):
+        """The values of a coded column, in order of their codes."""
+        return [_CODE_TABLES[column][1](value)
+                for value in self.__manifest['code-tables'][column]]
+
+    def column(self, table, column):
+        """The raw values of a column as read-only memory-mapped numpy array.
+
+        Values of coded columns are codes into `code_table(column)`.
+        """
+        if column not in self.__manifest['tables'][table]['columns']:
+            raise ValueError('Unknown column {} of table {}.'.format(column, table))
+        return np.load(_column_path(self.__path, table, column), mmap_mode='r')
+
+    def households(self, columns=None):
+        """Loads columns of the households, by default all, as DataFrame.
+
+        Coded columns are Categoricals.
+        """
+        return self.__table(HOUSEHOLDS, columns)
+
+    def citizens(self, columns=None):
+        """Loads columns of the citizens, by default all, as DataFrame.
+
+        Coded columns are Categoricals.
+        """
+        return self.__table(CITIZENS, columns)
+
+    def __table(self, table, columns):
+        if columns is None:
+            columns = list(self.__manifest['tables'][table]['columns'].keys())
+        data = {}
+        for column in columns:
+            values = self.column(table, column)
+            if column in _CODE_TABLES:
+                values = pd.Categorical.from_codes(
+                    values,
+                    categories=pd.Index(self.code_table(column), dtype=object,
+                                        tupleize_cols=False)
+                )
+            data[column] = values
+        return pd.DataFrame(data, columns=columns)
+
+    def population(self):
+        """Loads the entire population.
+
+        Returns:
+            a tuple of a list of `Household`s and a list of `Citizen`s, as written
+        """
+        return tuple(
+            [_TUPLES[table]._make(row)
+             for row in self.__table(table, None).astype(object).itertuples(index=False)]
+            for table in [HOUSEHOLDS, CITIZENS]
+        )
+
+
+def write_snapshot(path, households, citizens):
+    """Writes a snapshot of households and citizens at once, see `SnapshotWriter`."""
+    with SnapshotWriter(path) as writer:
+        writer.append(households, citizens)
+
+
+def _column_path(path, table, column, suffix='.npy'):
+    return path / '{}.{}{}'.format(table, column, suffix)
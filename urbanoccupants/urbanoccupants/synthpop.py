@@ -1,18 +1,23 @@
 from collections import namedtuple
 from enum import Enum
+from functools import reduce
+import heapq
 from itertools import chain
 import math
+import operator
 
+import numpy as np
 import pandas as pd
 
 from .hipf import fit_hipf
+from .shareddata import resolve
 from .types import AgeStructure, EconomicActivity, HouseholdType, Qualification, Pseudo, Carer,\
     PersonalIncome, PopulationDensity, Region
 from .tus import AGE_MAP, ECONOMIC_ACTIVITY_MAP, HOUSEHOLDTYPE_MAP, QUALIFICATION_MAP, PSEUDO_MAP,\
     CARER_MAP, PERSONAL_INCOME_MAP, POPULATION_DENSITY_MAP, REGION_MAP
 from .census import read_age_structure_data, read_household_type_data, \
     read_qualification_level_data, read_economic_activity_data,\
-    read_pseudo_individual_data, read_pseudo_household_data
+    read_pseudo_individual_data, read_pseudo_household_data, CensusCube
 
 Household = namedtuple('Household', ['id', 'seedId', 'region'])
 Citizen = namedtuple('Citizen', ['householdId', 'markovId', 'initialActivity',
@@ -21,13 +26,46 @@ Citizen = namedtuple('Citizen', ['householdId', 'markovId', 'initialActivity',
 RANDOM_SEED = 123456789
 MAX_HOUSEHOLD_SIZE = 70
 
+INDEPENDENT_SAMPLING = 'independent'
+SYSTEMATIC_SAMPLING = 'systematic'
+
+ALIAS_TABLE_WEIGHT_COLUMN_NAME = 'weight'
+ALIAS_TABLE_PROBABILITY_COLUMN_NAME = 'probability'
+ALIAS_TABLE_ALIAS_COLUMN_NAME = 'alias'
+
 
 def _unimplemented_census_read_function(geographical_layer):
     # lambda function cannot raise errors, hence the function definition here
     raise NotImplementedError()
 
 
-class HouseholdFeature(Enum):
+class _EncodableFeature():
+    """Encoding of feature values as ordered Categoricals, shared by all feature Enums."""
+
+    @property
+    def categorical_dtype(self):
+        """The ordered categorical dtype of the feature values, see `encode_features`."""
+        return pd.api.types.CategoricalDtype(
+            categories=sorted(self.uo_type, key=lambda value: value.value),
+            ordered=True
+        )
+
+    def encode(self, values):
+        """Converts a Series of feature values to an ordered Categorical with int8 codes."""
+        if isinstance(values.dtype, pd.api.types.CategoricalDtype):
+            if values.dtype == self.categorical_dtype:
+                return values
+            values = values.astype(object)
+        return values.astype(self.categorical_dtype)
+
+    def decode(self, values):
+        """Converts an encoded Series of feature values back to an object Series of enums."""
+        if isinstance(values.dtype, pd.api.types.CategoricalDtype):
+            return values.astype(object)
+        return values
+
+
+class HouseholdFeature(_EncodableFeature, Enum):
     """Household features to be used as controls in the creation of a synthetic population."""
     PSEUDO = (Pseudo, 'CHILD', PSEUDO_MAP, read_pseudo_household_data) # 'CHILD' is arbitrary
     HOUSEHOLD_TYPE = (HouseholdType, 'HHTYPE4', HOUSEHOLDTYPE_MAP, read_household_type_data)
@@ -52,7 +90,7 @@ class HouseholdFeature(Enum):
         return self._census_read_function(geographical_layer)
 
 
-class PeopleFeature(Enum):
+class PeopleFeature(_EncodableFeature, Enum):
     """People features to be used as controls in the creation of a synthetic population.
 
     These features are as well used to cluster the seed in order to form markov chains
@@ -90,17 +128,56 @@ class PeopleFeature(Enum):
 
     def read_census_data(self, geographical_layer):
         data = self._census_read_function(geographical_layer)
+        if self._includes_below_16 and self._includes_above_74:
+            return data
+        data = data.copy() # census data is read-only
+        usual_residents = PeopleFeature.AGE.read_census_data(geographical_layer)
         if not self._includes_below_16:
-            usual_residents = PeopleFeature.AGE.read_census_data(geographical_layer)
             younger_than_sixteen = usual_residents.loc[:, :AgeStructure.AGE_15].sum(axis=1)
             data[self.uo_type.BELOW_16] = younger_than_sixteen
         if not self._includes_above_74:
-            usual_residents = PeopleFeature.AGE.read_census_data(geographical_layer)
             older_than_74 = usual_residents.loc[:, AgeStructure.AGE_75_TO_84:].sum(axis=1)
             data[self.uo_type.ABOVE_74] = older_than_74
         return data
 
 
+FEATURES_BY_COLUMN_NAME = {str(feature): feature
+                           for feature in chain(PeopleFeature, HouseholdFeature)}
+
+
+def encode_features(df):
+    """Encodes all feature columns of a DataFrame as ordered Categoricals.
+
+    Feature columns are those named after a `PeopleFeature` or `HouseholdFeature`, as in the
+    seed. Their values are Enums stored as Python objects, which makes grouping, comparing and
+    pickling slow and memory hungry. Encoded, each value is an int8 code, and categories are
+    ordered by the value of the Enum, so that comparisons like
+    `seed[str(PeopleFeature.AGE)] < AgeStructure.AGE_18_TO_19` keep working. All other
+    columns stay untouched. All functions of this library accept encoded and decoded data.
+
+    Returns:
+        a copy of the DataFrame with encoded feature columns
+    """
+    df = df.copy()
+    for column in df.columns:
+        if column in FEATURES_BY_COLUMN_NAME:
+            df[column] = FEATURES_BY_COLUMN_NAME[column].encode(df[column])
+    return df
+
+
+def decode_features(df):
+    """Reverses `encode_features`.
+
+    Returns:
+        a copy of the DataFrame with feature columns of Enums stored as objects
+    """
+    df = df.copy()
+    for column in df.columns:
+        if column in FEATURES_BY_COLUMN_NAME:
+            df[column] = FEATURES_BY_COLUMN_NAME[column].decode(df[column])
+    return df
+
+
 def _pairing_function(x, y):
     # cantor pairing function, http://stackoverflow.com/a/919661/1856079
     return int(1 / 2 * (x + y) * (x + y + 1) + y)
@@ -128,6 +205,108 @@ def feature_id(feature_values):
         return _pairing_function(feature_id(feature_values[:-1]), feature_values[-1])
 
 
+def feature_ids(feature_values):
+    """Calculates the unique ids for many sets of feature values at once.
+
+    This is the vectorised version of `feature_id` and returns identical ids, hence the ids
+    can be used interchangeably with those of `feature_id`, e.g. in markov chain table names.
+
+    Parameters:
+        * feature_values: integer coded feature values, i.e. the values of the enums, either
+                          as 2D array-like of shape (number of sets, number of features) or as
+                          1D array-like in case of a single feature; alternatively a DataFrame
+                          or Series of Enums, encoded or not (see `encode_features`)
+
+    Returns:
+        a 1D numpy array of int64 ids
+
+    Raises:
+        OverflowError if ids could exceed int64 (Cantor ids grow fast with the number of
+        features); use `compact_feature_ids` in that case
+    """
+    feature_values = _as_feature_matrix(feature_values)
+    if len(feature_values) > 0:
+        if (feature_values < 0).any():
+            raise ValueError('Feature values must be non-negative.')
+        # the pairing function is monotonic, hence the maxima yield an upper bound of all ids
+        upper_bound = int(feature_values[:, 0].max())
+        for column in range(1, feature_values.shape[1]):
+            y = int(feature_values[:, column].max())
+            upper_bound = (upper_bound + y) * (upper_bound + y + 1) // 2 + y
+        if upper_bound > np.iinfo(np.int64).max:
+            raise OverflowError('Cantor ids of these feature values overflow int64.')
+    ids = feature_values[:, 0].copy()
+    for column in range(1, feature_values.shape[1]):
+        y = feature_values[:, column]
+        # halve the even factor before multiplying, as the full product may overflow int64
+        # even if the id does not
+        total = ids + y
+        even = total % 2 == 0
+        ids = np.where(even, total // 2, total) * np.where(even, total + 1, (total + 1) // 2) + y
+    return ids
+
+
+def compact_feature_ids(feature_values, radices):
+    """Calculates compact mixed-radix ids for many sets of feature values at once.
+
+    In contrast to `feature_id` and `feature_ids` the ids are dense: the largest id is the
+    product of all radices minus one. Hence, they cannot overflow for any practical number of
+    features. The ids are not compatible with the ones of `feature_id`.
+
+    Parameters:
+        * feature_values: integer coded feature values, as for `feature_ids`
+        * radices:        the number of possible values for each feature; all values of a
+                          feature must be in [0, radix), for a feature with enum type `uo_type`
+                          use `max(value.value for value in uo_type) + 1`
+
+    Returns:
+        a 1D numpy array of int64 ids
+    """
+    feature_values = _as_feature_matrix(feature_values)
+    radices = [int(radix) for radix in radices]
+    if len(radices) != feature_values.shape[1]:
+        raise ValueError('There must be one radix per feature.')
+    if reduce(operator.mul, radices, 1) - 1 > np.iinfo(np.int64).max:
+        raise OverflowError('Mixed-radix ids of these features overflow int64.')
+    if len(feature_values) > 0 and ((feature_values < 0).any() or
+                                    (feature_values.max(axis=0) >= radices).any()):
+        raise ValueError('Feature values must be in [0, radix).')
+    ids = np.zeros(len(feature_values), dtype=np.int64)
+    for column, radix in enumerate(radices):
+        ids = ids * radix + feature_values[:, column]
+    return ids
+
+
+def _as_feature_matrix(feature_values):
+    if isinstance(feature_values, pd.Series):
+        feature_values = feature_values.to_frame()
+    if isinstance(feature_values, pd.DataFrame):
+        feature_values = np.column_stack([_enum_values(feature_values.iloc[:, column])
+                                          for column in range(feature_values.shape[1])])
+    feature_values = np.asarray(feature_values, dtype=np.int64)
+    if feature_values.ndim == 1:
+        feature_values = feature_values.reshape(-1, 1)
+    if feature_values.ndim != 2:
+        raise ValueError('Feature values must be one or two dimensional.')
+    return feature_values
+
+
+def _enum_values(values):
+    if isinstance(values.dtype, pd.api.types.CategoricalDtype):
+        categories = values.cat.categories
+        if len(categories) > 0 and isinstance(categories[0], Enum):
+            category_values = np.array([category.value for category in categories],
+                                       dtype=np.int64)
+            codes = values.cat.codes.values
+            if (codes < 0).any():
+                raise ValueError('Column {} contains missing values.'.format(values.name))
+            return category_values[codes]
+        return values.astype(np.int64).values
+    if len(values) > 0 and isinstance(values.iloc[0], Enum):
+        return np.array([value.value for value in values], dtype=np.int64)
+    return values.values
+
+
 def run_hipf(param_tuple):
     """Performs HIPF for a single geographical region.
 
@@ -137,10 +316,13 @@ def run_hipf(param_tuple):
     See `urbanoccupants.hipf.fit_hipf` for further information on the algorithm and parameters.
 
     Parameters:
-        * param_tuple(0): the seed for the fitting
-        * param_tuple(1): the controls for the households
-        * param_tuple(2): the controls for the individuals
-        * param_tuple(3): the region string, not used here, only bypassed
+        * param_tuple(0): the seed for the fitting, or a `shareddata.SharedFrameDescriptor` of it
+        * param_tuple(1): the controls for the households, or a `census.CensusCube` containing
+                          the region
+        * param_tuple(2): the controls for the individuals, or a `census.CensusCube` containing
+                          the region
+        * param_tuple(3): the region string, selects the controls from cubes, otherwise only
+                          bypassed
 
     Returns:
         a tuple of
@@ -148,7 +330,13 @@ def run_hipf(param_tuple):
             * the fitted weights for the households in the seed
     """
     seed, controls_hh, controls_ppl, region = param_tuple
-    number_households = list(controls_hh.values())[0].sum()
+    seed = resolve(seed)
+    if isinstance(controls_hh, CensusCube):
+        number_households = controls_hh.total(region)
+    else:
+        number_households = pd.Series(list(controls_hh.values())[0]).sum()
+    controls_hh = _region_controls(controls_hh, region)
+    controls_ppl = _region_controls(controls_ppl, region)
     household_weights = fit_hipf(
         reference_sample=seed,
         controls_households=controls_hh,
@@ -162,6 +350,12 @@ def run_hipf(param_tuple):
     return (region, household_weights)
 
 
+def _region_controls(controls, region):
+    if isinstance(controls, CensusCube):
+        return controls.controls(region)
+    return controls
+
+
 def sample_households(param_tuple):
     """Samples households from a seed with fitted weights.
 
@@ -171,24 +365,284 @@ def sample_households(param_tuple):
     Parameters:
         * param_tuple(0): the region string
         * param_tuple(1): the seed from which to sample
-        * param_tuple(2): the fitted weights on household level
-        * param_tuple(3): a random number for each household, to ensure reproducibility
+        * param_tuple(2): the fitted weights on household level, either as pandas Series or as
+                          an `AliasTable` built from them
+        * param_tuple(3): a random number for each household, to ensure reproducibility, or
+                          None to derive them from the household ids using
+                          `household_random_numbers`
         * param_tuple(4): an id for each household, to ensure reproducibility
 
     Returns:
         a list of Households
     """
     region, seed, household_weights, random_numbers, household_ids = param_tuple
+    if random_numbers is None:
+        random_numbers = household_random_numbers(household_ids)
     assert len(random_numbers) == len(household_ids)
+    seed_hh_ids = _sample_seed_household_ids(household_weights, random_numbers)
+    return [Household(household_id, seed_hh_id, region)
+            for household_id, seed_hh_id in zip(household_ids, seed_hh_ids)]
+
+
+def sample_household_replicates(param_tuple):
+    """Samples several independent populations of households from the same fitted weights.
+
+    All replicates are drawn in a single vectorised pass. Each replicate has its own household
+    ids and hence its own random numbers, see `household_random_numbers`. A replicate with the
+    same household ids as a population sampled by `sample_households` is identical to it.
+    Citizens of the replicates can be sampled with `sample_citizen` as for any households;
+    their random seeds differ between replicates as well, as long as household ids do.
+
+    This function is intened to be used with `multiprocessing.imap_unordered` which allows
+    only one parameter, hence the inconvenient tuple parameter design.
 
+    Parameters:
+        * param_tuple(0): the region string
+        * param_tuple(1): the seed from which to sample
+        * param_tuple(2): the fitted weights on household level, either as pandas Series or as
+                          an `AliasTable` built from them
+        * param_tuple(3): for each replicate, the ids of its households; all replicates must
+                          have the same number of households, and ids should not overlap
+
+    Returns:
+        a list of replicates, each a list of Households
+    """
+    region, seed, household_weights, replicate_household_ids = param_tuple
+    number_households = len(replicate_household_ids[0])
+    if any(len(household_ids) != number_households
+           for household_ids in replicate_household_ids):
+        raise ValueError('All replicates must have the same number of households.')
+    household_ids = np.concatenate([np.asarray(household_ids, dtype=np.int64)
+                                    for household_ids in replicate_household_ids])
+    # a replicates x households matrix of seed household ids
+    seed_hh_ids = _sample_seed_household_ids(
+        household_weights,
+        household_random_numbers(household_ids)
+    ).values.reshape(len(replicate_household_ids), number_households)
+    return [[Household(int(household_id), seed_hh_id, region)
+             for household_id, seed_hh_id in zip(replicate_ids, replicate_seed_hh_ids)]
+            for replicate_ids, replicate_seed_hh_ids in zip(
+                household_ids.reshape(len(replicate_household_ids), number_households),
+                seed_hh_ids
+            )]
+
+
+def _sample_seed_household_ids(household_weights, random_numbers):
+    if isinstance(household_weights, AliasTable):
+        return household_weights.sample(random_numbers)
     norm_hh_weights = household_weights / household_weights.sum()
     cum_norm_hh_weights = norm_hh_weights.cumsum()
-    assert math.isclose(cum_norm_hh_weights[-1], 1, abs_tol=0.001)
+    assert math.isclose(cum_norm_hh_weights.iloc[-1], 1, abs_tol=0.001)
 
-    seed_hh_ids = (cum_norm_hh_weights[cum_norm_hh_weights >= random_number].index[0]
-                   for random_number in random_numbers)
-    return [Household(household_id, seed_hh_ids, region)
-            for household_id, seed_hh_ids in zip(household_ids, seed_hh_ids)]
+    # first household whose cumulative weight is >= the random number
+    positions = np.searchsorted(cum_norm_hh_weights.values, random_numbers, side='left')
+    return cum_norm_hh_weights.index[positions]
+
+
+def sample_households_systematic(param_tuple):
+    """Samples households from a seed with fitted weights using quotas and systematic draws.
+
+    Independent draws as in `sample_households` add Monte Carlo noise to the fitted totals.
+    Instead, seed households are stratified by household size and household features first.
+    Each stratum gets a quota of households proportional to its fitted weight, rounded
+    systematically so that quotas deviate by less than one household from the expected number
+    and sum up to the number of households. Within each stratum, households are drawn
+    systematically along the cumulative weights, i.e. with equally spaced random numbers.
+    A single random number, derived from the first household id, determines the entire draw.
+
+    Households come in order of strata. This function is intened to be used with
+    `multiprocessing.imap_unordered` which allows only one parameter, hence the inconvenient
+    tuple parameter design.
+
+    Parameters:
+        * param_tuple(0): the region string
+        * param_tuple(1): the seed from which to sample, or a `shareddata.SharedFrameDescriptor`
+                          of it, indexed by household id and person id
+        * param_tuple(2): the fitted weights on household level as pandas Series
+        * param_tuple(3): the household features to stratify by, e.g. the keys of the
+                          household controls
+        * param_tuple(4): an id for each household, to ensure reproducibility
+
+    Returns:
+        a list of Households
+    """
+    region, seed, household_weights, household_features, household_ids = param_tuple
+    seed = resolve(seed)
+    number_households = len(household_ids)
+    if number_households == 0:
+        return []
+    household_weights = household_weights[household_weights > 0]
+    if len(household_weights) == 0:
+        raise ValueError('Weights must not sum up to zero.')
+    weights = household_weights.values.astype(np.float64)
+    strata = _household_strata(seed, household_weights.index, household_features)
+    order = np.argsort(strata, kind='stable')
+    strata = strata[order]
+    weights = weights[order]
+    stratum_starts = np.flatnonzero(np.diff(strata, prepend=-1))
+    stratum_weights = np.add.reduceat(weights, stratum_starts)
+    number_strata = len(stratum_starts)
+    offset = household_random_numbers([next(iter(household_ids))])[0]
+
+    # quotas by systematic rounding of the cumulative expected number of households
+    expected = np.cumsum(stratum_weights) / stratum_weights.sum() * number_households
+    expected[-1] = number_households
+    quotas = np.diff(np.floor(expected + offset), prepend=0).astype(np.int64)
+
+    # within each stratum, draws are equally spaced along the normalised cumulative weights,
+    # stratum i being shifted by i, so that a single search covers all strata
+    stratum_sizes = np.diff(stratum_starts, append=len(weights))
+    stratum_of_household = np.repeat(np.arange(number_strata), stratum_sizes)
+    cumulative_weights = np.cumsum(weights)
+    stratum_offsets = np.concatenate([[0], cumulative_weights[stratum_starts[1:] - 1]])
+    normalised = ((cumulative_weights - stratum_offsets[stratum_of_household]) /
+                  stratum_weights[stratum_of_household])
+    normalised[np.append(stratum_starts[1:] - 1, len(weights) - 1)] = 1
+    stratum_of_draw = np.repeat(np.arange(number_strata), quotas)
+    rank_in_stratum = (np.arange(number_households) -
+                       np.repeat(np.cumsum(quotas) - quotas, quotas))
+    points = stratum_of_draw + (offset + rank_in_stratum) / quotas[stratum_of_draw]
+    positions = np.searchsorted(normalised + stratum_of_household, points, side='left')
+    seed_hh_ids = household_weights.index[order[positions]]
+    return [Household(household_id, seed_hh_id, region)
+            for household_id, seed_hh_id in zip(household_ids, seed_hh_ids)]
+
+
+def _household_strata(seed, seed_household_ids, household_features):
+    seed_households = seed.groupby(level=0, sort=False)
+    strata = pd.DataFrame({'size': seed_households.size()})
+    for feature in household_features:
+        strata[str(feature)] = seed_households[str(feature)].first()
+    strata = strata.reindex(seed_household_ids)
+    return strata.groupby(list(strata.columns), observed=True, sort=True)\
+        .ngroup().values.astype(np.int64)
+
+
+def household_random_numbers(household_ids, key=RANDOM_SEED):
+    """Creates one uniform random number in [0, 1) for each household.
+
+    Numbers are taken from a counter-based generator (Philox) keyed by `key`, using the
+    household id as the counter. Hence, the number of a household depends on nothing but the
+    key and its id: any worker can create the numbers of any range of households
+    independently, and results are identical regardless of the number of processes or the
+    chunking of households.
+
+    Parameters:
+        * household_ids: non-negative integer ids of the households, ideally consecutive, e.g.
+                         a `range`, as each run of consecutive ids is drawn in a single pass
+        * key:           the key of the generator
+
+    Returns:
+        a numpy array of random numbers, in order of the household ids
+    """
+    household_ids = np.asarray(household_ids, dtype=np.int64)
+    if (household_ids < 0).any():
+        raise ValueError('Household ids must be non-negative.')
+    random_numbers = np.empty(len(household_ids), dtype=np.float64)
+    run_starts = np.concatenate([[0], np.flatnonzero(np.diff(household_ids) != 1) + 1])
+    run_ends = np.concatenate([run_starts[1:], [len(household_ids)]])
+    for run_start, run_end in zip(run_starts, run_ends):
+        if run_start == run_end:
+            continue
+        bit_generator = np.random.Philox(key=key, counter=int(household_ids[run_start]))
+        # each counter value yields a block of four 64 bit numbers, use the first of each block
+        raw = bit_generator.random_raw(4 * (run_end - run_start))[::4]
+        random_numbers[run_start:run_end] = (raw >> np.uint64(11)) * (1.0 / 2 ** 53)
+    return random_numbers
+
+
+class AliasTable():
+    """Walker's alias table of fitted household weights.
+
+    The table is built once per region in O(n) using Vose's algorithm and allows to draw
+    households in O(1) each afterwards. This pays off whenever many populations are drawn
+    from the same fitted weights, e.g. for replicates or scenarios.
+
+    Parameters:
+        * household_weights: the fitted weights on household level as returned by `run_hipf`,
+                             a pandas Series indexed by the household ids of the seed
+    """
+
+    def __init__(self, household_weights):
+        weights = household_weights.values.astype(np.float64)
+        if len(weights) == 0:
+            raise ValueError('Cannot build an alias table from empty weights.')
+        if (weights < 0).any() or not np.isfinite(weights).all():
+            raise ValueError('Weights must be finite and non-negative.')
+        if weights.sum() <= 0:
+            raise ValueError('Weights must not sum up to zero.')
+        self.__household_ids = household_weights.index
+        self.__weights = weights
+        self.__probabilities, self.__aliases = AliasTable._vose(weights)
+
+    def __len__(self):
+        return len(self.__weights)
+
+    @property
+    def household_weights(self):
+        """The fitted weights from which the table has been built."""
+        return pd.Series(index=self.__household_ids, data=self.__weights)
+
+    def sample(self, random_numbers):
+        """Draws one seed household id per random number.
+
+        Each random number in [0, 1) is split into the column of the table (integer part of
+        u * n) and the coin flip deciding between column and alias (fractional part).
+
+        Returns:
+            a pandas Index of seed household ids, in order of the random numbers
+        """
+        scaled = np.asarray(random_numbers, dtype=np.float64) * len(self)
+        columns = np.minimum(scaled.astype(np.int64), len(self) - 1)
+        keep = (scaled - columns) < self.__probabilities[columns]
+        return self.__household_ids[np.where(keep, columns, self.__aliases[columns])]
+
+    def to_dataframe(self):
+        """Creates a dataframe representation of the alias table.
+
+        The dataframe holds the fitted weights alongside the table, and can be used to
+        serialise both into pickle, csv or sql.
+        """
+        return pd.DataFrame(
+            index=self.__household_ids,
+            data={
+                ALIAS_TABLE_WEIGHT_COLUMN_NAME: self.__weights,
+                ALIAS_TABLE_PROBABILITY_COLUMN_NAME: self.__probabilities,
+                ALIAS_TABLE_ALIAS_COLUMN_NAME: self.__aliases
+            },
+            columns=[ALIAS_TABLE_WEIGHT_COLUMN_NAME, ALIAS_TABLE_PROBABILITY_COLUMN_NAME,
+                     ALIAS_TABLE_ALIAS_COLUMN_NAME]
+        )
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Restores an alias table from its dataframe representation without rebuilding it."""
+        table = cls.__new__(cls)
+        table.__household_ids = df.index
+        table.__weights = df[ALIAS_TABLE_WEIGHT_COLUMN_NAME].values.astype(np.float64)
+        table.__probabilities = df[ALIAS_TABLE_PROBABILITY_COLUMN_NAME].values.astype(np.float64)
+        table.__aliases = df[ALIAS_TABLE_ALIAS_COLUMN_NAME].values.astype(np.int64)
+        return table
+
+    @staticmethod
+    def _vose(weights):
+        number_columns = len(weights)
+        scaled = weights / weights.sum() * number_columns
+        probabilities = np.ones(number_columns, dtype=np.float64)
+        aliases = np.arange(number_columns, dtype=np.int64)
+        small = [i for i in range(number_columns) if scaled[i] < 1.0]
+        large = [i for i in range(number_columns) if scaled[i] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            probabilities[less] = scaled[less]
+            aliases[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # whatever remains is 1 up to floating point errors, and hence keeps itself
+        return probabilities, aliases
 
 
 def sample_citizen(param_tuple):
@@ -199,12 +653,14 @@ def sample_citizen(param_tuple):
 
     Parameters:
         * param_tuple(0): the households for which citizens should be sampled
-        * param_tuple(1): the seed from which to sample
+        * param_tuple(1): the seed from which to sample, or a `shareddata.SharedFrameDescriptor`
+                          of it
 
     Returns:
         a list of Citizens
     """
     households, seed = param_tuple
+    seed = resolve(seed)
     return list(chain(
         *([Citizen(householdId=household.id,
                    markovId=row.markov_id,
@@ -216,5 +672,185 @@ def sample_citizen(param_tuple):
           for household in households)))
 
 
+def synthesise_region(param_tuple):
+    """Fits and samples the entire population of a single geographical region.
+
+    This function combines `run_hipf`, `sample_households`, and `sample_citizen` in a single
+    task, so that only the population of the region is ever transferred between processes.
+    It is intened to be used with `multiprocessing.imap` which allows only one parameter, hence
+    the inconvenient tuple parameter design.
+
+    Parameters:
+        * param_tuple(0): the seed, or a `shareddata.SharedFrameDescriptor` of it
+        * param_tuple(1): the controls for the households, or a `census.CensusCube` containing
+                          the region
+        * param_tuple(2): the controls for the individuals, or a `census.CensusCube` containing
+                          the region
+        * param_tuple(3): the region string
+        * param_tuple(4): an id for each household, to ensure reproducibility
+        * param_tuple(5): the sampling of households, either `INDEPENDENT_SAMPLING` using
+                          `sample_households` or `SYSTEMATIC_SAMPLING` using
+                          `sample_households_systematic`, stratified by the household controls
+
+    Returns:
+        a tuple of
+            * param_tuple(3)
+            * a list of Households
+            * a list of Citizens
+    """
+    seed, controls_hh, controls_ppl, region, household_ids, sampling = param_tuple
+    controls_hh = _region_controls(controls_hh, region)
+    region, household_weights = run_hipf((seed, controls_hh, controls_ppl, region))
+    if sampling == SYSTEMATIC_SAMPLING:
+        households = sample_households_systematic(
+            (region, seed, household_weights, list(controls_hh.keys()), household_ids)
+        )
+    elif sampling == INDEPENDENT_SAMPLING:
+        households = sample_households((region, seed, household_weights, None, household_ids))
+    else:
+        raise ValueError('Unknown sampling of households: {}.'.format(sampling))
+    return region, households, sample_citizen((households, seed))
+
+
+def run_chunk(param_tuple):
+    """Runs a task on a chunk of work and tags its result with the id of the chunk.
+
+    Results of `multiprocessing.imap_unordered` arrive in the order in which workers finish.
+    Tagged with the chunk id, they can be brought back into canonical order using
+    `in_chunk_order`, so that results never depend on the number of processes or their timing.
+
+    Parameters:
+        * param_tuple(0): the id of the chunk
+        * param_tuple(1): the task, a function accepting a single tuple parameter, e.g.
+                          `sample_households` or `sample_citizen`
+        * param_tuple(2): the parameter tuple of the task
+
+    Returns:
+        a tuple of
+            * param_tuple(0)
+            * the result of the task
+    """
+    chunk_id, task, task_param_tuple = param_tuple
+    return chunk_id, task(task_param_tuple)
+
+
+def in_chunk_order(tagged_results, first_chunk_id=0):
+    """Yields results tagged by `run_chunk` in order of their chunk ids.
+
+    Chunk ids must be consecutive integers. Each result is yielded as soon as all its
+    predecessors have been yielded, hence only results arriving ahead of their predecessors
+    are held back.
+
+    Parameters:
+        * tagged_results: an iterable of tuples of chunk id and result, in any order
+        * first_chunk_id: the smallest chunk id
+
+    Returns:
+        a generator of results
+    """
+    pending = []
+    next_chunk_id = first_chunk_id
+    for chunk_id, result in tagged_results:
+        if chunk_id < next_chunk_id or any(chunk_id == pending_id for pending_id, _ in pending):
+            raise ValueError('Chunk {} has been received twice.'.format(chunk_id))
+        heapq.heappush(pending, (chunk_id, result))
+        while pending and pending[0][0] == next_chunk_id:
+            yield heapq.heappop(pending)[1]
+            next_chunk_id += 1
+    if pending:
+        raise ValueError('Chunks before chunk {} are missing.'.format(pending[0][0]))
+
+
+def population_totals(seed, households, features):
+    """Counts the synthetic population per region and feature category.
+
+    Households are counted for household features, their citizens for people features. The
+    feature values of the citizens are taken from the seed, hence the citizens need not be
+    given. All counts are bincounts over category codes, so this is fast even for millions of
+    households.
+
+    Parameters:
+        * seed:       the seed the population has been sampled from, indexed by household id
+                      and person id, or a `shareddata.SharedFrameDescriptor` of it
+        * households: the sampled households
+        * features:   the `PeopleFeature`s and `HouseholdFeature`s to count
+
+    Returns:
+        a dict mapping each feature to a DataFrame with regions as index and the feature
+        categories as columns
+    """
+    seed = resolve(seed)
+    seed_household_codes, seed_household_ids = pd.factorize(seed.index.get_level_values(0))
+    seed_household_positions = pd.Index(seed_household_ids).get_indexer(
+        [household.seedId for household in households]
+    )
+    if (seed_household_positions < 0).any():
+        raise ValueError('Households have been sampled from a different seed.')
+    region_codes, regions = pd.factorize([household.region for household in households])
+    number_seed_households = len(seed_household_ids)
+    totals = {}
+    for feature in features:
+        categories = feature.categorical_dtype.categories
+        category_codes = pd.Categorical(
+            feature.decode(seed[str(feature)]), dtype=feature.categorical_dtype
+        ).codes.astype(np.int64)
+        if (category_codes < 0).any():
+            raise ValueError('Seed contains invalid values of {}.'.format(feature))
+        # number of people of each category in each household of the seed
+        seed_counts = np.bincount(
+            seed_household_codes * len(categories) + category_codes,
+            minlength=number_seed_households * len(categories)
+        ).reshape(number_seed_households, len(categories))
+        if isinstance(feature, HouseholdFeature):
+            seed_counts = (seed_counts > 0).astype(np.int64)
+        counts = np.column_stack([
+            np.bincount(region_codes, weights=seed_counts[seed_household_positions, category],
+                        minlength=len(regions))
+            for category in range(len(categories))
+        ]) if len(households) > 0 else np.zeros((0, len(categories)))
+        totals[feature] = pd.DataFrame(counts.astype(np.int64), index=regions,
+                                       columns=categories)
+    return totals
+
+
+def fit_quality(population_totals, census_data):
+    """Compares the totals of a synthetic population to the controls it has been fitted to.
+
+    Per region and feature, three measures are reported:
+
+        * tae: the total absolute error
+        * srmse: the standardised root mean square error, i.e. the root mean square error of
+                 all categories divided by the mean control of all categories
+        * max_relative_error: the largest absolute error of all categories relative to its
+                              control; for zero controls the absolute error is used
+
+    Parameters:
+        * population_totals: the totals of the population as returned by `population_totals`
+        * census_data:       a dict mapping features to the census data used as controls
+
+    Returns:
+        a DataFrame indexed by region and feature
+    """
+    quality = []
+    for feature, totals in population_totals.items():
+        controls = census_data[feature].reindex(index=totals.index, columns=totals.columns,
+                                                fill_value=0).values.astype(np.float64)
+        errors = np.abs(totals.values - controls)
+        mean_controls = controls.mean(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            srmse = np.sqrt((errors ** 2).mean(axis=1)) / mean_controls
+        srmse[(mean_controls == 0) & (errors.sum(axis=1) == 0)] = 0
+        quality.append(pd.DataFrame(
+            index=pd.MultiIndex.from_product([totals.index, [str(feature)]],
+                                             names=['region', 'feature']),
+            data={
+                'tae': errors.sum(axis=1),
+                'srmse': srmse,
+                'max_relative_error': (errors / np.maximum(controls, 1)).max(axis=1)
+            }
+        ))
+    return pd.concat(quality).sort_index()
+
+
 def _citizen_random_seed(household_id, occupant_id):
     return RANDOM_SEED + household_id * MAX_HOUSEHOLD_SIZE + occupant_id
@@ -10,6 +10,7 @@ import pandas as pd
 
 from pytus2000 import diary, individual
 from .person import WeekMarkovChain
+from .shareddata import resolve
 from .types import EconomicActivity, Qualification, HouseholdType, AgeStructure, Pseudo, Carer,\
     PersonalIncome, PopulationDensity, Region
 
@@ -43,6 +44,63 @@ def filter_features(seed, markov_ts, features):
     return seed, markov_ts
 
 
+SEED_INDEX_LEVELS = ['SN1', 'SN2', 'SN3']
+HOUSEHOLD_ID = 'household_id'
+PERSON_ID = 'person_id'
+
+
+def integer_seed_lookup(seed_index):
+    """Assigns dense integer ids to the households and people of the seed.
+
+    The TUS identifies people by (SN1, SN2, SN3) and households by (SN1, SN2). Tuples of these
+    are slow to hash, group, and look up, hence the seed and markov time series can be
+    re-indexed by integer ids using `to_integer_keys`. Households and people are numbered in
+    order of their TUS ids, starting at 0.
+
+    Parameters:
+        * seed_index: the index of the seed, or of the markov time series, with levels
+                      (SN1, SN2, SN3) first
+
+    Returns:
+        a DataFrame indexed by the person id (int32), with columns household id (int32), SN1,
+        SN2, and SN3: the lookup table between both keys
+    """
+    people = seed_index.droplevel(
+        [name for name in seed_index.names if name not in SEED_INDEX_LEVELS]
+    ).unique().sort_values()
+    household_ids = pd.factorize(people.droplevel(SEED_INDEX_LEVELS[2]), sort=True)[0]
+    lookup = people.to_frame(index=False)
+    lookup.insert(0, HOUSEHOLD_ID, household_ids.astype(np.int32))
+    # pandas before 2.0 has no int32 indices and stores the person ids as int64 nonetheless
+    lookup.index = pd.Index(np.arange(len(lookup), dtype=np.int32), name=PERSON_ID)
+    return lookup
+
+
+def to_integer_keys(data, lookup):
+    """Replaces the levels (SN1, SN2, SN3) of the index by household id and person id.
+
+    Parameters:
+        * data:   the seed, the markov time series, or any other Series or DataFrame with
+                  levels (SN1, SN2, SN3) in its index; all other levels are kept
+        * lookup: the lookup table as created by `integer_seed_lookup`
+
+    Returns:
+        a copy of `data` with index (household_id, person_id, ...)
+    """
+    other_levels = [name for name in data.index.names if name not in SEED_INDEX_LEVELS]
+    people = pd.MultiIndex.from_frame(lookup[SEED_INDEX_LEVELS])
+    positions = people.get_indexer(data.index.droplevel(other_levels))
+    if (positions < 0).any():
+        raise ValueError('Lookup table misses people of the data.')
+    data = data.copy()
+    data.index = pd.MultiIndex.from_arrays(
+        [lookup[HOUSEHOLD_ID].values[positions], lookup.index.values[positions]] +
+        [data.index.get_level_values(name) for name in other_levels],
+        names=[HOUSEHOLD_ID, PERSON_ID] + other_levels
+    )
+    return data
+
+
 def markov_chain_for_cluster(param_tuple):
     """Creating a heterogenous markov chain for a cluster of the TUS sample.
 
@@ -51,8 +109,11 @@ def markov_chain_for_cluster(param_tuple):
 
     Parameters:
         * param_tuple(0): time series for all people, with index (SN1, SN2, SN3, daytype, timeofday)
+                          or (household_id, person_id, daytype, time_of_day), see
+                          `to_integer_keys`, or a `shareddata.SharedFrameDescriptor` of it
         * param_tuple(1): a subset of the individual data set representing the cluster for which
-                          the markov chain should be created, with index (SN1, SN2, SN3)
+                          the markov chain should be created, with the same people levels of
+                          the index as the time series
         * param_tuple(2): the tuple of people features representing the cluster, this is not used
                           in this function, but only passed through
         * param_tuple(3): the time step size of the markov chain, a datetime.timedelta object
@@ -63,17 +124,16 @@ def markov_chain_for_cluster(param_tuple):
             * the heterogeneous markov chain for the cluster
     """
     markov_ts, group_of_people, features, time_step_size = param_tuple
+    markov_ts = resolve(markov_ts)
     # filter by people
-    people_mask = markov_ts.index.droplevel([3, 4]).isin(group_of_people.index)
+    people_mask = markov_ts.index.droplevel(['daytype', 'time_of_day']).isin(group_of_people.index)
     filtered_markov = pd.DataFrame(markov_ts)[people_mask].sort_index()
-    # filter by weekday
-    idx = pd.IndexSlice
-    filtered_markov_weekday = filtered_markov.loc[idx[:, :, :, 'weekday'], :]
-    # filter by weekend
-    filtered_markov_weekend = filtered_markov.loc[idx[:, :, :, 'weekend'], :]
+    # all levels but the time of day become columns
+    diary_levels = [name for name in filtered_markov.index.names if name != 'time_of_day']
+    daytype = filtered_markov.index.get_level_values('daytype')
     return features, WeekMarkovChain(
-        weekday_time_series=filtered_markov_weekday.unstack(level=[0, 1, 2, 3]),
-        weekend_time_series=filtered_markov_weekend.unstack(level=[0, 1, 2, 3]),
+        weekday_time_series=filtered_markov[daytype == 'weekday'].unstack(level=diary_levels),
+        weekend_time_series=filtered_markov[daytype == 'weekend'].unstack(level=diary_levels),
         time_step_size=time_step_size
     )
 